@@ -0,0 +1,146 @@
+# File: access_state.py
+# Status akses aplikasi (trial / premium / expired) yang disimpan di kolom UserApp.access_state,
+# beserta waktu berakhirnya di UserApp.access_expires_at. Aturan kedaluwarsa hanya ada di file ini:
+#   1. premium aktif  : is_premium dan premium_end_date > sekarang       -> berakhir di premium_end_date
+#   2. trial aktif    : installation_date + TRIAL_DURATION > sekarang    -> berakhir di installation_date + TRIAL_DURATION
+#   3. selain itu     : expired
+# resolve_access_state dipakai saat baris UserApp ditulis lewat ORM (event di models.py);
+# sweep_access_states menjalankan aturan yang sama sebagai satu UPDATE massal untuk baris yang sudah lewat waktunya.
+import datetime
+import threading
+import time
+
+ACCESS_TRIAL = 'trial'
+ACCESS_PREMIUM = 'premium'
+ACCESS_EXPIRED = 'expired'
+
+TRIAL_DURATION = datetime.timedelta(hours=24) # Durasi trial setelah instalasi (atau setelah admin memberi trial ulang)
+TRIAL_DURATION_LABEL = '24 jam'               # Untuk pesan ke user
+
+
+def resolve_access_state(is_premium, premium_end_date, installation_date, current_time):
+    """(access_state, access_expires_at) untuk satu baris UserApp pada current_time."""
+    if is_premium and premium_end_date and premium_end_date > current_time:
+        return ACCESS_PREMIUM, premium_end_date
+    trial_end_time = installation_date + TRIAL_DURATION
+    if trial_end_time > current_time:
+        return ACCESS_TRIAL, trial_end_time
+    return ACCESS_EXPIRED, None
+
+
+def access_state_expressions(current_time):
+    """Aturan resolve_access_state sebagai ekspresi SQL CASE: (access_state, access_expires_at)."""
+    from sqlalchemy import and_, case, func
+    from models import UserApp # Import di dalam fungsi untuk menghindari circular import
+
+    premium_active = and_(UserApp.is_premium == True, UserApp.premium_end_date > current_time) # noqa: E712
+    trial_active = UserApp.installation_date > current_time - TRIAL_DURATION
+    trial_end_time = func.datetime(UserApp.installation_date, f'+{int(TRIAL_DURATION.total_seconds())} seconds')
+    state = case((premium_active, ACCESS_PREMIUM), (trial_active, ACCESS_TRIAL), else_=ACCESS_EXPIRED)
+    expires_at = case((premium_active, UserApp.premium_end_date), (trial_active, trial_end_time), else_=None)
+    return state, expires_at
+
+
+def sweep_access_states(current_time=None):
+    """
+    Satu UPDATE massal: hitung ulang status semua baris yang belum expired tapi waktu berakhirnya sudah lewat
+    (premium habis -> trial/expired, trial habis -> expired). Memakai index ix_user_app_access_due.
+    Mengembalikan jumlah baris yang diubah.
+    """
+    from extensions import db, invalidate_user_apps_cache
+    from models import UserApp
+
+    current_time = current_time or datetime.datetime.utcnow()
+    state, expires_at = access_state_expressions(current_time)
+    result = db.session.execute(
+        db.update(UserApp)
+        .where(UserApp.access_state != ACCESS_EXPIRED, UserApp.access_expires_at <= current_time)
+        .values(access_state=state, access_expires_at=expires_at)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    if result.rowcount:
+        invalidate_user_apps_cache()
+    return result.rowcount
+
+
+def _add_column(connection, inspector_columns, name, ddl):
+    # ALTER TABLE ADD COLUMN; worker lain yang upgrade bersamaan bisa lebih dulu menambah kolom yang sama
+    from sqlalchemy import inspect, text
+    from sqlalchemy.exc import OperationalError
+
+    if name in inspector_columns:
+        return False
+    try:
+        connection.execute(text(f"ALTER TABLE user_app ADD COLUMN {ddl}"))
+    except OperationalError:
+        if name not in {column['name'] for column in inspect(connection).get_columns('user_app')}:
+            raise
+        return False
+    return True
+
+
+def ensure_access_state_schema(app):
+    """
+    Upgrade database lama saat startup (database yang dibuat dengan db.create_all, tanpa tabel alembic_version):
+    kolom access_state / access_expires_at (migrasi c4d81f6a2e37) ditambahkan dan diisi dengan aturan yang sama,
+    lalu index UserApp yang belum ada dibuat. Aman dipanggil berulang kali; database baru dilewati (create_all).
+    Jika database ini nanti dikelola Flask-Migrate, tandai dulu dengan `flask db stamp head`.
+    """
+    from sqlalchemy import inspect
+    from sqlalchemy.exc import OperationalError
+    from extensions import db
+    from models import UserApp
+
+    with app.app_context():
+        inspector = inspect(db.engine)
+        if not inspector.has_table(UserApp.__tablename__):
+            return
+        columns = {column['name'] for column in inspector.get_columns(UserApp.__tablename__)}
+        with db.engine.begin() as connection:
+            added_state = _add_column(connection, columns, 'access_state', f"access_state VARCHAR(10) NOT NULL DEFAULT '{ACCESS_TRIAL}'")
+            added_expiry = _add_column(connection, columns, 'access_expires_at', "access_expires_at DATETIME")
+
+        if added_state or added_expiry:
+            # Isi status baris lama sekali (sama dengan backfill migrasi c4d81f6a2e37)
+            state, expires_at = access_state_expressions(datetime.datetime.utcnow())
+            result = db.session.execute(
+                db.update(UserApp).values(access_state=state, access_expires_at=expires_at)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            print(f"DEBUG: Kolom status akses ditambahkan ke user_app, {result.rowcount} baris diisi.")
+
+        for index in UserApp.__table__.indexes:
+            try:
+                index.create(bind=db.engine, checkfirst=True)
+            except OperationalError:
+                if index.name not in {existing['name'] for existing in inspect(db.engine).get_indexes(UserApp.__tablename__)}:
+                    raise
+
+
+def _sweeper_loop(app, interval_seconds):
+    while True:
+        time.sleep(interval_seconds)
+        try:
+            with app.app_context():
+                swept = sweep_access_states()
+            if swept:
+                print(f"DEBUG: Sweeper akses: {swept} status aplikasi diperbarui.")
+        except Exception as e:
+            print(f"WARNING: Sweeper akses gagal: {e}")
+
+
+def init_access_sweeper(app):
+    """
+    Mendaftarkan perintah CLI `flask sweep-access` (untuk cron) dan, jika ACCESS_SWEEP_INTERVAL_SECONDS > 0,
+    thread latar yang menjalankan sweep secara berkala di proses ini.
+    """
+    @app.cli.command('sweep-access')
+    def sweep_access_command():
+        """Perbarui status trial/premium yang sudah kedaluwarsa (satu UPDATE)."""
+        print(f"{sweep_access_states()} status aplikasi diperbarui.")
+
+    interval_seconds = app.config.get('ACCESS_SWEEP_INTERVAL_SECONDS', 0)
+    if interval_seconds and interval_seconds > 0:
+        threading.Thread(target=_sweeper_loop, args=(app, interval_seconds), name='access-sweeper', daemon=True).start()
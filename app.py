@@ -2,16 +2,36 @@
 from flask import Flask, redirect, url_for, flash, request, session # Import session
 from flask_login import current_user # Make sure current_user is imported
 
+from database import configure_database
+from access_state import ensure_access_state_schema, init_access_sweeper
 # Import filter function from extensions
-from extensions import db, login_manager, inject_global_template_vars, format_rupiah_no_rp # Ensure format_rupiah_no_rp is imported
+from extensions import db, login_manager, inject_global_template_vars, format_rupiah_no_rp, get_user_snapshot # Ensure format_rupiah_no_rp is imported
 
 # ---- BAGIAN 1: INISIASI APLIKASI DAN EKSTENSI ----
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'kunci-rahasia-yang-kuat' 
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///rumaiku.db'
+# Tuning SQLite (WAL, busy_timeout, cache, mmap, pool koneksi) ada di database.py; nilai bawaan bisa diganti di sini
+app.config['SQLITE_BUSY_TIMEOUT_MS'] = 5000
+app.config['SQLITE_POOL_SIZE'] = 10
+# Hasil analisa Kalkulator ROAS disimpan di server (bukan di cookie session): 'sqlite' atau 'file'
+app.config['ROAS_RESULT_STORE'] = 'sqlite'
+app.config['ROAS_RESULT_TTL_SECONDS'] = 24 * 3600 # Hasil analisa kedaluwarsa setelah 24 jam
+# Analisa CSV sebagai job di process pool (analysis_jobs.py); False = dianalisa langsung di request upload
+app.config['ROAS_ANALYSIS_JOBS'] = True
+app.config['ROAS_ANALYSIS_JOB_WORKERS'] = 2 # Proses analisa paralel per worker web
+app.config['ROAS_ANALYSIS_MAX_FILES'] = 10 # Jumlah laporan toko maksimal per upload (dianalisa paralel)
+app.config['ROAS_ANALYSIS_HISTORY'] = True # Simpan selisih tiap laporan ke riwayat per user (instance/roas_history.db)
+# Memo cache perhitungan rekomendasi/simulasi: LRU per proses + SQLite lokal yang dipakai bersama antar worker
+app.config['ROAS_MEMO_CACHE_SIZE'] = 4096
+app.config['ROAS_MEMO_CACHE_SHARED'] = True
+# Sweeper status trial/premium (access_state.py): 0 = hanya lewat cron `flask --app app sweep-access`
+app.config['ACCESS_SWEEP_INTERVAL_SECONDS'] = 0
 
-db.init_app(app)
+configure_database(app, db) # = db.init_app(app) + PRAGMA SQLite di setiap koneksi
 login_manager.init_app(app)
+ensure_access_state_schema(app) # Database lama (tanpa Flask-Migrate): tambah kolom status akses + index UserApp
+init_access_sweeper(app)
 app.context_processor(inject_global_template_vars) # Ini yang penting!
 
 # --- DAFTARKAN FILTER JINJA2 DI SINI ---
@@ -29,8 +49,8 @@ def unauthorized():
 
 @login_manager.user_loader
 def load_user(user_id):
-    from models import User
-    return User.query.get(user_id)
+    # current_user = UserSnapshot dari cache (bukan objek ORM); lihat extensions.get_user_snapshot
+    return get_user_snapshot(user_id)
 
 # --- Debugging Request Global ---
 @app.before_request
@@ -1,9 +1,14 @@
 # File: blueprints/admin/routes.py
 from flask import render_template, flash, redirect, url_for, request
 from flask_login import login_required, current_user
-from models import User, App, UserApp # Pertahankan App, UserApp
-from extensions import db
+from models import User, UserApp
+from extensions import (
+    db, UserAppGrant, app_status_from_grant, get_all_apps, get_app_by_id, invalidate_user_apps_cache,
+    invalidate_user_snapshot
+)
+
 import datetime
+from access_state import TRIAL_DURATION_LABEL
 from functools import wraps
 from flask_wtf.csrf import generate_csrf
 
@@ -19,49 +24,96 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# --- DAFTAR PENGGUNA (KEYSET PAGINATION) ---
+ADMIN_USERS_PER_PAGE = 50
+
+
+def _admin_app_status_text(grant, current_time):
+    """Teks status aplikasi di tabel admin, dari status entitlement yang sama dengan halaman aplikasi."""
+    app_status = app_status_from_grant(grant, current_time)
+    if app_status['is_premium_active']:
+        return f"Premium (Sisa: {int(app_status['time_remaining_seconds'] / 3600)}j)"
+    if app_status['trial_expired']:
+        return "Trial Berakhir"
+    return f"Trial (Sisa: {int(app_status['time_remaining_seconds'] / 3600)}j)"
+
+
+def _load_installed_apps(user_ids):
+    """Aplikasi terinstal untuk sekumpulan user dengan satu query (user_id -> list info aplikasi)."""
+    installed_apps = {user_id: [] for user_id in user_ids}
+    if not user_ids:
+        return installed_apps
+
+    rows = db.session.query(
+        UserApp.user_id, UserApp.app_id, UserApp.installation_date, UserApp.is_premium, UserApp.premium_end_date,
+        UserApp.access_state, UserApp.access_expires_at
+    ).filter(UserApp.user_id.in_(user_ids)).order_by(UserApp.id).all()
+
+    current_time = datetime.datetime.utcnow()
+    for user_id, app_id, *user_app_fields in rows:
+        app_info = get_app_by_id(app_id) # Nama aplikasi dari katalog (tanpa join)
+        if app_info is None:
+            continue
+        grant = UserAppGrant(app_id, app_info.name, app_info.url, *user_app_fields)
+        installed_apps[user_id].append({
+            'id': grant.app_id,
+            'name': grant.app_name,
+            'status': _admin_app_status_text(grant, current_time),
+            'is_premium': grant.is_premium,
+            'premium_end_date': grant.premium_end_date.strftime('%Y-%m-%d %H:%M') if grant.premium_end_date else '-'
+        })
+    return installed_apps
+
+
 @bp.route('/')
 @admin_required
 def index():
-    users = User.query.all()
-    # all_apps = App.query.all() # Ini akan dibutuhkan lagi untuk modal grant_access
-    all_apps = App.query.all() # KEMBALIKAN: Ambil semua aplikasi
-    
-    users_data = []
-    trial_duration_hours = 24 # Durasi trial default
-    for user in users:
-        installed_apps_info = []
-        user_app_entries = UserApp.query.filter_by(user_id=user.id).all()
-        for ua_entry in user_app_entries:
-            app_obj = App.query.get(ua_entry.app_id)
-            if app_obj:
-                status_text = "Trial Aktif"
-                is_premium_active = ua_entry.is_premium and ua_entry.premium_end_date and ua_entry.premium_end_date > datetime.datetime.utcnow()
-                
-                if is_premium_active:
-                    time_remaining_seconds = (ua_entry.premium_end_date - datetime.datetime.utcnow()).total_seconds()
-                    status_text = f"Premium (Sisa: {int(time_remaining_seconds / 3600)}j)"
-                else:
-                    time_remaining_seconds = (ua_entry.installation_date + datetime.timedelta(hours=trial_duration_hours) - datetime.datetime.utcnow()).total_seconds()
-                    if time_remaining_seconds <= 0:
-                        status_text = "Trial Berakhir"
-                    else:
-                        status_text = f"Trial (Sisa: {int(time_remaining_seconds / 3600)}j)"
-                
-                installed_apps_info.append({
-                    'id': app_obj.id,
-                    'name': app_obj.name,
-                    'status': status_text,
-                    'is_premium': ua_entry.is_premium,
-                    'premium_end_date': ua_entry.premium_end_date.strftime('%Y-%m-%d %H:%M') if ua_entry.premium_end_date else '-'
-                })
-        users_data.append({
+    """
+    Daftar pengguna per halaman, urut username. Paging memakai cursor username (?after= / ?before=),
+    bukan OFFSET, jadi biaya tiap halaman tetap sama berapa pun jumlah pengguna.
+    ?q= mencari username berdasarkan awalan (memakai index unik username).
+    """
+    search = request.args.get('q', '').strip()
+    after = request.args.get('after')
+    before = request.args.get('before')
+
+    query = User.query
+    if search:
+        # Range awalan (bukan LIKE '%..%') supaya tetap memakai index username
+        query = query.filter(User.username >= search, User.username < search + '\uffff')
+
+    if before is not None:
+        users = query.filter(User.username < before).order_by(User.username.desc()).limit(ADMIN_USERS_PER_PAGE + 1).all()
+        has_more = len(users) > ADMIN_USERS_PER_PAGE
+        users = users[:ADMIN_USERS_PER_PAGE][::-1]
+        prev_cursor = users[0].username if users and has_more else None
+        next_cursor = users[-1].username if users else None
+    else:
+        if after is not None:
+            query = query.filter(User.username > after)
+        users = query.order_by(User.username).limit(ADMIN_USERS_PER_PAGE + 1).all()
+        has_more = len(users) > ADMIN_USERS_PER_PAGE
+        users = users[:ADMIN_USERS_PER_PAGE]
+        prev_cursor = users[0].username if users and after is not None else None
+        next_cursor = users[-1].username if users and has_more else None
+
+    all_apps = get_all_apps() # Dibutuhkan untuk modal grant_access
+    installed_apps = _load_installed_apps([user.id for user in users])
+
+    users_data = [
+        {
             'user': user,
-            'installed_apps': installed_apps_info
-        })
+            'installed_apps': installed_apps[user.id]
+        }
+        for user in users
+    ]
     return render_template(
         'admin/admin_dashboard.html', 
         users_data=users_data,
         all_apps=all_apps, # KEMBALIKAN: all_apps dikirim untuk modal
+        search=search,
+        prev_cursor=prev_cursor,
+        next_cursor=next_cursor,
         csrf_token=generate_csrf()
     )
 
@@ -88,7 +140,7 @@ def grant_access(user_id):
         return redirect(url_for('admin.index'))
     
     user = User.query.get(user_id)
-    app = App.query.get(app_id)
+    app = get_app_by_id(app_id)
 
     if not user or not app:
         print("DEBUG: Pengguna atau Aplikasi tidak ditemukan (dari DB).")
@@ -109,6 +161,7 @@ def grant_access(user_id):
         )
         db.session.add(user_app_entry)
         db.session.commit()
+        invalidate_user_apps_cache(user_id)
         print(f"DEBUG: Instalasi baru berhasil dibuat untuk user {user_id} app {app_id}.")
         flash(f'Aplikasi {app.name} berhasil diinstal untuk {user.username}.', 'info')
     
@@ -117,10 +170,13 @@ def grant_access(user_id):
         user_app_entry.is_premium = False
         user_app_entry.premium_end_date = None
         user_app_entry.installation_date = datetime.datetime.utcnow() # Reset trial timer
-        flash(f'Akses percobaan 24 jam untuk {app.name} diberikan kepada {user.username}.', 'success')
+        flash(f'Akses percobaan {TRIAL_DURATION_LABEL} untuk {app.name} diberikan kepada {user.username}.', 'success')
         print(f"DEBUG: Memberikan akses TRIAL untuk user {user.username} app {app.name}.")
 
     elif access_type == 'premium':
+        # Perpanjang dari premium_end_date hanya jika sebelumnya memang premium
+        # (instalasi lama menyimpan premium_end_date +7 hari walau is_premium=False)
+        was_premium = bool(user_app_entry.is_premium)
         user_app_entry.is_premium = True
         premium_duration_timedelta = datetime.timedelta(hours=0)
 
@@ -145,7 +201,7 @@ def grant_access(user_id):
             return redirect(url_for('admin.index'))
         
         current_time = datetime.datetime.utcnow()
-        if user_app_entry.premium_end_date and user_app_entry.premium_end_date > current_time:
+        if was_premium and user_app_entry.premium_end_date and user_app_entry.premium_end_date > current_time:
             user_app_entry.premium_end_date += premium_duration_timedelta
             print(f"DEBUG: Menambahkan durasi premium ke premium_end_date yang ada. New end: {user_app_entry.premium_end_date}")
         else:
@@ -161,6 +217,7 @@ def grant_access(user_id):
     
     try:
         db.session.commit()
+        invalidate_user_apps_cache(user_id)
         print(f"DEBUG: db.session.commit() berhasil!")
         return redirect(url_for('admin.index'))
     except Exception as e:
@@ -178,6 +235,8 @@ def delete_user(user_id):
     if user and not user.is_admin:
         db.session.delete(user)
         db.session.commit()
+        invalidate_user_apps_cache(user_id)
+        invalidate_user_snapshot(user_id)
         flash(f'Pengguna {user.username} berhasil dihapus.', 'success')
     else:
         flash('Tidak dapat menghapus pengguna ini.', 'danger')
@@ -188,11 +247,12 @@ def delete_user(user_id):
 def admin_uninstall_app(user_id, app_id):
     user_app_entry = UserApp.query.filter_by(user_id=user_id, app_id=app_id).first()
     user = User.query.get(user_id)
-    app = App.query.get(app_id)
+    app = get_app_by_id(app_id)
 
     if user_app_entry and user and app:
         db.session.delete(user_app_entry)
         db.session.commit()
+        invalidate_user_apps_cache(user_id)
         flash(f'Aplikasi {app.name} berhasil dihapus dari pengguna {user.username}.', 'success')
     else:
         flash('Instalasi aplikasi tidak ditemukan.', 'danger')
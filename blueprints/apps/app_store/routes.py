@@ -1,36 +1,30 @@
 # File: blueprints/apps/app_store/routes.py
 from flask import render_template, redirect, url_for, flash, request, jsonify # Import jsonify
 from flask_login import login_required, current_user
-from extensions import db, get_app_trial_status
-import datetime
+from extensions import (
+    db, get_all_apps, get_app_by_id, get_app_statuses, get_user_app_grants, get_app_endpoint, invalidate_user_apps_cache
+)
+from access_state import TRIAL_DURATION_LABEL
 
 from . import bp
-from models import App, UserApp # Import models here to avoid circular dependencies in global scope
+from models import UserApp # Import models here to avoid circular dependencies in global scope
 
 @bp.route('/')
 @login_required
 def index():
-    all_apps = App.query.all()
-    user_app_entries = UserApp.query.filter_by(user_id=current_user.id).all()
+    all_apps = get_all_apps()
 
+    # Status semua aplikasi terinstal dari cache grant per user + katalog App (tanpa query per aplikasi)
     installed_app_data = {}
-    for entry in user_app_entries:
-        app_info = App.query.get(entry.app_id)
-        if app_info:
-            app_status = get_app_trial_status(current_user.id, app_info.url)
-            installed_app_data[entry.app_id] = {
-                'is_installed': True,
-                'trial_expired': app_status['trial_expired'],
-                'is_premium_active': app_status['is_premium_active'],
-                'whatsapp_number': app_status['whatsapp_number']
-            }
-        else:
-            installed_app_data[entry.app_id] = {
-                'is_installed': True,
-                'trial_expired': False,
-                'is_premium_active': False,
-                'whatsapp_number': "6289679538444"
-            }
+    app_statuses = get_app_statuses(current_user.id)
+    for grant in get_user_app_grants(current_user.id):
+        app_status = app_statuses[grant.app_url]
+        installed_app_data[grant.app_id] = {
+            'is_installed': True,
+            'trial_expired': app_status['trial_expired'],
+            'is_premium_active': app_status['is_premium_active'],
+            'whatsapp_number': app_status['whatsapp_number']
+        }
 
     return render_template(
         'store.html',
@@ -41,7 +35,7 @@ def index():
 @bp.route('/install/<int:app_id>', methods=['GET', 'POST'])
 @login_required
 def install_app(app_id):
-    app_info = App.query.get(app_id)
+    app_info = get_app_by_id(app_id)
     if not app_info:
         # Periksa apakah permintaan AJAX untuk mengembalikan JSON error
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
@@ -54,24 +48,25 @@ def install_app(app_id):
     if request.method == 'POST':
         # Tentukan URL redirect untuk kedua respons (AJAX dan non-AJAX)
         target_redirect_url = url_for('app_store.index') # Default
-        if app_info.url == 'roas_calculator':
-            target_redirect_url = url_for('calculator_roas.index')
-        # Tambahkan URL aplikasi lain jika diperlukan
+        if get_app_endpoint(app_info.url):
+            target_redirect_url = url_for(get_app_endpoint(app_info.url))
 
         if user_app_entry:
             message = f'Aplikasi {app_info.name} sudah terinstal.'
             category = 'info'
             success = True
         else:
+            # Trial dihitung dari installation_date (durasi di access_state.TRIAL_DURATION)
             new_user_app = UserApp(
                 user_id=current_user.id,
                 app_id=app_id,
                 is_premium=False,
-                premium_end_date=datetime.datetime.utcnow() + datetime.timedelta(days=7)
+                premium_end_date=None
             )
             db.session.add(new_user_app)
             db.session.commit()
-            message = f'Aplikasi {app_info.name} berhasil diinstal dan trial 7 hari diaktifkan!'
+            invalidate_user_apps_cache(current_user.id)
+            message = f'Aplikasi {app_info.name} berhasil diinstal dan trial {TRIAL_DURATION_LABEL} diaktifkan!'
             category = 'success'
             success = True
         
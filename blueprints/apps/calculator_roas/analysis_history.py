@@ -0,0 +1,395 @@
+# File: blueprints/apps/calculator_roas/analysis_history.py
+# Riwayat analisa CSV per user, disimpan sebagai tabel fakta sempit di SQLite lokal (instance/roas_history.db).
+# Satu laporan = (user, toko, tanggal laporan). Yang disimpan hanya selisihnya terhadap laporan sebelumnya:
+# produk baru, produk yang angkanya/tag-nya berubah, dan produk yang tidak ada lagi ('hilang').
+# Produk yang tidak berubah tidak ditulis ulang, jadi ukuran riwayat sebanding dengan jumlah perubahan, bukan
+# jumlah produk x jumlah hari. Kondisi lengkap pada suatu tanggal = baris terakhir tiap produk sampai tanggal itu.
+#
+# Tampilan "apa yang berubah sejak kemarin" cukup membaca baris fakta satu tanggal (sudah berisi selisihnya),
+# tanpa membaca ulang CSV lama. Rollup tren per produk (trends.py) ikut diperbarui saat laporan disimpan.
+# Modul ini tidak bergantung pada request Flask (dipakai juga di proses analisa).
+import datetime
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from flask import current_app
+
+from .trends import TREND_COLUMNS, TREND_WINDOWS_DAYS, dense_series, rolling_rollups
+
+CHANGE_NEW = 'baru'
+CHANGE_UPDATED = 'berubah'
+CHANGE_REMOVED = 'hilang'
+
+HISTORY_VALUE_COLUMNS = ['biaya', 'omzet', 'terjual', 'ctr', 'roas', 'dilihat', 'klik', 'konversi'] # Angka per produk yang disimpan
+HISTORY_DELTA_COLUMNS = ['biaya', 'omzet', 'terjual', 'roas']        # Angka yang selisihnya ikut disimpan (kolom d_*)
+FACT_COLUMNS = ['produk_id', 'change', *HISTORY_VALUE_COLUMNS, 'tag', *(f'd_{column}' for column in HISTORY_DELTA_COLUMNS)]
+CHANGE_TOLERANCE = 1e-9 # Selisih angka di bawah ini dianggap tidak berubah
+
+# Nama kolom riwayat -> nama kolom JSON (camelCase, sama dengan tabel hasil di JavaScript)
+CHANGE_JSON_COLUMNS = {
+    'shop': 'namaToko', 'produk_id': 'produkId', 'nama_produk': 'namaProduk', 'change': 'perubahan',
+    'biaya': 'biaya', 'omzet': 'omzetPenjualan', 'terjual': 'produkTerjual', 'ctr': 'persentaseKlik',
+    'roas': 'ROAS', 'tag': 'tagWarna', 'd_biaya': 'selisihBiaya', 'd_omzet': 'selisihOmzet',
+    'd_terjual': 'selisihTerjual', 'd_roas': 'selisihROAS',
+    'dilihat': 'dilihat', 'klik': 'jumlahKlik', 'konversi': 'konversi',
+}
+
+
+def _optional_numbers(df, column):
+    # Kolom tren (Dilihat, Jumlah Klik, Konversi) bisa tidak ada di laporan lama / hasil analisa lama
+    if column not in df.columns:
+        return 0.0
+    return pd.to_numeric(df[column], errors='coerce').fillna(0)
+
+
+def history_frame(df_analyzed):
+    """
+    Baris hasil analyze_report_frame -> satu baris per produkId (kolom riwayat).
+    Iklan dengan produkId sama dijumlahkan; ROAS dihitung ulang dari jumlahnya.
+    """
+    frame = pd.DataFrame({
+        'produk_id': df_analyzed['produkId'].astype(str),
+        'nama_produk': df_analyzed['namaProduk'].astype(str),
+        'biaya': pd.to_numeric(df_analyzed['biaya'], errors='coerce').fillna(0),
+        'omzet': pd.to_numeric(df_analyzed['omzetPenjualan'], errors='coerce').fillna(0),
+        'terjual': pd.to_numeric(df_analyzed['produkTerjual'], errors='coerce').fillna(0),
+        'ctr': pd.to_numeric(df_analyzed['persentaseKlik'], errors='coerce').fillna(0),
+        'dilihat': _optional_numbers(df_analyzed, 'dilihat'),
+        'klik': _optional_numbers(df_analyzed, 'jumlahKlik'),
+        'konversi': _optional_numbers(df_analyzed, 'konversi'),
+        'tag': df_analyzed['tagWarna'].astype(str),
+    })
+    frame = frame.groupby('produk_id', sort=False, as_index=False).agg(
+        nama_produk=('nama_produk', 'first'), biaya=('biaya', 'sum'), omzet=('omzet', 'sum'),
+        terjual=('terjual', 'sum'), ctr=('ctr', 'first'), dilihat=('dilihat', 'sum'), klik=('klik', 'sum'),
+        konversi=('konversi', 'sum'), tag=('tag', 'first')
+    )
+    frame['roas'] = np.where(frame['biaya'] > 0, frame['omzet'] / frame['biaya'].where(frame['biaya'] > 0, 1), np.nan)
+    return frame
+
+
+def diff_snapshots(previous, current):
+    """
+    Selisih dua kondisi lengkap (kolom riwayat, satu baris per produk), dihitung kolumnar lewat satu merge.
+    Mengembalikan (baris fakta yang perlu disimpan, jumlah produk yang tidak berubah).
+    """
+    value_types = {column: float for column in HISTORY_VALUE_COLUMNS}
+    merged = current.astype(value_types).merge(
+        previous.astype(value_types), on='produk_id', how='outer', suffixes=('', '_prev'), indicator=True
+    )
+    is_new = (merged['_merge'] == 'left_only').to_numpy()
+    is_removed = (merged['_merge'] == 'right_only').to_numpy()
+
+    is_changed = (merged['tag'].fillna('') != merged['tag_prev'].fillna('')).to_numpy()
+    for column in HISTORY_VALUE_COLUMNS:
+        is_changed |= ~np.isclose(
+            merged[column].fillna(0).to_numpy(float), merged[f'{column}_prev'].fillna(0).to_numpy(float),
+            rtol=CHANGE_TOLERANCE, atol=CHANGE_TOLERANCE
+        )
+    merged['change'] = np.select([is_new, is_removed, is_changed], [CHANGE_NEW, CHANGE_REMOVED, CHANGE_UPDATED], default='')
+    for column in HISTORY_DELTA_COLUMNS:
+        merged[f'd_{column}'] = merged[column].fillna(0) - merged[f'{column}_prev'].fillna(0)
+
+    unchanged = int((merged['change'] == '').sum())
+    facts = merged.loc[merged['change'] != '', FACT_COLUMNS + ['nama_produk']]
+    return facts, unchanged
+
+
+class AnalysisHistoryStore:
+    """Tabel laporan + tabel fakta (selisih per produk) + nama produk, di SQLite lokal."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL") # Proses analisa menulis riwayat sambil proses web membacanya
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS analysis_report ("
+                " user_id TEXT NOT NULL,"
+                " shop TEXT NOT NULL,"
+                " report_date TEXT NOT NULL,"
+                " product_count INTEGER NOT NULL,"
+                " new_count INTEGER NOT NULL,"
+                " updated_count INTEGER NOT NULL,"
+                " removed_count INTEGER NOT NULL,"
+                " recorded_at REAL NOT NULL,"
+                " PRIMARY KEY (user_id, shop, report_date)) WITHOUT ROWID"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS analysis_fact ("
+                " user_id TEXT NOT NULL,"
+                " shop TEXT NOT NULL,"
+                " report_date TEXT NOT NULL,"
+                " produk_id TEXT NOT NULL,"
+                " change TEXT NOT NULL,"
+                " biaya REAL, omzet REAL, terjual REAL, ctr REAL, roas REAL, tag TEXT,"
+                " d_biaya REAL, d_omzet REAL, d_terjual REAL, d_roas REAL,"
+                " dilihat REAL, klik REAL, konversi REAL,"
+                " PRIMARY KEY (user_id, shop, report_date, produk_id)) WITHOUT ROWID"
+            )
+            # Riwayat yang dibuat sebelum ada kolom tren: tambahkan kolomnya (riwayat lama tetap dipakai)
+            fact_columns = {row[1] for row in conn.execute("PRAGMA table_info(analysis_fact)")}
+            for column in ('dilihat', 'klik', 'konversi'):
+                if column not in fact_columns:
+                    conn.execute(f"ALTER TABLE analysis_fact ADD COLUMN {column} REAL")
+            # Untuk menyusun kondisi lengkap: baris terakhir tiap produk sampai tanggal tertentu
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_analysis_fact_product ON analysis_fact (user_id, shop, produk_id, report_date)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS analysis_product_name ("
+                " user_id TEXT NOT NULL,"
+                " produk_id TEXT NOT NULL,"
+                " nama_produk TEXT,"
+                " PRIMARY KEY (user_id, produk_id)) WITHOUT ROWID"
+            )
+            # Rollup tren per produk per tanggal laporan; primary key diawali (user, produk) untuk /trends/<produkId>
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS product_trend ("
+                " user_id TEXT NOT NULL,"
+                " produk_id TEXT NOT NULL,"
+                " shop TEXT NOT NULL,"
+                " report_date TEXT NOT NULL,"
+                f" {', '.join(f'{column} REAL' for column in TREND_COLUMNS)},"
+                " PRIMARY KEY (user_id, produk_id, shop, report_date)) WITHOUT ROWID"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_product_trend_report ON product_trend (user_id, shop, report_date)")
+
+    def _connect(self):
+        # Satu koneksi per thread (sqlite3 tidak boleh dipakai lintas thread)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def _report_date_near(self, conn, user_id, shop, report_date, before):
+        row = conn.execute(
+            "SELECT MAX(report_date) FROM analysis_report WHERE user_id = ? AND shop = ? AND report_date < ?" if before else
+            "SELECT MIN(report_date) FROM analysis_report WHERE user_id = ? AND shop = ? AND report_date > ?",
+            (user_id, shop, report_date)
+        ).fetchone()
+        return row[0]
+
+    def _snapshot(self, conn, user_id, shop, report_date):
+        """Kondisi lengkap toko pada report_date (kolom riwayat); kosong jika belum ada laporan sampai tanggal itu."""
+        if report_date is None:
+            return pd.DataFrame(columns=['produk_id', *HISTORY_VALUE_COLUMNS, 'tag'])
+        # SQLite: kolom non-agregat pada query MAX() diambil dari baris yang nilainya maksimum
+        snapshot = pd.read_sql_query(
+            f"SELECT produk_id, MAX(report_date) AS report_date, change, {', '.join(HISTORY_VALUE_COLUMNS)}, tag"
+            " FROM analysis_fact WHERE user_id = ? AND shop = ? AND report_date <= ? GROUP BY produk_id",
+            conn, params=(user_id, shop, report_date)
+        )
+        snapshot = snapshot[snapshot['change'] != CHANGE_REMOVED]
+        return snapshot[['produk_id', *HISTORY_VALUE_COLUMNS, 'tag']].reset_index(drop=True)
+
+    def _write_report(self, conn, user_id, shop, report_date, previous, current):
+        facts, unchanged = diff_snapshots(previous, current)
+        conn.execute("DELETE FROM analysis_fact WHERE user_id = ? AND shop = ? AND report_date = ?", (user_id, shop, report_date))
+        rows = facts[FACT_COLUMNS].astype(object).where(facts[FACT_COLUMNS].notna(), None)
+        conn.executemany(
+            f"INSERT INTO analysis_fact (user_id, shop, report_date, {', '.join(FACT_COLUMNS)})"
+            f" VALUES (?, ?, ?, {', '.join('?' * len(FACT_COLUMNS))})",
+            ((user_id, shop, report_date, *row) for row in rows.itertuples(index=False, name=None))
+        )
+        named = facts[(facts['change'] != CHANGE_REMOVED) & facts['nama_produk'].notna()]
+        conn.executemany(
+            "INSERT OR REPLACE INTO analysis_product_name (user_id, produk_id, nama_produk) VALUES (?, ?, ?)",
+            ((user_id, produk_id, nama) for produk_id, nama in zip(named['produk_id'], named['nama_produk']))
+        )
+        counts = facts['change'].value_counts()
+        summary = {
+            'shop': shop,
+            'report_date': report_date,
+            'product_count': len(current),
+            'new_count': int(counts.get(CHANGE_NEW, 0)),
+            'updated_count': int(counts.get(CHANGE_UPDATED, 0)),
+            'removed_count': int(counts.get(CHANGE_REMOVED, 0)),
+            'unchanged_count': unchanged,
+        }
+        conn.execute(
+            "INSERT OR REPLACE INTO analysis_report (user_id, shop, report_date, product_count, new_count, updated_count,"
+            " removed_count, recorded_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (user_id, shop, report_date, summary['product_count'], summary['new_count'], summary['updated_count'],
+             summary['removed_count'], time.time())
+        )
+        return summary
+
+    def record_report(self, user_id, shop, report_date, df_analyzed):
+        """
+        Menyimpan satu laporan hasil analisa (selisihnya terhadap laporan sebelumnya milik toko yang sama).
+        Laporan untuk tanggal yang sudah ada menggantikan yang lama; laporan yang diunggah tidak urut
+        (lebih lama dari laporan terakhir) ikut memperbarui selisih laporan sesudahnya.
+        Mengembalikan ringkasan perubahan (dict) + previous_date.
+        """
+        shop = shop or ''
+        report_date = report_date.isoformat()
+        current = history_frame(df_analyzed)
+        conn = self._connect()
+        with conn:
+            next_date = self._report_date_near(conn, user_id, shop, report_date, before=False)
+            next_snapshot = self._snapshot(conn, user_id, shop, next_date) if next_date else None
+            previous_date = self._report_date_near(conn, user_id, shop, report_date, before=True)
+
+            summary = self._write_report(conn, user_id, shop, report_date, self._snapshot(conn, user_id, shop, previous_date), current)
+            if next_date:
+                self._write_report(conn, user_id, shop, next_date, current.drop(columns='nama_produk'), next_snapshot.assign(nama_produk=None))
+            self._refresh_trends(conn, user_id, shop, report_date)
+        summary['previous_date'] = previous_date
+        return summary
+
+    def _refresh_trends(self, conn, user_id, shop, report_date):
+        """
+        Menghitung ulang rollup tren untuk laporan report_date dan laporan sesudahnya yang jendelanya mencakup
+        report_date. Riwayat yang dibaca hanya rentang jendela terpanjang sebelum tanggal-tanggal itu.
+        """
+        longest = datetime.timedelta(days=max(TREND_WINDOWS_DAYS) - 1)
+        first_target = datetime.date.fromisoformat(report_date)
+        targets = [row[0] for row in conn.execute(
+            "SELECT report_date FROM analysis_report WHERE user_id = ? AND shop = ? AND report_date >= ? AND report_date <= ?"
+            " ORDER BY report_date",
+            (user_id, shop, report_date, (first_target + longest).isoformat())
+        ).fetchall()]
+        range_start = (first_target - longest).isoformat()
+        report_dates = [row[0] for row in conn.execute(
+            "SELECT report_date FROM analysis_report WHERE user_id = ? AND shop = ? AND report_date >= ? AND report_date <= ?"
+            " ORDER BY report_date",
+            (user_id, shop, range_start, targets[-1])
+        ).fetchall()]
+
+        seed = self._snapshot(conn, user_id, shop, self._report_date_near(conn, user_id, shop, range_start, before=True))
+        facts = pd.read_sql_query(
+            f"SELECT produk_id, report_date, change, {', '.join(HISTORY_VALUE_COLUMNS)} FROM analysis_fact"
+            " WHERE user_id = ? AND shop = ? AND report_date >= ? AND report_date <= ?",
+            conn, params=(user_id, shop, range_start, targets[-1])
+        )
+        rollups = rolling_rollups(dense_series(seed, facts, report_dates, CHANGE_REMOVED))
+        rollups = rollups[rollups['report_date'].isin(targets)]
+
+        conn.executemany(
+            "DELETE FROM product_trend WHERE user_id = ? AND shop = ? AND report_date = ?",
+            ((user_id, shop, target) for target in targets)
+        )
+        values = rollups[TREND_COLUMNS].astype(object).where(rollups[TREND_COLUMNS].notna(), None)
+        conn.executemany(
+            f"INSERT INTO product_trend (user_id, produk_id, shop, report_date, {', '.join(TREND_COLUMNS)})"
+            f" VALUES (?, ?, ?, ?, {', '.join('?' * len(TREND_COLUMNS))})",
+            ((user_id, produk_id, shop, target, *row) for produk_id, target, row in zip(
+                rollups['produk_id'], rollups['report_date'], values.itertuples(index=False, name=None)
+            ))
+        )
+
+    def product_trend(self, user_id, produk_id, shop=None):
+        """Rollup tren satu produk (semua tanggal laporan, urut per toko lalu tanggal), langsung dari product_trend."""
+        return self._connect().execute(
+            f"SELECT shop, report_date, {', '.join(TREND_COLUMNS)} FROM product_trend WHERE user_id = ? AND produk_id = ?"
+            + ("" if shop is None else " AND shop = ?") + " ORDER BY shop, report_date",
+            (user_id, str(produk_id)) + (() if shop is None else (shop,))
+        ).fetchall()
+
+    def product_name(self, user_id, produk_id):
+        row = self._connect().execute(
+            "SELECT nama_produk FROM analysis_product_name WHERE user_id = ? AND produk_id = ?", (user_id, str(produk_id))
+        ).fetchone()
+        return row[0] if row else None
+
+    def list_reports(self, user_id):
+        return [dict(row) for row in self._connect().execute(
+            "SELECT shop, report_date, product_count, new_count, updated_count, removed_count, recorded_at"
+            " FROM analysis_report WHERE user_id = ? ORDER BY report_date DESC, shop",
+            (user_id,)
+        ).fetchall()]
+
+    def changes(self, user_id, report_date=None, shop=None):
+        """
+        Perubahan produk pada satu tanggal laporan (default: tanggal terakhir) dibanding laporan sebelumnya,
+        langsung dari baris fakta tanggal itu. shop=None berarti semua toko.
+        Mengembalikan (report_date, list ringkasan laporan, list baris perubahan) atau (None, [], []).
+        """
+        conn = self._connect()
+        shop_filter, shop_params = ("", ()) if shop is None else (" AND shop = ?", (shop,))
+        if report_date is None:
+            report_date = conn.execute(
+                "SELECT MAX(report_date) FROM analysis_report WHERE user_id = ?" + shop_filter, (user_id, *shop_params)
+            ).fetchone()[0]
+            if report_date is None:
+                return None, [], []
+        reports = []
+        for row in conn.execute(
+            "SELECT shop, report_date, product_count, new_count, updated_count, removed_count FROM analysis_report"
+            " WHERE user_id = ? AND report_date = ?" + shop_filter + " ORDER BY shop",
+            (user_id, report_date, *shop_params)
+        ).fetchall():
+            report = dict(row)
+            report['previous_date'] = self._report_date_near(conn, user_id, report['shop'], report_date, before=True)
+            reports.append(report)
+        rows = conn.execute(
+            "SELECT f.shop, f.produk_id, n.nama_produk, f.change, f.biaya, f.omzet, f.terjual, f.ctr, f.roas, f.tag,"
+            " f.d_biaya, f.d_omzet, f.d_terjual, f.d_roas, f.dilihat, f.klik, f.konversi FROM analysis_fact f"
+            " LEFT JOIN analysis_product_name n ON n.user_id = f.user_id AND n.produk_id = f.produk_id"
+            " WHERE f.user_id = ? AND f.report_date = ?" + ("" if shop is None else " AND f.shop = ?") +
+            " ORDER BY f.shop, f.change, ABS(f.d_omzet) DESC",
+            (user_id, report_date, *shop_params)
+        ).fetchall()
+        return report_date, reports, [{CHANGE_JSON_COLUMNS[key]: row[key] for key in row.keys()} for row in rows]
+
+
+def report_groups(parts):
+    """
+    Mengelompokkan hasil analisa per laporan riwayat: list (toko, tanggal, DataFrame) -> dict (toko, tanggal) -> DataFrame.
+    Beberapa file dengan toko & tanggal yang sama (mis. tanpa nama toko di preamble) digabung jadi satu laporan.
+    """
+    groups = {}
+    for shop, report_date, df_analyzed in parts:
+        if df_analyzed is None or df_analyzed.empty:
+            continue
+        groups.setdefault((shop or '', report_date), []).append(df_analyzed)
+    return {key: pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0] for key, frames in groups.items()}
+
+
+def record_history(store, user_id, parts):
+    """Menyimpan riwayat semua laporan di parts (lihat report_groups). Mengembalikan list ringkasan perubahan."""
+    return [
+        store.record_report(user_id, shop, report_date, df_analyzed)
+        for (shop, report_date), df_analyzed in sorted(report_groups(parts).items(), key=lambda item: item[0][1])
+    ]
+
+
+def _format_date(iso_date):
+    return datetime.date.fromisoformat(iso_date).strftime('%d/%m/%Y')
+
+
+def history_summary_lines(summaries):
+    """Kalimat ringkasan perubahan untuk label_keterangan hasil analisa."""
+    lines = []
+    for summary in summaries:
+        shop = f" ({summary['shop']})" if summary['shop'] else ''
+        if summary['previous_date'] is None:
+            lines.append(
+                f"Laporan {_format_date(summary['report_date'])}{shop} disimpan sebagai riwayat pertama ({summary['product_count']} produk)."
+            )
+        else:
+            lines.append(
+                f"Dibanding laporan {_format_date(summary['previous_date'])}{shop}: {summary['new_count']} produk baru, "
+                f"{summary['updated_count']} berubah, {summary['removed_count']} tidak ada lagi, {summary['unchanged_count']} tetap."
+            )
+    return lines
+
+
+def history_store_path(app):
+    return app.config.get('ROAS_HISTORY_DB_PATH') or os.path.join(app.instance_path, 'roas_history.db')
+
+
+def get_analysis_history():
+    """Mengembalikan store riwayat analisa milik aplikasi aktif (dibuat sekali per proses)."""
+    app = current_app._get_current_object()
+    store = app.extensions.get('roas_analysis_history')
+    if store is None:
+        os.makedirs(app.instance_path, exist_ok=True)
+        store = AnalysisHistoryStore(history_store_path(app))
+        app.extensions['roas_analysis_history'] = store
+    return store
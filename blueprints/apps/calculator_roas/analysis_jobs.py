@@ -0,0 +1,534 @@
+# File: blueprints/apps/calculator_roas/analysis_jobs.py
+# Job analisa CSV asinkron (satu atau beberapa laporan toko sekaligus).
+# Upload disimpan ke folder instance, dicatat di tabel job SQLite lokal, lalu dianalisa di process pool yang
+# ukurannya dibatasi (ROAS_ANALYSIS_JOB_WORKERS). Request upload langsung mengembalikan job_id; frontend mem-poll
+# /analyze/status/<job_id> untuk progress (baris dibaca / baris dianalisa) dan hasil akhirnya.
+#
+# Setiap file adalah task tersendiri di pool, jadi beberapa laporan diparse & dianalisa paralel di beberapa core.
+# Task file yang selesai terakhir mengambil langkah gabung (merge): hasil semua toko digabung jadi satu tabel
+# berperingkat dengan kolom toko. File yang gagal dilaporkan per file, tidak menggagalkan file lain.
+#
+# Status job : queued -> running -> merging -> done / failed
+# Status file: queued -> running -> done / failed
+# Karena status, file upload, dan hasil per file ada di disk, job yang belum selesai saat server restart
+# dilanjutkan: task 'queued' dikirim lagi ke pool, task 'running'/'merging' yang prosesnya sudah mati (atau
+# heartbeat-nya basi) dikembalikan ke antrean. Pengambilan task memakai UPDATE atomik, jadi satu task hanya
+# dikerjakan satu proses walaupun beberapa worker gunicorn mengirimkannya bersamaan.
+# Jika riwayat analisa aktif, langkah gabung juga menyimpan selisih tiap laporan ke riwayat (analysis_history).
+import datetime
+import json
+import multiprocessing
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+from flask import current_app
+
+from .analysis_history import AnalysisHistoryStore, history_store_path, history_summary_lines, record_history
+from .csv_analysis import (
+    analyze_report_frame, build_csv_result, count_shops, empty_shop_messages, merge_shop_frames, report_shop_name,
+    shop_name_from_filename
+)
+from .csv_ingest import peek_report_meta, read_shopee_report
+from .result_store import open_result_store, result_store_spec
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_MERGING = 'merging'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+JOB_SCHEMA_VERSION = 3                # Naikkan jika skema tabel berubah (job lama dibuang, isinya hanya sementara)
+DEFAULT_JOB_WORKERS = 2               # Ukuran process pool per worker web
+DEFAULT_JOB_STALE_SECONDS = 300       # Task tanpa progress selama ini dianggap mati dan diantrikan ulang
+DEFAULT_MAX_ACTIVE_JOBS_PER_USER = 3  # Batas job yang belum selesai per user
+DEFAULT_MAX_FILES_PER_JOB = 10        # Batas jumlah laporan (toko) per upload
+JOB_START_METHOD = 'spawn'            # Proses analisa tidak mewarisi thread / koneksi DB milik proses web
+EVICT_INTERVAL_SECONDS = 300          # Pembersihan job lama paling sering tiap 5 menit
+PARENT_CHECK_SECONDS = 2              # Proses analisa berhenti sendiri jika proses web induknya sudah mati
+
+
+class AnalysisQueueFull(Exception):
+    """User sudah punya terlalu banyak job analisa yang belum selesai (atau terlalu banyak file sekaligus)."""
+
+
+def _new_job_id():
+    return secrets.token_urlsafe(9)
+
+
+def _pid_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True # Proses ada, tapi milik user lain
+    return True
+
+
+def _remove_file(path):
+    if not path:
+        return
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class AnalysisJobStore:
+    """Tabel job + tabel file per job di SQLite lokal; dipakai bersama oleh proses web dan proses analisa."""
+
+    def __init__(self, path):
+        self.path = path
+        self._last_evict = 0
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL") # Proses analisa menulis progress sambil proses web membaca status
+            if conn.execute("PRAGMA user_version").fetchone()[0] != JOB_SCHEMA_VERSION:
+                conn.execute("DROP TABLE IF EXISTS analysis_job_file")
+                conn.execute("DROP TABLE IF EXISTS analysis_job")
+                conn.execute(f"PRAGMA user_version = {JOB_SCHEMA_VERSION}")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS analysis_job ("
+                " id TEXT PRIMARY KEY,"
+                " user_id TEXT NOT NULL,"
+                " status TEXT NOT NULL,"
+                " file_count INTEGER NOT NULL,"
+                " worker_pid INTEGER,"
+                " result_id TEXT,"
+                " messages TEXT,"
+                " error TEXT,"
+                " created_at REAL NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_analysis_job_status ON analysis_job (status, updated_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_analysis_job_user ON analysis_job (user_id, status)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS analysis_job_file ("
+                " job_id TEXT NOT NULL,"
+                " file_index INTEGER NOT NULL,"
+                " filename TEXT,"
+                " shop TEXT NOT NULL,"
+                " upload_path TEXT NOT NULL,"
+                " part_path TEXT,"
+                " report_date TEXT,"
+                " status TEXT NOT NULL,"
+                " rows_parsed INTEGER NOT NULL DEFAULT 0,"
+                " rows_analyzed INTEGER NOT NULL DEFAULT 0,"
+                " worker_pid INTEGER,"
+                " error TEXT,"
+                " updated_at REAL NOT NULL,"
+                " PRIMARY KEY (job_id, file_index)) WITHOUT ROWID"
+            )
+
+    def _connect(self):
+        # Satu koneksi per thread (sqlite3 tidak boleh dipakai lintas thread)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def create(self, user_id, files):
+        """files: list (filename, nama_toko, upload_path). Mengembalikan job_id."""
+        job_id = _new_job_id()
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO analysis_job (id, user_id, status, file_count, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, user_id, JOB_QUEUED, len(files), now, now)
+            )
+            conn.executemany(
+                "INSERT INTO analysis_job_file (job_id, file_index, filename, shop, upload_path, status, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((job_id, index, filename, shop, upload_path, JOB_QUEUED, now)
+                 for index, (filename, shop, upload_path) in enumerate(files))
+            )
+        return job_id
+
+    def get(self, job_id, user_id=None):
+        """Job (dict) + daftar file-nya di 'files', plus total rows_parsed / rows_analyzed semua file."""
+        conn = self._connect()
+        row = conn.execute("SELECT * FROM analysis_job WHERE id = ?", (job_id,)).fetchone()
+        if row is None or (user_id is not None and row['user_id'] != user_id):
+            return None
+        job = dict(row)
+        job['files'] = [dict(file_row) for file_row in conn.execute(
+            "SELECT * FROM analysis_job_file WHERE job_id = ? ORDER BY file_index", (job_id,)
+        ).fetchall()]
+        job['rows_parsed'] = sum(file_row['rows_parsed'] for file_row in job['files'])
+        job['rows_analyzed'] = sum(file_row['rows_analyzed'] for file_row in job['files'])
+        return job
+
+    def count_active(self, user_id):
+        return self._connect().execute(
+            "SELECT COUNT(*) FROM analysis_job WHERE user_id = ? AND status IN (?, ?, ?)",
+            (user_id, JOB_QUEUED, JOB_RUNNING, JOB_MERGING)
+        ).fetchone()[0]
+
+    def claim_file(self, job_id, file_index):
+        """File queued -> running secara atomik; False jika sudah diambil proses lain (atau sudah selesai)."""
+        now = time.time()
+        with self._connect() as conn:
+            claimed = conn.execute(
+                "UPDATE analysis_job_file SET status = ?, worker_pid = ?, rows_parsed = 0, rows_analyzed = 0, updated_at = ?"
+                " WHERE job_id = ? AND file_index = ? AND status = ?",
+                (JOB_RUNNING, os.getpid(), now, job_id, file_index, JOB_QUEUED)
+            ).rowcount == 1
+            if claimed:
+                conn.execute(
+                    "UPDATE analysis_job SET status = ?, updated_at = ? WHERE id = ? AND status = ?",
+                    (JOB_RUNNING, now, job_id, JOB_QUEUED)
+                )
+        return claimed
+
+    def file_progress(self, job_id, file_index, rows_parsed=None, rows_analyzed=None):
+        """Memperbarui counter progress satu file (sekaligus heartbeat task-nya)."""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE analysis_job_file SET rows_parsed = COALESCE(?, rows_parsed), rows_analyzed = COALESCE(?, rows_analyzed),"
+                " updated_at = ? WHERE job_id = ? AND file_index = ? AND status = ?",
+                (rows_parsed, rows_analyzed, time.time(), job_id, file_index, JOB_RUNNING)
+            )
+
+    def finish_file(self, job_id, file_index, part_path, report_date=None, shop=None):
+        # shop = kunci toko final (dari preamble); None = tetap nama dari file
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE analysis_job_file SET status = ?, part_path = ?, report_date = ?, shop = COALESCE(?, shop), updated_at = ?"
+                " WHERE job_id = ? AND file_index = ?",
+                (JOB_DONE, part_path, report_date, shop, time.time(), job_id, file_index)
+            )
+
+    def fail_file(self, job_id, file_index, error):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE analysis_job_file SET status = ?, error = ?, updated_at = ? WHERE job_id = ? AND file_index = ? AND status != ?",
+                (JOB_FAILED, error, time.time(), job_id, file_index, JOB_DONE)
+            )
+
+    def claim_merge(self, job_id):
+        """Job -> merging secara atomik, hanya jika semua file sudah selesai (berhasil atau gagal)."""
+        with self._connect() as conn:
+            return conn.execute(
+                "UPDATE analysis_job SET status = ?, worker_pid = ?, updated_at = ?"
+                " WHERE id = ? AND status IN (?, ?) AND NOT EXISTS ("
+                "  SELECT 1 FROM analysis_job_file WHERE job_id = ? AND status IN (?, ?))",
+                (JOB_MERGING, os.getpid(), time.time(), job_id, JOB_QUEUED, JOB_RUNNING, job_id, JOB_QUEUED, JOB_RUNNING)
+            ).rowcount == 1
+
+    def finish(self, job_id, result_id, messages):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE analysis_job SET status = ?, result_id = ?, messages = ?, updated_at = ? WHERE id = ?",
+                (JOB_DONE, result_id, json.dumps(messages), time.time(), job_id)
+            )
+
+    def fail(self, job_id, error, messages=()):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE analysis_job SET status = ?, error = ?, messages = ?, updated_at = ? WHERE id = ? AND status != ?",
+                (JOB_FAILED, error, json.dumps(list(messages)), time.time(), job_id, JOB_DONE)
+            )
+
+    def requeue_dead(self, stale_before, job_id=None):
+        """
+        Task yang prosesnya sudah mati atau heartbeat-nya lebih lama dari stale_before dikembalikan ke antrean:
+        file 'running' -> 'queued', job 'merging' -> 'running'. Mengembalikan jumlah task yang diantrikan ulang.
+        """
+        conn = self._connect()
+        params = [] if job_id is None else [job_id]
+        dead_files = [
+            (row['job_id'], row['file_index'])
+            for row in conn.execute(
+                "SELECT job_id, file_index, worker_pid, updated_at FROM analysis_job_file WHERE status = ?"
+                + ("" if job_id is None else " AND job_id = ?"),
+                [JOB_RUNNING, *params]
+            ).fetchall()
+            if row['updated_at'] < stale_before or not _pid_alive(row['worker_pid'])
+        ]
+        dead_merges = [
+            row['id']
+            for row in conn.execute(
+                "SELECT id, worker_pid, updated_at FROM analysis_job WHERE status = ?" + ("" if job_id is None else " AND id = ?"),
+                [JOB_MERGING, *params]
+            ).fetchall()
+            if row['updated_at'] < stale_before or not _pid_alive(row['worker_pid'])
+        ]
+        with conn:
+            conn.executemany(
+                "UPDATE analysis_job_file SET status = ?, worker_pid = NULL WHERE job_id = ? AND file_index = ? AND status = ?",
+                ((JOB_QUEUED, dead_job_id, file_index, JOB_RUNNING) for dead_job_id, file_index in dead_files)
+            )
+            conn.executemany(
+                "UPDATE analysis_job SET status = ?, worker_pid = NULL WHERE id = ? AND status = ?",
+                ((JOB_RUNNING, dead_job_id, JOB_MERGING) for dead_job_id in dead_merges)
+            )
+        return len(dead_files) + len(dead_merges)
+
+    def pending_tasks(self, job_id=None):
+        """
+        Task yang perlu dikirim ke pool: ('file', job_id, file_index) untuk file 'queued', dan ('merge', job_id)
+        untuk job yang belum selesai tapi semua file-nya sudah selesai.
+        """
+        conn = self._connect()
+        job_filter, params = ("", []) if job_id is None else (" AND j.id = ?", [job_id])
+        tasks = [
+            ('file', row['job_id'], row['file_index'])
+            for row in conn.execute(
+                "SELECT f.job_id, f.file_index FROM analysis_job_file f JOIN analysis_job j ON j.id = f.job_id"
+                " WHERE f.status = ? AND j.status IN (?, ?)" + job_filter + " ORDER BY j.created_at, f.file_index",
+                [JOB_QUEUED, JOB_QUEUED, JOB_RUNNING, *params]
+            ).fetchall()
+        ]
+        tasks += [
+            ('merge', row['id'])
+            for row in conn.execute(
+                "SELECT j.id FROM analysis_job j WHERE j.status IN (?, ?)" + job_filter +
+                " AND NOT EXISTS (SELECT 1 FROM analysis_job_file f WHERE f.job_id = j.id AND f.status IN (?, ?))",
+                [JOB_QUEUED, JOB_RUNNING, *params, JOB_QUEUED, JOB_RUNNING]
+            ).fetchall()
+        ]
+        return tasks
+
+    def evict_finished(self, cutoff):
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM analysis_job_file WHERE job_id IN ("
+                " SELECT id FROM analysis_job WHERE status IN (?, ?) AND updated_at <= ?)",
+                (JOB_DONE, JOB_FAILED, cutoff)
+            )
+            conn.execute("DELETE FROM analysis_job WHERE status IN (?, ?) AND updated_at <= ?", (JOB_DONE, JOB_FAILED, cutoff))
+
+    def maybe_evict(self, ttl_seconds, now=None):
+        now = now or time.time()
+        if now - self._last_evict >= EVICT_INTERVAL_SECONDS:
+            self._last_evict = now
+            self.evict_finished(now - ttl_seconds)
+
+
+_worker_stores = {} # Store job / riwayat per path, dipakai ulang antar task di proses analisa yang sama
+
+
+def _worker_store(db_path, store_class=AnalysisJobStore):
+    store = _worker_stores.get((store_class, db_path))
+    if store is None:
+        store = _worker_stores[(store_class, db_path)] = store_class(db_path)
+    return store
+
+
+def _exit_when_orphaned(parent_pid):
+    while True:
+        time.sleep(PARENT_CHECK_SECONDS)
+        if os.getppid() != parent_pid:
+            os._exit(1)
+
+
+def _init_analysis_worker(parent_pid):
+    # Tanpa ini proses analisa tetap hidup setelah server di-restart/kill. Task yang sedang dikerjakan
+    # tertinggal 'running' dengan worker_pid yang sudah mati, lalu diantrikan ulang oleh server yang baru.
+    threading.Thread(target=_exit_when_orphaned, args=(parent_pid,), daemon=True).start()
+
+
+def run_file_task(job_db_path, job_id, file_index, result_spec, history_path=None):
+    """Dijalankan di proses analisa: parse + rekomendasi satu laporan, hasilnya disimpan sebagai file sementara."""
+    store = _worker_store(job_db_path)
+    if not store.claim_file(job_id, file_index):
+        return
+    job = store.get(job_id)
+    job_file = job['files'][file_index]
+    try:
+        with open(job_file['upload_path'], 'rb') as upload:
+            # Tanggal laporan & toko untuk riwayat: dari preamble, atau tanggal upload jika tidak tercantum
+            upload, meta = peek_report_meta(upload)
+            report_date = meta.report_date or datetime.date.fromtimestamp(job['created_at'])
+            df_to_analyze = read_shopee_report(
+                upload, on_progress=lambda rows: store.file_progress(job_id, file_index, rows_parsed=rows)
+            )
+        print(f"\n--- DEBUG: Job {job_id} file {file_index}: {len(df_to_analyze)} baris 'Berjalan' ---")
+        analyzed = analyze_report_frame(
+            df_to_analyze, on_progress=lambda rows: store.file_progress(job_id, file_index, rows_analyzed=rows)
+        )
+        part_path = f"{os.path.splitext(job_file['upload_path'])[0]}.pkl"
+        analyzed.to_pickle(part_path)
+        store.finish_file(job_id, file_index, part_path, report_date.isoformat(), report_shop_name(meta.shop, job_file['shop']))
+    except Exception as e:
+        print(f"Error processing CSV job {job_id} file {file_index}: {e}")
+        store.fail_file(
+            job_id, file_index,
+            f"Gagal memproses file CSV '{job_file['filename']}'. Pastikan format file benar atau coba dengan file lain. Detail: {e}"
+        )
+    _remove_file(job_file['upload_path'])
+    _merge_if_complete(store, job_id, result_spec, history_path)
+
+
+def run_merge_task(job_db_path, job_id, result_spec, history_path=None):
+    """Langkah gabung yang dikirim ulang setelah restart (biasanya dikerjakan langsung oleh task file terakhir)."""
+    _merge_if_complete(_worker_store(job_db_path), job_id, result_spec, history_path)
+
+
+def _record_job_history(history_path, user_id, done_files, frames):
+    """Menyimpan riwayat laporan job; gagal menyimpan riwayat tidak menggagalkan hasil analisa."""
+    try:
+        return record_history(_worker_store(history_path, AnalysisHistoryStore), user_id, [
+            (job_file['shop'], datetime.date.fromisoformat(job_file['report_date']), frame)
+            for job_file, frame in zip(done_files, frames)
+        ])
+    except Exception as e:
+        print(f"WARNING: Riwayat analisa tidak tersimpan: {e}")
+        return []
+
+
+def _merge_if_complete(store, job_id, result_spec, history_path=None):
+    if not store.claim_merge(job_id):
+        return
+    job = store.get(job_id)
+    done_files = [job_file for job_file in job['files'] if job_file['status'] == JOB_DONE]
+    file_errors = [
+        {'category': 'danger', 'message': job_file['error']}
+        for job_file in job['files'] if job_file['status'] == JOB_FAILED
+    ]
+    try:
+        if not done_files:
+            store.fail(job_id, "Tidak ada file CSV yang berhasil dianalisa.", file_errors)
+        else:
+            frames = [pd.read_pickle(job_file['part_path']) for job_file in done_files]
+            history = _record_job_history(history_path, job['user_id'], done_files, frames) if history_path else []
+            parts = [(job_file['shop'], frame) for job_file, frame in zip(done_files, frames)]
+            result_data, flash_messages, analyzed_products = build_csv_result(merge_shop_frames(parts), shop_count=count_shops(parts))
+            flash_messages = empty_shop_messages(parts) + flash_messages
+            if analyzed_products:
+                result_data['label_keterangan'].extend(history_summary_lines(history))
+            result_id = open_result_store(result_spec).save(
+                job['user_id'], {'mode': 'csv', 'result': result_data}, products=analyzed_products
+            )
+            store.finish(job_id, result_id, file_errors + flash_messages)
+    except Exception as e:
+        print(f"Error merging CSV job {job_id}: {e}")
+        store.fail(job_id, f"Gagal menggabungkan hasil analisa. Detail: {e}", file_errors)
+    for job_file in job['files']:
+        _remove_file(job_file['part_path'])
+
+
+class AnalysisJobQueue:
+    """Sisi proses web: menyimpan upload, membuat job, dan mengirim task-nya ke process pool (dibuat saat dibutuhkan)."""
+
+    def __init__(self, store, upload_dir, result_spec, max_workers=DEFAULT_JOB_WORKERS,
+                 stale_seconds=DEFAULT_JOB_STALE_SECONDS, max_active_per_user=DEFAULT_MAX_ACTIVE_JOBS_PER_USER,
+                 max_files=DEFAULT_MAX_FILES_PER_JOB, history_path=None):
+        self.store = store
+        self.upload_dir = upload_dir
+        self.result_spec = result_spec
+        self.history_path = history_path # None = riwayat analisa tidak disimpan
+        self.max_workers = max_workers
+        self.stale_seconds = stale_seconds
+        self.max_active_per_user = max_active_per_user
+        self.max_files = max_files
+        self._executor = None
+        self._submitted = set() # Task yang sedang ada di pool proses ini
+        self._lock = threading.Lock()
+        os.makedirs(upload_dir, exist_ok=True)
+
+    def _dispatch(self, task):
+        if task[0] == 'file':
+            func, args = run_file_task, (self.store.path, task[1], task[2], self.result_spec, self.history_path)
+        else:
+            func, args = run_merge_task, (self.store.path, task[1], self.result_spec, self.history_path)
+        with self._lock:
+            if task in self._submitted:
+                return
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context(JOB_START_METHOD),
+                    initializer=_init_analysis_worker, initargs=(os.getpid(),)
+                )
+            future = self._executor.submit(func, *args)
+            self._submitted.add(task)
+        future.add_done_callback(lambda f: self._on_done(task, f))
+
+    def _on_done(self, task, future):
+        with self._lock:
+            self._submitted.discard(task)
+        error = future.exception()
+        if error is None:
+            return
+        print(f"WARNING: Task analisa {task} berhenti: {error!r}")
+        if isinstance(error, BrokenProcessPool):
+            with self._lock:
+                self._executor = None # Pool rusak (mis. proses analisa kehabisan memori) dibuat ulang saat task berikutnya
+        if task[0] == 'file':
+            self.store.fail_file(task[1], task[2], "Proses analisa berhenti sebelum file ini selesai. Silakan unggah ulang file CSV ini.")
+            self._dispatch(('merge', task[1]))
+        else:
+            self.store.fail(task[1], "Proses analisa berhenti sebelum selesai. Silakan unggah ulang file CSV Anda.")
+
+    def submit(self, user_id, file_storages):
+        """Menyimpan file upload ke disk lalu mengantrikan satu task per file. Mengembalikan job_id."""
+        if len(file_storages) > self.max_files:
+            raise AnalysisQueueFull(f"Maksimal {self.max_files} file CSV per upload.")
+        if self.store.count_active(user_id) >= self.max_active_per_user:
+            raise AnalysisQueueFull(
+                f"Masih ada {self.max_active_per_user} analisa CSV yang berjalan. Tunggu sampai selesai sebelum mengunggah lagi."
+            )
+        files, shops = [], []
+        for file_storage in file_storages:
+            shop = shop_name_from_filename(file_storage.filename, shops)
+            shops.append(shop)
+            upload_path = os.path.join(self.upload_dir, f"{_new_job_id()}.csv")
+            file_storage.save(upload_path)
+            files.append((file_storage.filename, shop, upload_path))
+        job_id = self.store.create(user_id, files)
+        for task in self.store.pending_tasks(job_id):
+            self._dispatch(task)
+        self.store.maybe_evict(self.result_spec[2])
+        return job_id
+
+    def poll(self, user_id, job_id):
+        """Status job milik user (dict) atau None. Task yang tertinggal (mis. setelah restart) dikirim ulang ke pool."""
+        job = self.store.get(job_id, user_id)
+        if job is None or job['status'] in (JOB_DONE, JOB_FAILED):
+            return job
+        if self.store.requeue_dead(time.time() - self.stale_seconds, job_id):
+            job = self.store.get(job_id, user_id)
+        for task in self.store.pending_tasks(job_id):
+            self._dispatch(task)
+        return job
+
+    def recover(self):
+        """Mengirim ulang semua task yang belum selesai (dipanggil sekali saat antrean dibuat di proses ini)."""
+        requeued = self.store.requeue_dead(time.time() - self.stale_seconds)
+        pending = self.store.pending_tasks()
+        for task in pending:
+            self._dispatch(task)
+        if pending:
+            print(f"DEBUG: {len(pending)} task analisa CSV dilanjutkan ({requeued} dari proses yang berhenti).")
+
+
+def get_analysis_jobs():
+    """Mengembalikan antrean job analisa milik aplikasi aktif (dibuat sekali per proses, lalu task tertinggal dilanjutkan)."""
+    app = current_app._get_current_object()
+    jobs = app.extensions.get('roas_analysis_jobs')
+    if jobs is None:
+        os.makedirs(app.instance_path, exist_ok=True)
+        store = AnalysisJobStore(app.config.get('ROAS_ANALYSIS_JOB_DB_PATH') or os.path.join(app.instance_path, 'roas_jobs.db'))
+        jobs = AnalysisJobQueue(
+            store,
+            app.config.get('ROAS_ANALYSIS_JOB_UPLOAD_DIR') or os.path.join(app.instance_path, 'roas_job_uploads'),
+            result_store_spec(app),
+            max_workers=app.config.get('ROAS_ANALYSIS_JOB_WORKERS', DEFAULT_JOB_WORKERS),
+            stale_seconds=app.config.get('ROAS_ANALYSIS_JOB_STALE_SECONDS', DEFAULT_JOB_STALE_SECONDS),
+            max_active_per_user=app.config.get('ROAS_ANALYSIS_JOB_MAX_ACTIVE_PER_USER', DEFAULT_MAX_ACTIVE_JOBS_PER_USER),
+            max_files=app.config.get('ROAS_ANALYSIS_MAX_FILES', DEFAULT_MAX_FILES_PER_JOB),
+            history_path=history_store_path(app) if app.config.get('ROAS_ANALYSIS_HISTORY', True) else None,
+        )
+        app.extensions['roas_analysis_jobs'] = jobs
+        jobs.recover()
+    return jobs
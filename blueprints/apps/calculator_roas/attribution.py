@@ -0,0 +1,71 @@
+# File: blueprints/apps/calculator_roas/attribution.py
+# Atribusi omzet iklan untuk mode CSV: langsung (pembeli membeli produk yang diklik) vs tidak langsung
+# (pembelian produk lain dari toko setelah klik iklan). ROAS langsung & tidak langsung dan porsi omzet langsung
+# dihitung kolumnar untuk seluruh laporan sekaligus, lalu tiap produk digolongkan menurut porsi omzet langsungnya.
+import numpy as np
+import pandas as pd
+
+DIRECT_SHARE_HIGH = 0.7 # Porsi omzet langsung >= ini -> 'langsung'
+DIRECT_SHARE_LOW = 0.3  # Porsi omzet langsung < ini -> 'tidak_langsung' (di antaranya 'campuran')
+
+# Kolom hasil atribusi (camelCase, sama dengan yang dipakai JavaScript)
+ATTRIBUTION_COLUMNS = [
+    'omzetLangsung', 'omzetTidakLangsung', 'terjualTidakLangsung',
+    'roasLangsung', 'roasTidakLangsung', 'porsiOmzetLangsung', 'atribusi'
+]
+
+
+def _column(df, col_name):
+    # Kolom hilang -> 0 (sama dengan clean_report_chunk)
+    if col_name not in df.columns:
+        return np.zeros(len(df))
+    return df[col_name].to_numpy(dtype=float)
+
+
+def attribution_frame(df):
+    """
+    Pemisahan omzet langsung / tidak langsung untuk seluruh DataFrame laporan (kolom camelCase hasil clean_report_chunk).
+    Omzet langsung diambil dari Penjualan Langsung (GMV Langsung); jika kosong, diturunkan dari Efektivitas Langsung
+    (ROAS langsung x biaya) atau ACOS Langsung (biaya / ACOS). Produk tanpa omzet tidak digolongkan (None).
+    """
+    biaya = _column(df, 'biaya')
+    omzet = _column(df, 'omzetPenjualan')
+    terjual = _column(df, 'produkTerjual')
+    efektivitas_langsung = _column(df, 'efektivitasLangsung')
+    acos_langsung = _column(df, 'acosLangsung')
+    penjualan_langsung = _column(df, 'penjualanLangsung')
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        omzet_langsung = np.select(
+            [penjualan_langsung > 0, efektivitas_langsung > 0, acos_langsung > 0],
+            [penjualan_langsung, efektivitas_langsung * biaya, biaya / acos_langsung],
+            default=0.0
+        )
+        # Omzet langsung tidak mungkin melebihi total omzet (selisih pembulatan di laporan)
+        omzet_langsung = np.minimum(omzet_langsung, omzet)
+        omzet_tidak_langsung = omzet - omzet_langsung
+        terjual_tidak_langsung = np.maximum(terjual - _column(df, 'terjualLangsung'), 0)
+
+        ada_biaya = biaya > 0
+        roas_langsung = np.where(ada_biaya, omzet_langsung / np.where(ada_biaya, biaya, 1), np.nan)
+        roas_tidak_langsung = np.where(ada_biaya, omzet_tidak_langsung / np.where(ada_biaya, biaya, 1), np.nan)
+
+        ada_omzet = omzet > 0
+        porsi_langsung = np.where(ada_omzet, omzet_langsung / np.where(ada_omzet, omzet, 1), np.nan)
+
+    atribusi = np.select(
+        [~ada_omzet, porsi_langsung >= DIRECT_SHARE_HIGH, porsi_langsung >= DIRECT_SHARE_LOW],
+        [None, 'langsung', 'campuran'],
+        default='tidak_langsung'
+    )
+
+    result = pd.DataFrame({
+        'omzetLangsung': omzet_langsung,
+        'omzetTidakLangsung': omzet_tidak_langsung,
+        'terjualTidakLangsung': terjual_tidak_langsung,
+        'roasLangsung': roas_langsung,
+        'roasTidakLangsung': roas_tidak_langsung,
+        'porsiOmzetLangsung': porsi_langsung,
+        'atribusi': atribusi,
+    }, index=df.index)
+    return result.astype(object).where(result.notna(), None) # NaN jadi None untuk JSON
@@ -0,0 +1,112 @@
+# File: blueprints/apps/calculator_roas/batch_recalc.py
+# Hitung Ulang banyak produk sekaligus (endpoint /recalculate_batch).
+# Override biaya per produk (dari JSON atau cost sheet CSV) digabung dengan data iklan hasil analisa,
+# lalu seluruhnya dihitung dalam satu panggilan recommend_frame (kolumnar, tanpa loop per produk).
+import numpy as np
+import pandas as pd
+
+from .number_format import detect_decimal_separator, parse_shopee_numbers
+from .recommendation import recommend_frame
+
+MAX_BATCH_PRODUCTS = 10000 # Batas jumlah produk per request
+
+# Kolom override (sama dengan field form Hitung Ulang). fee dan target_profit dalam persen, seperti di form.
+OVERRIDE_COLUMNS = ['modal', 'harga_jual', 'fee', 'tambahan', 'target_profit']
+
+# Data iklan aktual yang boleh dikirim langsung (nama field sama dengan hidden field form Hitung Ulang)
+ACTUAL_COLUMNS = {
+    'biayaIklanAktual': 'biaya',
+    'omzetPenjualanAktual': 'omzetPenjualan',
+    'produkTerjualAktual': 'produkTerjual',
+    'roasAktual': 'ROAS',
+    'persentaseKlikAktual': 'persentaseKlik',
+}
+
+# Nama kolom cost sheet yang dikenali (huruf kecil) -> nama kolom override
+COST_SHEET_ALIASES = {
+    'produkid': 'produkId', 'kode produk': 'produkId', 'produk_id': 'produkId',
+    'modal': 'modal', 'modal produk': 'modal',
+    'harga_jual': 'harga_jual', 'harga jual': 'harga_jual',
+    'fee': 'fee', 'fee shopee': 'fee',
+    'tambahan': 'tambahan', 'biaya tambahan': 'tambahan',
+    'target_profit': 'target_profit', 'target profit': 'target_profit',
+}
+
+# Kolom hasil yang dikirim balik (urutan kolom di JSON "columns")
+BATCH_RESULT_COLUMNS = [
+    'produkId', 'namaProduk', 'analisa', 'rekomendasiAksi', 'roasTargetOptimal', 'rekomendasiModalHarian', 'tagWarna'
+]
+
+
+def _to_float_column(values, column):
+    """Kolom angka dari JSON: None/'' = tidak diisi (NaN); selain angka -> ValueError."""
+    try:
+        return pd.to_numeric(pd.Series(values, dtype=object).replace('', None), errors='raise').astype(float)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Nilai '{column}' harus berupa angka. Detail: {e}")
+
+
+def overrides_from_json(items):
+    """Mengubah array JSON [{produkId, modal, harga_jual, fee, tambahan, target_profit, ...}] jadi DataFrame override."""
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        raise ValueError("Format JSON harus berupa array objek produk.")
+    frame = pd.DataFrame({'produkId': [None if item.get('produkId') is None else str(item.get('produkId')) for item in items]})
+    for column in OVERRIDE_COLUMNS + list(ACTUAL_COLUMNS):
+        frame[column] = _to_float_column([item.get(column) for item in items], column)
+    return frame
+
+
+def overrides_from_cost_sheet(binary_stream):
+    """Membaca cost sheet CSV (header: produkId/Kode Produk, modal, harga_jual, fee, tambahan, target_profit)."""
+    sheet = pd.read_csv(binary_stream, dtype=str, sep=None, engine='python', encoding='utf-8-sig')
+    sheet = sheet.rename(columns=lambda name: COST_SHEET_ALIASES.get(str(name).strip().lower(), name))
+    if 'produkId' not in sheet.columns:
+        raise ValueError("Cost sheet harus memiliki kolom produkId (atau 'Kode Produk').")
+
+    frame = pd.DataFrame({'produkId': sheet['produkId'].str.strip()})
+    for column in OVERRIDE_COLUMNS:
+        if column in sheet.columns:
+            # Angka di cost sheet boleh berformat "Rp12.500" / "5%" seperti di laporan Shopee
+            separator = detect_decimal_separator(sheet[column], currency=column in ('modal', 'harga_jual', 'tambahan'))
+            frame[column] = parse_shopee_numbers(sheet[column], separator)
+        else:
+            frame[column] = np.nan
+    for column in ACTUAL_COLUMNS:
+        frame[column] = np.nan
+    return frame
+
+
+def recalculate_batch_frame(overrides, products_by_id):
+    """
+    Menghitung ulang rekomendasi untuk semua baris override dalam satu pass.
+    products_by_id: produkId -> baris produk dari hasil analisa (data iklan aktual).
+    Mengembalikan (DataFrame hasil dengan BATCH_RESULT_COLUMNS, list produkId yang tidak ditemukan).
+    """
+    overrides = overrides[overrides['produkId'].notna()].reset_index(drop=True)
+    records = [products_by_id.get(produk_id) or {} for produk_id in overrides['produkId']]
+
+    ad_data = pd.DataFrame({
+        'namaProduk': [record.get('namaProduk', 'N/A') for record in records],
+        **{column: pd.to_numeric(pd.Series([record.get(column) for record in records], dtype=object), errors='coerce')
+           for column in ACTUAL_COLUMNS.values()}
+    })
+    # Data aktual yang dikirim langsung menggantikan data hasil analisa
+    for field, column in ACTUAL_COLUMNS.items():
+        ad_data[column] = overrides[field].where(overrides[field].notna(), ad_data[column])
+
+    has_actuals = ad_data[['biaya', 'omzetPenjualan', 'produkTerjual']].notna().any(axis=1).to_numpy()
+    missing = overrides.loc[~has_actuals, 'produkId'].tolist()
+    overrides, ad_data = overrides[has_actuals].reset_index(drop=True), ad_data[has_actuals].reset_index(drop=True)
+
+    # Sama seperti Hitung Ulang satuan: fee dan target profit dikirim dalam persen
+    rekomendasi = recommend_frame(
+        ad_data,
+        modal_produk_input=overrides['modal'].to_numpy(),
+        fee_shopee_input=overrides['fee'].to_numpy() / 100,
+        biaya_tambahan_input=overrides['tambahan'].to_numpy(),
+        target_profit_pct_input=overrides['target_profit'].to_numpy() / 100,
+        harga_jual_per_unit_input=overrides['harga_jual'].to_numpy(),
+    )
+    rekomendasi['produkId'] = overrides['produkId']
+    rekomendasi['namaProduk'] = ad_data['namaProduk']
+    return rekomendasi[BATCH_RESULT_COLUMNS], missing
@@ -0,0 +1,158 @@
+# File: blueprints/apps/calculator_roas/budget_optimizer.py
+# Optimasi modal harian satu portofolio iklan (endpoint /budget_optimizer).
+# Rekomendasi per produk memakai kelipatan tetap dari biaya aktual; di sini total modal harian dibagi ke semua
+# iklan 'Berjalan' hasil analisa sekaligus, supaya perkiraan profit total paling besar.
+#
+# Model per produk (asumsi, karena laporan hanya berisi satu titik biaya/omzet):
+#   omzet(s) = min(omzet_aktual * (s / biaya_aktual) ** BUDGET_SPEND_ELASTICITY, SHOPEE_ROAS_CAP * s)
+#              (hasil makin berkurang jika modal naik; pada modal kecil ROAS terpotong batas Shopee)
+#   profit(s) = margin * omzet(s) - s, margin = porsi harga jual yang tersisa setelah modal, fee & biaya tambahan
+# Profit maksimal saat ROAS marjinal x margin sama untuk semua produk (water-filling). Di area ROAS terpotong,
+# ROAS marjinal = SHOPEE_ROAS_CAP (tetap); di atasnya kurva pangkat. Alokasi tiap produk punya bentuk tertutup untuk
+# satu pengali Lagrange, jadi pengali itu cukup dicari dengan bisection atas array NumPy (tanpa loop per produk).
+import numpy as np
+import pandas as pd
+
+from .constants import (
+    SHOPEE_ROAS_CAP, SHOPEE_MIN_DAILY_BUDGET,
+    DEFAULT_MODAL_PRODUCT_RATIO, DEFAULT_SHOPEE_FEE_PERCENT, DEFAULT_ADDITIONAL_COST_PER_UNIT
+)
+
+BUDGET_SPEND_ELASTICITY = 0.5 # Omzet naik ~akar kuadrat dari kenaikan modal (0 < elastisitas < 1)
+MAX_BUDGET_SCALE = 3.0        # Modal maksimal = 3x biaya aktual (sama dengan kelipatan tertinggi di rekomendasi)
+_BISECTION_STEPS = 60         # Iterasi bisection pengali Lagrange (skala log)
+_STATUS_TOLERANCE = 0.05      # Perubahan modal < 5% dianggap 'tetap'
+
+BUDGET_STATUS_LABELS = {
+    'naik': "NAIKKAN MODAL HARIAN",
+    'tetap': "PERTAHANKAN MODAL HARIAN",
+    'turun': "TURUNKAN MODAL HARIAN",
+    'jeda': "JEDA IKLAN (TIDAK MENDAPAT ALOKASI)",
+    'tanpa_data': "BELUM ADA DATA (TIDAK DIALOKASIKAN)",
+}
+
+# Kolom hasil yang dikirim balik (urutan kolom di JSON "columns")
+BUDGET_RESULT_COLUMNS = [
+    'produkId', 'namaProduk', 'biaya', 'ROAS', 'anggaranOptimal', 'roasPrediksi', 'targetRoas',
+    'omzetPrediksi', 'profitPrediksi', 'statusAnggaran', 'rekomendasiAnggaran'
+]
+
+
+def _column(df, col_name):
+    # Kolom hilang / None -> 0
+    if col_name not in df.columns:
+        return np.zeros(len(df))
+    return pd.to_numeric(df[col_name], errors='coerce').fillna(0).to_numpy(dtype=float)
+
+
+def _allocation(scale, marginal_at_current, capped_marginal, capped_spend, multiplier, exponent, min_budget, max_budget):
+    # Modal tiap produk di mana margin x ROAS marjinal = multiplier. Sampai capped_spend ROAS terpotong batas Shopee
+    # (margin x ROAS marjinal tetap = capped_marginal), jadi area itu diambil utuh jika capped_marginal > multiplier
+    # dan tidak sama sekali jika tidak; di bawah minimal Shopee -> 0 (iklan dijeda)
+    spend = np.maximum(scale * (marginal_at_current / multiplier) ** exponent, capped_spend)
+    spend = np.where(capped_marginal > multiplier, np.minimum(spend, max_budget), 0.0)
+    return np.where(spend >= min_budget, spend, 0.0)
+
+
+def optimize_portfolio_budget(products, total_budget, elasticity=BUDGET_SPEND_ELASTICITY, max_scale=MAX_BUDGET_SCALE,
+                              min_budget=SHOPEE_MIN_DAILY_BUDGET, roas_cap=SHOPEE_ROAS_CAP):
+    """
+    Membagi total_budget (Rp per hari) ke semua iklan di products (DataFrame / list dict baris hasil analisa:
+    biaya, omzetPenjualan, produkTerjual). Produk tanpa biaya/omzet/harga tidak punya kurva dan tidak dialokasikan.
+    Modal yang membuat profit marjinal negatif tidak dipakai, jadi total alokasi bisa lebih kecil dari total_budget.
+    Mengembalikan (DataFrame hasil dengan BUDGET_RESULT_COLUMNS, dict ringkasan).
+    """
+    if not 0 < elasticity < 1:
+        raise ValueError("Elastisitas harus di antara 0 dan 1.")
+    if not np.isfinite(total_budget) or total_budget < 0:
+        raise ValueError("Total modal harian harus berupa angka >= 0.")
+    df = pd.DataFrame(products).reset_index(drop=True)
+    biaya = _column(df, 'biaya')
+    omzet = _column(df, 'omzetPenjualan')
+    terjual = _column(df, 'produkTerjual')
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Margin per rupiah omzet dengan asumsi default (sama dengan rekomendasi mode CSV)
+        harga_jual = np.where(terjual > 0, omzet / np.where(terjual > 0, terjual, 1), 0.0)
+        biaya_pokok_per_unit = DEFAULT_MODAL_PRODUCT_RATIO * harga_jual + harga_jual * DEFAULT_SHOPEE_FEE_PERCENT + DEFAULT_ADDITIONAL_COST_PER_UNIT
+        margin = np.where(harga_jual > 0, (harga_jual - biaya_pokok_per_unit) / np.where(harga_jual > 0, harga_jual, 1), 0.0)
+
+        ada_kurva = (biaya > 0) & (omzet > 0) & (harga_jual > 0)
+        # ROAS di atas batas Shopee tidak bisa ditargetkan, jadi kurva dihitung dari ROAS yang sudah dibatasi
+        roas_laporan = np.where(biaya > 0, omzet / np.where(biaya > 0, biaya, 1), 0.0)
+        roas_aktual = np.minimum(roas_laporan, roas_cap)
+        # Profit per rupiah modal tambahan pada biaya aktual (margin x ROAS marjinal, kurva tanpa batas)
+        marginal_at_current = np.where(ada_kurva & (margin > 0), margin * elasticity * roas_aktual, 0.0)
+        # Area ROAS terpotong: margin x batas ROAS per rupiah, sampai modal di mana kurva turun ke batas ROAS
+        capped_marginal = np.where(ada_kurva & (margin > 0), margin * roas_cap, 0.0)
+
+    exponent = 1.0 / (1.0 - elasticity)
+    scale = biaya
+    capped_spend = np.where(ada_kurva, scale * (roas_aktual / roas_cap) ** exponent, 0.0)
+    max_budget = np.maximum(biaya * max_scale, min_budget)
+    curve = (scale, marginal_at_current, capped_marginal, capped_spend)
+
+    # Pengali 1 = tanpa batas total (berhenti saat profit marjinal 0); jika melebihi total, naikkan pengalinya
+    multiplier = 1.0
+    allocation = _allocation(*curve, multiplier, exponent, min_budget, max_budget)
+    if allocation.sum() > total_budget:
+        # Pada hi tidak ada produk dengan capped_marginal > hi (semua alokasi 0), sehingga total pasti muat
+        hi = float(np.max(capped_marginal, initial=1.0))
+        lo = multiplier
+        for _ in range(_BISECTION_STEPS):
+            mid = np.sqrt(lo * hi)
+            if _allocation(*curve, mid, exponent, min_budget, max_budget).sum() > total_budget:
+                lo = mid
+            else:
+                hi = mid
+        allocation = _allocation(*curve, hi, exponent, min_budget, max_budget)
+        # Area ROAS terpotong bisa lepas utuh di antara lo dan hi (profit per rupiah tetap), jadi sisa total
+        # dibagikan sebanding dengan selisih alokasi lo dan hi
+        gap = _allocation(*curve, lo, exponent, min_budget, max_budget) - allocation
+        if gap.sum() > 0:
+            allocation = allocation + gap * min((total_budget - allocation.sum()) / gap.sum(), 1.0)
+            allocation = np.where(allocation >= min_budget, allocation, 0.0)
+    allocation = np.floor(allocation) # Rupiah bulat, dibulatkan ke bawah agar total tidak melebihi total_budget
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(scale > 0, allocation / np.where(scale > 0, scale, 1), 0.0)
+        omzet_prediksi = np.where(allocation > 0, roas_aktual * scale * ratio ** elasticity, 0.0)
+        # Omzet dibatasi ROAS maksimal Shopee (modal kecil tidak bisa menghasilkan ROAS di atas batas)
+        omzet_prediksi = np.minimum(omzet_prediksi, allocation * roas_cap)
+        roas_prediksi = np.where(allocation > 0, omzet_prediksi / np.where(allocation > 0, allocation, 1), np.nan)
+        profit_prediksi = margin * omzet_prediksi - allocation
+        profit_aktual = np.where(ada_kurva, margin * roas_aktual * biaya - biaya, 0.0)
+
+    status = np.select(
+        [~ada_kurva, allocation <= 0, ratio > 1 + _STATUS_TOLERANCE, ratio < 1 - _STATUS_TOLERANCE],
+        ['tanpa_data', 'jeda', 'naik', 'turun'],
+        default='tetap'
+    )
+
+    result = pd.DataFrame({
+        'produkId': df['produkId'].astype(str) if 'produkId' in df.columns else '',
+        'namaProduk': df['namaProduk'] if 'namaProduk' in df.columns else 'N/A',
+        'biaya': biaya,
+        'ROAS': np.where(biaya > 0, roas_laporan, np.nan),
+        'anggaranOptimal': allocation,
+        'roasPrediksi': np.round(roas_prediksi, 2),
+        'targetRoas': np.round(np.minimum(roas_prediksi, roas_cap), 1),
+        'omzetPrediksi': np.round(omzet_prediksi),
+        'profitPrediksi': np.round(profit_prediksi),
+        'statusAnggaran': status,
+        'rekomendasiAnggaran': pd.Series(status).map(BUDGET_STATUS_LABELS),
+    })
+    if 'namaToko' in df.columns:
+        result.insert(2, 'namaToko', df['namaToko'])
+    result = result.sort_values('anggaranOptimal', ascending=False, kind='stable')
+
+    summary = {
+        'totalBudget': float(total_budget),
+        'totalDialokasikan': float(allocation.sum()),
+        'jumlahIklan': int(len(df)),
+        'jumlahIklanDidanai': int((allocation > 0).sum()),
+        'profitPrediksi': float(profit_prediksi.sum()),
+        'profitAktual': float(profit_aktual.sum()),
+        'elastisitas': elasticity,
+    }
+    return result.astype(object).where(result.notna(), None), summary
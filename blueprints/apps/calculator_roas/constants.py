@@ -0,0 +1,15 @@
+# File: blueprints/apps/calculator_roas/constants.py
+# Konstanta bersama untuk Kalkulator ROAS.
+# Dipisah dari routes.py supaya modul perhitungan (mis. recommendation.py) bisa memakainya
+# tanpa circular import.
+
+# --- GLOBAL CONSTANTS ---
+SHOPEE_ROAS_CAP = 50.0  # ROAS maksimal yang bisa diset di Shopee
+SHOPEE_MIN_DAILY_BUDGET = 5000  # Minimal modal harian di Shopee
+
+# --- DEFAULT ASSUMPTIONS FOR PROFIT CALCULATION (IF NOT AVAILABLE FROM CSV OR USER INPUT) ---
+# Ini adalah asumsi. Digunakan jika user tidak memberikan input di form hitung ulang.
+DEFAULT_MODAL_PRODUCT_RATIO = 0.50   # Modal produk 50% dari harga jual
+DEFAULT_SHOPEE_FEE_PERCENT = 0.05    # Fee Shopee 5% dari harga jual
+DEFAULT_ADDITIONAL_COST_PER_UNIT = 1000 # Biaya tambahan per unit Rp1000
+DEFAULT_TARGET_PROFIT_PERCENT = 0.10 # Target profit 10% dari omzet
@@ -0,0 +1,177 @@
+# File: blueprints/apps/calculator_roas/csv_analysis.py
+# Analisa laporan CSV setelah diparse: rekomendasi kolumnar, pengurutan, dan payload hasil untuk JavaScript.
+# Dipakai oleh route /analyze (mode sinkron) dan oleh job analisa di proses terpisah (analysis_jobs.py),
+# jadi modul ini tidak boleh bergantung pada request / app context Flask.
+# Beberapa laporan (multi toko) dianalisa terpisah lalu digabung jadi satu tabel dengan kolom namaToko.
+import os
+
+import numpy as np
+import pandas as pd
+
+from .attribution import attribution_frame
+from .funnel import funnel_frame
+from .recommendation import recommend_frame
+
+ANALYSIS_CHUNK_ROWS = 5000 # Jumlah baris per potongan rekomendasi (progress dilaporkan per potongan)
+
+SHOP_COLUMN = 'namaToko' # Kolom toko, hanya ada jika beberapa laporan diunggah sekaligus
+
+TAG_ORDER_MAP = {'sangat_baik': 3, 'cukup_baik': 2, 'boncos': 1, 'netral': 0, 'default': 0}
+
+# Kolom yang dikirim ke tabel hasil di JavaScript (camelCase)
+PRODUCT_TABLE_COLUMNS = [
+    'namaProduk', 'produkId', 'biaya', 'omzetPenjualan', 'ROAS',
+    'analisa', 'rekomendasiAksi', 'roasTargetOptimal', 'tagWarna',
+    'persentaseKlik', 'produkTerjual', 'rekomendasiModalHarian', 'tahapTerlemah',
+    'roasLangsung', 'roasTidakLangsung', 'porsiOmzetLangsung', 'atribusi'
+]
+
+
+def empty_result_data():
+    return {'label_hasil': '', 'label_keterangan': [], 'table_data': [], 'table_headers': [], 'products_data': []}
+
+
+def index_records_by_produk_id(records):
+    """Membuat dict produkId -> baris produk. Jika produkId dobel, baris pertama (urutan tabel) yang dipakai."""
+    indexed = {}
+    for record in records:
+        indexed.setdefault(str(record.get('produkId')), record)
+    return indexed
+
+
+def recommend_in_chunks(df, chunk_rows=ANALYSIS_CHUNK_ROWS, on_progress=None):
+    """
+    recommend_frame per potongan baris (hasilnya sama dengan satu panggilan untuk seluruh frame,
+    karena rekomendasi dihitung per baris). on_progress(jumlah_baris_selesai) dipanggil setelah tiap potongan.
+    """
+    if len(df) <= chunk_rows:
+        rekomendasi = recommend_frame(df)
+        if on_progress:
+            on_progress(len(df))
+        return rekomendasi
+    parts = []
+    for start in range(0, len(df), chunk_rows):
+        parts.append(recommend_frame(df.iloc[start:start + chunk_rows]))
+        if on_progress:
+            on_progress(min(start + chunk_rows, len(df)))
+    return pd.concat(parts)
+
+
+def rank_analyzed_rows(df_to_analyze):
+    """Urutkan hasil analisa: tag terbaik dulu, lalu ROAS tertinggi (atau biaya terkecil jika belum ada ROAS)."""
+    df_to_analyze['Tag_Order_Score'] = df_to_analyze['tagWarna'].map(TAG_ORDER_MAP).fillna(0)
+
+    # Pastikan kolom 'biaya' juga di-fillna(0) sebelum sort_score
+    df_to_analyze['Sort_Score'] = np.where(
+        (df_to_analyze['ROAS'].notnull()) & (df_to_analyze['ROAS'] > 0),
+        df_to_analyze['ROAS'],
+        -df_to_analyze['biaya'].fillna(0)
+    )
+    df_to_analyze['Sort_Score'] = df_to_analyze['Sort_Score'].where(pd.notnull, -999999999)
+
+    return df_to_analyze.sort_values(
+        by=['Tag_Order_Score', 'Sort_Score'],
+        ascending=[False, False]
+    )
+
+
+def analyze_report_frame(df_to_analyze, on_progress=None):
+    """Baris 'Berjalan' satu laporan + kolom hasil rekomendasi (belum diurutkan)."""
+    if df_to_analyze.empty:
+        if on_progress:
+            on_progress(0)
+        return df_to_analyze
+    print(f"\n--- DEBUG: Rows for recommend_frame ---")
+    # Rekomendasi dihitung kolumnar (tanpa apply per baris), per potongan agar progress bisa dilaporkan.
+    # Tanpa override, jadi default assumptions untuk modal, fee, biaya tambahan yang dipakai.
+    # Penjelasan detail TIDAK dirender di sini; dirender saat produk dibuka (lihat product_explanation).
+    rekomendasi = recommend_in_chunks(df_to_analyze, on_progress=on_progress)
+    # Funnel dihitung sekali untuk seluruh laporan (bukan per potongan), karena pembandingnya median laporan.
+    # Atribusi langsung / tidak langsung ikut di pass yang sama, dari kolom yang sudah diparse.
+    return pd.concat([df_to_analyze, rekomendasi, funnel_frame(df_to_analyze), attribution_frame(df_to_analyze)], axis=1)
+
+
+def shop_name_from_filename(filename, taken=()):
+    """Nama toko untuk satu laporan = nama file tanpa ekstensi; nama yang sama diberi akhiran (2), (3), ..."""
+    base = os.path.splitext(os.path.basename(filename or ''))[0].strip() or 'Toko'
+    name, counter = base, 2
+    while name in taken:
+        name = f"{base} ({counter})"
+        counter += 1
+    return name
+
+
+def report_shop_name(preamble_shop, filename_shop):
+    """
+    Kunci toko satu laporan, sama untuk kolom namaToko, riwayat dan tren: nama toko dari preamble laporan,
+    atau nama dari file (shop_name_from_filename) jika preamble tidak mencantumkannya.
+    """
+    return preamble_shop or filename_shop
+
+
+def merge_shop_frames(parts):
+    """
+    Menggabungkan hasil analyze_report_frame beberapa toko: list (nama_toko, DataFrame) -> satu DataFrame.
+    Satu toko saja dikembalikan apa adanya (tanpa kolom toko), jadi hasil upload satu file tidak berubah.
+    """
+    if len(parts) == 1:
+        return parts[0][1]
+    frames = [df.assign(**{SHOP_COLUMN: shop}) for shop, df in parts if not df.empty]
+    if not frames:
+        return parts[0][1]
+    return pd.concat(frames, ignore_index=True)
+
+
+def count_shops(parts):
+    """Jumlah toko yang laporannya menghasilkan baris 'Berjalan' (laporan tanpa baris tidak dihitung)."""
+    return sum(1 for _, df in parts if not df.empty)
+
+
+def empty_shop_messages(parts):
+    """Pesan per laporan tanpa baris 'Berjalan' saat upload multi toko (upload satu file sudah diberi pesan di build_csv_result)."""
+    if len(parts) < 2:
+        return []
+    return [
+        {'category': 'warning', 'message': f"Laporan '{shop}' tidak berisi iklan 'Berjalan' dan tidak ikut dianalisa."}
+        for shop, df in parts if df.empty
+    ]
+
+
+def build_csv_result(df_analyzed, shop_count=1):
+    """
+    Mengurutkan baris hasil analisa (satu atau gabungan beberapa toko) dan menyusun payload untuk JavaScript.
+    Mengembalikan (result_data, flash_messages, analyzed_products); analyzed_products = dict produkId -> baris
+    (None jika tidak ada baris), untuk disimpan ke result store.
+    """
+    result_data = empty_result_data()
+    flash_messages = []
+
+    if df_analyzed.empty:
+        flash_messages.append({'category': 'info', 'message': 'Tidak ada data iklan "Berjalan" yang valid ditemukan dalam file CSV untuk dianalisis.'})
+        result_data['label_hasil'] = "Analisa Selesai. Tidak ada data iklan 'Berjalan' ditemukan."
+        result_data['label_keterangan'].append("Pastikan file CSV Anda berisi iklan dengan status 'Berjalan'.")
+        return result_data, flash_messages, None
+
+    df_analyzed = rank_analyzed_rows(df_analyzed)
+
+    # Mengambil data untuk JSON. Gunakan nama kolom yang sudah di-camelCase-kan
+    table_columns = PRODUCT_TABLE_COLUMNS + ([SHOP_COLUMN] if SHOP_COLUMN in df_analyzed.columns else [])
+    products_data = df_analyzed[table_columns].to_dict(orient='records')
+
+    if shop_count > 1:
+        result_data['label_hasil'] = f"Analisa Selesai. Ditemukan {len(df_analyzed)} iklan 'Berjalan' dari {shop_count} toko yang telah diurutkan."
+    else:
+        result_data['label_hasil'] = f"Analisa Selesai. Ditemukan {len(df_analyzed)} iklan 'Berjalan' yang telah diurutkan."
+    # Menambahkan pesan keterangan ke label_keterangan sebagai list
+    result_data['label_keterangan'] = [
+        "Berikut adalah daftar produk hasil analisa (diurutkan berdasarkan performa iklan):",
+        "Untuk perhitungan ROAS Rekomendasi & Modal Harian Rekomendasi yang lebih akurat, silakan klik tombol \"Lihat Detail\" lalu \"Hitung Ulang Produk Ini\" di popup detail produk."
+    ]
+    result_data['products_data'] = products_data
+
+    # Baris lengkap (dengan hasil rekomendasi) terindeks per produkId, agar product_explanation dan
+    # recalculate_product cukup lookup satu produk di result store
+    analyzed_products = index_records_by_produk_id(df_analyzed.to_dict(orient='records'))
+    flash_messages.append({'category': 'success', 'message': 'File CSV berhasil diunggah dan dianalisis!'})
+    return result_data, flash_messages, analyzed_products
+
@@ -0,0 +1,138 @@
+# File: blueprints/apps/calculator_roas/csv_ingest.py
+# Pembacaan laporan iklan Shopee (CSV) secara streaming.
+# File tidak lagi dibaca utuh ke memori: format laporan dideteksi dari beberapa KB pertama (lihat report_format),
+# lalu file diparse per potongan (chunk) dan hanya baris berstatus 'Berjalan' yang disimpan.
+import csv
+import io
+
+import numpy as np
+import pandas as pd
+
+from .number_format import parse_shopee_numbers
+from .report_format import SNIFF_BYTES, detect_report_format, detect_report_meta
+
+CSV_CHUNK_ROWS = 5000         # Jumlah baris per chunk saat parsing
+
+# Mengganti nama kolom agar konsisten dengan JavaScript (camelCase)
+CAMEL_CASE_COLUMNS = {
+    'Nama Iklan': 'namaProduk',
+    'Kode Produk': 'produkId',
+    'Biaya': 'biaya',
+    'Omzet Penjualan': 'omzetPenjualan',
+    'Produk Terjual': 'produkTerjual',
+    'Persentase Klik': 'persentaseKlik',
+    'Dilihat': 'dilihat',
+    'Jumlah Klik': 'jumlahKlik',
+    'Konversi': 'konversi',
+    'Konversi Langsung': 'konversiLangsung',
+    'Tingkat konversi': 'tingkatKonversi',
+    'Tingkat Konversi Langsung': 'tingkatKonversiLangsung',
+    'Biaya per Konversi': 'biayaPerKonversi',
+    'Biaya per Konversi Langsung': 'biayaPerKonversiLangsung',
+    'Terjual Langsung': 'terjualLangsung',
+    'Penjualan Langsung (GMV Langsung)': 'penjualanLangsung',
+    'Efektivitas Langsung': 'efektivitasLangsung',
+    'Persentase Biaya Iklan terhadap Penjualan dari Iklan Langsung (ACOS Langsung)': 'acosLangsung',
+}
+
+NUMERIC_COLUMNS = [
+    'biaya', 'omzetPenjualan', 'persentaseKlik', 'produkTerjual', 'dilihat', 'jumlahKlik', 'konversi',
+    'konversiLangsung', 'tingkatKonversi', 'tingkatKonversiLangsung', 'biayaPerKonversi', 'biayaPerKonversiLangsung',
+    'terjualLangsung', 'penjualanLangsung', 'efektivitasLangsung', 'acosLangsung'
+]
+
+PERCENT_COLUMNS = ('persentaseKlik', 'tingkatKonversi', 'tingkatKonversiLangsung', 'acosLangsung') # Disimpan sebagai pecahan (12,5% -> 0.125)
+
+
+def clean_report_chunk(df, decimal_separators=None):
+    """
+    Membersihkan satu chunk laporan: rename kolom, konversi angka, dan hitung ROAS.
+    decimal_separators: nama kolom camelCase -> pemisah desimal (default '.').
+    """
+    df = df.rename(columns=CAMEL_CASE_COLUMNS)
+    df['produkId'] = df['produkId'].astype(str)
+    decimal_separators = decimal_separators or {}
+
+    # --- CLEANING LOGIC FOR NUMERIC COLUMNS ---
+    # Satu pass per kolom lewat parse_shopee_numbers ("Rp1.234.567", "12,5%", ribuan format EN/ID)
+    for col_name in NUMERIC_COLUMNS:
+        if col_name in df.columns:
+            values = parse_shopee_numbers(df[col_name], decimal_separators.get(col_name, '.'))
+
+            # Jika hasilnya NaN, ubah menjadi 0 agar tidak menyebabkan masalah isfinite dalam perhitungan
+            values = np.nan_to_num(values, nan=0.0, posinf=np.inf, neginf=-np.inf)
+
+            if col_name in PERCENT_COLUMNS:
+                values = values / 100
+            df[col_name] = values
+        else:
+            df[col_name] = 0 # Jika kolom tidak ada, set ke 0
+    # --- END CLEANING LOGIC ---
+
+    df['ROAS'] = np.where(
+        (df['biaya'] > 0), # Hanya perlu cek > 0 karena sudah difillna(0)
+        df['omzetPenjualan'] / df['biaya'],
+        0
+    )
+    df['ROAS'] = df['ROAS'].replace([np.inf, -np.inf], np.nan)
+    df['ROAS'] = df['ROAS'].where(pd.notnull, None) # Kembali ubah NaN jadi None untuk JSON
+    return df
+
+
+def _peek_sample(binary_stream):
+    """Membaca SNIFF_BYTES pertama lalu mengembalikan posisi stream; stream yang tidak bisa di-seek disalin ke memori."""
+    try:
+        start = binary_stream.tell()
+        sample = binary_stream.read(SNIFF_BYTES)
+        binary_stream.seek(start)
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        binary_stream = io.BytesIO(binary_stream.read())
+        sample = binary_stream.getvalue()[:SNIFF_BYTES]
+    return binary_stream, sample.decode('utf-8', errors='ignore')
+
+
+def peek_report_meta(binary_stream):
+    """
+    Membaca keterangan laporan (ReportMeta: tanggal laporan, nama toko) dari awal file tanpa memajukan stream.
+    Mengembalikan (stream, meta); pakai stream yang dikembalikan untuk read_shopee_report.
+    """
+    binary_stream, sample = _peek_sample(binary_stream)
+    return binary_stream, detect_report_meta(sample)
+
+
+def read_shopee_report(binary_stream, chunk_rows=CSV_CHUNK_ROWS, on_progress=None):
+    """
+    Membaca laporan iklan Shopee dari stream biner secara bertahap.
+    Mengembalikan DataFrame berisi baris 'Berjalan' saja, sudah dibersihkan dan dilengkapi kolom ROAS.
+    Memori yang dipakai sebanding dengan ukuran chunk + baris 'Berjalan', bukan ukuran file.
+    on_progress(jumlah_baris_dibaca) dipanggil setelah tiap chunk (semua status, bukan hanya 'Berjalan').
+    """
+    binary_stream, sample = _peek_sample(binary_stream)
+    # Format laporan (preamble, pemisah, kolom, locale) dideteksi dari sampel; plan-nya di-cache per format
+    plan = detect_report_format(sample)
+    decimal_separators = {CAMEL_CASE_COLUMNS[col]: sep for col, sep in plan.decimal_separators.items() if col in CAMEL_CASE_COLUMNS}
+    print(f"DEBUG: Format laporan {plan.fingerprint}: sep='{plan.sep}', skiprows={plan.skiprows}, kolom dibaca={len(plan.usecols)}")
+
+    running_chunks = []
+    rows_parsed = 0
+    try:
+        # Stream biner diberikan langsung ke pandas (decode utf-8 dilakukan bertahap oleh pandas);
+        # hanya kolom di plan.usecols yang diparse
+        reader = pd.read_csv(
+            binary_stream, skiprows=plan.skiprows, header=None, usecols=plan.usecols, names=plan.names,
+            sep=plan.sep, skipinitialspace=True, chunksize=chunk_rows, encoding='utf-8', dtype=plan.dtype
+        )
+        for chunk in reader:
+            # Filter status dulu, supaya cleaning hanya dikerjakan untuk baris yang dianalisis
+            running = chunk[chunk['Status'] == 'Berjalan']
+            if not running.empty:
+                running_chunks.append(clean_report_chunk(running.copy(), decimal_separators))
+            rows_parsed += len(chunk)
+            if on_progress:
+                on_progress(rows_parsed)
+    except (pd.errors.ParserError, UnicodeDecodeError, csv.Error) as e_csv:
+        raise ValueError(f"Gagal membaca file CSV. Pastikan file adalah CSV dengan pemisah koma atau titik koma. Detail: {e_csv}")
+
+    if not running_chunks:
+        return clean_report_chunk(pd.DataFrame(columns=plan.names))
+    return pd.concat(running_chunks, ignore_index=True)
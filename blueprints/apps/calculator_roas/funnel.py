@@ -0,0 +1,99 @@
+# File: blueprints/apps/calculator_roas/funnel.py
+# Analisa funnel iklan untuk mode CSV: tayangan -> klik -> konversi.
+# Rasio tiap tahap dan biaya per tahap dihitung kolumnar untuk seluruh laporan sekaligus (tanpa loop per baris),
+# lalu tiap produk diberi tanda tahap terlemah: tahap yang rasionya paling jauh di bawah median laporan.
+import numpy as np
+import pandas as pd
+
+FUNNEL_STAGES = ['tayangan', 'klik', 'konversi'] # Urutan tahap funnel (juga urutan prioritas jika skornya sama)
+
+# Saran statis per tahap terlemah
+FUNNEL_STAGE_ADVICE = {
+    'tayangan': "Tayangan iklan paling lemah dibanding produk lain. Naikkan bid/anggaran atau perluas kata kunci agar iklan lebih sering muncul.",
+    'klik': "Persentase klik (CTR) paling lemah dibanding produk lain. Perbaiki gambar utama, judul, dan harga yang tampil di hasil pencarian.",
+    'konversi': "Tingkat konversi paling lemah dibanding produk lain. Perbaiki halaman produk: harga, promo, ulasan, dan deskripsi.",
+}
+
+# Kolom hasil analisa funnel (camelCase, sama dengan yang dipakai JavaScript)
+FUNNEL_COLUMNS = [
+    'funnelRasioKlik', 'funnelRasioKonversi', 'funnelRasioKonversiLangsung',
+    'funnelBiayaPerSeribuTayangan', 'funnelBiayaPerKlik', 'funnelBiayaPerKonversi', 'funnelBiayaPerKonversiLangsung',
+    'tahapTerlemah', 'skorTahapTerlemah', 'saranFunnel'
+]
+
+
+def _column(df, col_name):
+    # Kolom hilang -> 0 (sama dengan clean_report_chunk)
+    if col_name not in df.columns:
+        return np.zeros(len(df))
+    return df[col_name].to_numpy(dtype=float)
+
+
+def _ratio(numerator, denominator):
+    return np.where(denominator > 0, numerator / np.where(denominator > 0, denominator, 1), np.nan)
+
+
+def _prefer(computed, reported):
+    # Nilai dari jumlah mentah dipakai jika ada; jika tidak, nilai yang sudah dihitung di laporan (> 0)
+    return np.where(np.isfinite(computed), computed, np.where(reported > 0, reported, np.nan))
+
+
+def _relative_to_median(values):
+    # Rasio terhadap median laporan (hanya nilai yang terdefinisi); median 0 -> semua dianggap normal (1)
+    finite = values[np.isfinite(values)]
+    median = np.median(finite) if finite.size else np.nan
+    if not np.isfinite(median) or median <= 0:
+        return np.where(np.isfinite(values), 1.0, np.nan)
+    return values / median
+
+
+def funnel_frame(df):
+    """
+    Rasio & biaya per tahap funnel + tahap terlemah untuk seluruh DataFrame laporan (kolom camelCase hasil
+    clean_report_chunk). Median pembanding dihitung dari frame ini, jadi panggil sekali per laporan (bukan per potongan).
+    Produk tanpa tayangan tidak punya data funnel (semua kolom None).
+    """
+    biaya = _column(df, 'biaya')
+    dilihat = _column(df, 'dilihat')
+    klik = _column(df, 'jumlahKlik')
+    konversi = _column(df, 'konversi')
+    konversi_langsung = _column(df, 'konversiLangsung')
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rasio_klik = _prefer(_ratio(klik, dilihat), _column(df, 'persentaseKlik'))
+        rasio_konversi = _prefer(_ratio(konversi, klik), _column(df, 'tingkatKonversi'))
+        rasio_konversi_langsung = _prefer(_ratio(konversi_langsung, klik), _column(df, 'tingkatKonversiLangsung'))
+
+        biaya_per_seribu_tayangan = _ratio(biaya, dilihat) * 1000
+        biaya_per_klik = _ratio(biaya, klik)
+        biaya_per_konversi = _prefer(_ratio(biaya, konversi), _column(df, 'biayaPerKonversi'))
+        biaya_per_konversi_langsung = _prefer(_ratio(biaya, konversi_langsung), _column(df, 'biayaPerKonversiLangsung'))
+
+        ada_funnel = dilihat > 0
+        # Skor tiap tahap = rasio produk / median laporan; tanpa klik, tahap konversi belum bisa dinilai
+        scores = np.column_stack([
+            _relative_to_median(np.where(ada_funnel, dilihat, np.nan)),
+            _relative_to_median(np.where(ada_funnel, np.nan_to_num(rasio_klik), np.nan)),
+            _relative_to_median(np.where(ada_funnel & (klik > 0), np.nan_to_num(rasio_konversi), np.nan)),
+        ]) if len(df) else np.empty((0, len(FUNNEL_STAGES)))
+
+    weakest = np.argmin(np.where(np.isnan(scores), np.inf, scores), axis=1)
+    tahap_terlemah = np.where(ada_funnel, np.asarray(FUNNEL_STAGES, dtype=object)[weakest], None)
+    skor_terlemah = np.where(ada_funnel, np.take_along_axis(scores, weakest[:, None], axis=1)[:, 0], np.nan)
+    saran_funnel = np.where(ada_funnel, np.asarray([FUNNEL_STAGE_ADVICE[stage] for stage in FUNNEL_STAGES], dtype=object)[weakest], None)
+
+    result = pd.DataFrame({
+        'funnelRasioKlik': rasio_klik,
+        'funnelRasioKonversi': rasio_konversi,
+        'funnelRasioKonversiLangsung': rasio_konversi_langsung,
+        'funnelBiayaPerSeribuTayangan': biaya_per_seribu_tayangan,
+        'funnelBiayaPerKlik': biaya_per_klik,
+        'funnelBiayaPerKonversi': biaya_per_konversi,
+        'funnelBiayaPerKonversiLangsung': biaya_per_konversi_langsung,
+        'tahapTerlemah': tahap_terlemah,
+        'skorTahapTerlemah': skor_terlemah,
+        'saranFunnel': saran_funnel,
+    }, index=df.index)
+    # Tanpa tayangan, rasio dari kolom laporan pun tidak dipakai; NaN jadi None untuk JSON
+    result.loc[~ada_funnel, FUNNEL_COLUMNS] = None
+    return result.astype(object).where(result.notna(), None)
@@ -0,0 +1,192 @@
+# File: blueprints/apps/calculator_roas/memo_cache.py
+# Cache memoization untuk perhitungan murni (rekomendasi, tabel simulasi, kurva profit).
+# Key = tuple input yang sudah dibulatkan. Dua lapis:
+#   1. LRU di memori proses (dict lookup, hitungan mikrodetik)
+#   2. Opsional: SQLite lokal yang dipakai bersama oleh semua worker gunicorn di server yang sama
+# Setiap namespace punya counter hit/miss sendiri (lihat MemoCache.stats).
+import functools
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, has_app_context
+
+DEFAULT_MEMO_CACHE_SIZE = 4096   # Jumlah entri LRU per proses
+SHARED_TRIM_INTERVAL = 256       # Store bersama dipangkas ke ukuran maksimum tiap N kali tulis
+MONEY_DIGITS = 2                 # Pembulatan key untuk nilai Rupiah / unit
+RATIO_DIGITS = 6                 # Pembulatan key untuk ROAS, CTR, dan persentase
+
+
+def round_key(value, digits):
+    """Membulatkan satu nilai input untuk key cache (None tetap None, NaN/inf jadi string)."""
+    if value is None:
+        return None
+    value = float(value)
+    if not math.isfinite(value):
+        return repr(value)
+    return round(value, digits) + 0.0 # + 0.0: -0.0 dan 0.0 jadi key yang sama
+
+
+def _shared_key(key):
+    return json.dumps(key, separators=(',', ':'))
+
+
+class MemoCache:
+    """
+    LRU di memori + (opsional) tabel SQLite bersama antar worker.
+    LRU menyimpan objek hasil apa adanya (jangan diubah oleh pemanggil); store bersama menyimpan JSON.
+    """
+
+    def __init__(self, maxsize=DEFAULT_MEMO_CACHE_SIZE, shared_path=None):
+        self.maxsize = maxsize
+        self.shared_path = shared_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._local = threading.local()
+        self._writes = 0
+        if shared_path:
+            with self._connect() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS memo ("
+                    " namespace TEXT NOT NULL,"
+                    " key TEXT NOT NULL,"
+                    " value TEXT NOT NULL,"
+                    " stored_at REAL NOT NULL,"
+                    " PRIMARY KEY (namespace, key)) WITHOUT ROWID"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS ix_memo_stored_at ON memo (stored_at)")
+
+    def _connect(self):
+        # Satu koneksi per thread (sqlite3 tidak boleh dipakai lintas thread)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.shared_path, timeout=5)
+            self._local.conn = conn
+        return conn
+
+    def _count(self, namespace, field):
+        counters = self._stats.setdefault(namespace, {'hits': 0, 'shared_hits': 0, 'misses': 0})
+        counters[field] += 1
+
+    def get(self, namespace, key, restore=None):
+        """
+        Mengembalikan (ketemu, nilai). key harus hashable (tuple).
+        Cek LRU proses dulu; jika tidak ada, cek store bersama (nilai JSON, diubah balik dengan restore).
+        """
+        entry_key = (namespace, key)
+        with self._lock:
+            if entry_key in self._entries:
+                self._entries.move_to_end(entry_key)
+                self._count(namespace, 'hits')
+                return True, self._entries[entry_key]
+
+        if self.shared_path:
+            try:
+                row = self._connect().execute(
+                    "SELECT value FROM memo WHERE namespace = ? AND key = ?", (namespace, _shared_key(key))
+                ).fetchone()
+            except sqlite3.Error as e:
+                print(f"WARNING: Memo cache bersama tidak bisa dibaca: {e}")
+                row = None
+            if row:
+                value = json.loads(row[0])
+                value = restore(value) if restore else value
+                self._remember(entry_key, value)
+                with self._lock:
+                    self._count(namespace, 'shared_hits')
+                return True, value
+
+        with self._lock:
+            self._count(namespace, 'misses')
+        return False, None
+
+    def _remember(self, entry_key, value):
+        with self._lock:
+            self._entries[entry_key] = value
+            self._entries.move_to_end(entry_key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def set(self, namespace, key, value):
+        self._remember((namespace, key), value)
+        if not self.shared_path:
+            return
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO memo (namespace, key, value, stored_at) VALUES (?, ?, ?, ?)",
+                    (namespace, _shared_key(key), json.dumps(value, separators=(',', ':')), time.time())
+                )
+                self._writes += 1
+                if self._writes % SHARED_TRIM_INTERVAL == 0:
+                    # Buang entri tertua jika store bersama melebihi ukuran maksimum
+                    conn.execute(
+                        "DELETE FROM memo WHERE stored_at < ("
+                        " SELECT stored_at FROM memo ORDER BY stored_at DESC LIMIT 1 OFFSET ?)",
+                        (self.maxsize,)
+                    )
+        except sqlite3.Error as e:
+            print(f"WARNING: Memo cache bersama tidak bisa ditulis: {e}")
+
+    def stats(self):
+        """Counter hit/miss per namespace + ukuran LRU di proses ini."""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'namespaces': {namespace: dict(counters) for namespace, counters in self._stats.items()},
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._stats.clear()
+        if self.shared_path:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM memo")
+
+
+_fallback_cache = MemoCache() # Dipakai di luar app context (mis. skrip/benchmark)
+
+
+def get_memo_cache():
+    """Mengembalikan memo cache milik aplikasi aktif (dibuat sekali per proses sesuai config)."""
+    if not has_app_context():
+        return _fallback_cache
+    app = current_app._get_current_object()
+    cache = app.extensions.get('roas_memo_cache')
+    if cache is None:
+        shared_path = None
+        if app.config.get('ROAS_MEMO_CACHE_SHARED', False):
+            os.makedirs(app.instance_path, exist_ok=True)
+            shared_path = app.config.get('ROAS_MEMO_CACHE_PATH') or os.path.join(app.instance_path, 'roas_memo.db')
+        cache = MemoCache(app.config.get('ROAS_MEMO_CACHE_SIZE', DEFAULT_MEMO_CACHE_SIZE), shared_path)
+        app.extensions['roas_memo_cache'] = cache
+    return cache
+
+
+def memoize(namespace, make_key, restore=None):
+    """
+    Decorator memoization. make_key(*args, **kwargs) -> tuple input yang sudah dibulatkan (lihat round_key).
+    Hasil fungsi harus bisa di-JSON-kan; restore (opsional) mengubah hasil JSON dari store bersama kembali
+    ke bentuk aslinya (mis. tuple).
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            cache = get_memo_cache()
+            key = make_key(*args, **kwargs)
+            found, value = cache.get(namespace, key, restore)
+            if found:
+                return value
+            result = func(*args, **kwargs)
+            cache.set(namespace, key, result)
+            return result
+        wrapper.uncached = func
+        return wrapper
+    return decorator
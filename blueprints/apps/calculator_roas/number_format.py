@@ -0,0 +1,84 @@
+# File: blueprints/apps/calculator_roas/number_format.py
+# Parser angka format Shopee: "Rp1.234.567", "Rp1,234,567", "12,5%", "3.25%", dll.
+# Satu kolom digabung jadi satu buffer bytes (str.join), dibersihkan dengan satu bytes.translate
+# (tabel dikompilasi sekali), lalu diparse oleh parser C pandas langsung ke float64; sel kosong dan "-"
+# (sel kosong di ekspor Shopee) jadi NaN di parser C. Pengganti .str.strip().str.replace(...) berantai.
+# Hanya kolom dengan sel yang benar-benar rusak memakai jalur cadangan per nilai.
+import csv
+import io
+import itertools
+import re
+
+import numpy as np
+import pandas as pd
+
+# Karakter yang selalu dibuang: prefix "Rp", tanda persen, spasi/tab/CR, dan non-breaking space (UTF-8: C2 A0)
+_STRIP_BYTES = b'Rp% \t\r\xc2\xa0'
+# Sel kosong di laporan Shopee (setelah dibersihkan), dibaca sebagai NaN
+_EMPTY_CELLS = ['-', '']
+
+# Tabel translate per pemisah desimal: (tabel mapping, byte yang dihapus).
+# Desimal '.': koma = ribuan (format EN/bawaan Shopee).
+# Desimal ',': titik = ribuan dan koma diubah jadi titik (format ID).
+_TRANSLATE_TABLES = {
+    '.': (None, _STRIP_BYTES + b','),
+    ',': (bytes.maketrans(b',', b'.'), _STRIP_BYTES + b'.'),
+}
+
+_DETECT_SAMPLE_SIZE = 1000
+
+# Pola yang hanya masuk akal untuk satu locale
+_ID_PATTERNS = re.compile(r'\d\.\d{3}\.\d{3}|\d,\d{1,2}%?$|\d\.\d{3},\d+')
+_EN_PATTERNS = re.compile(r'\d,\d{3},\d{3}|\d\.\d{1,2}%?$|\d,\d{3}\.\d+')
+# Rupiah tidak punya pecahan 3 digit, jadi "Rp1.234" berarti seribu dua ratus tiga puluh empat
+_ID_CURRENCY_PATTERN = re.compile(r'\d\.\d{3}$')
+
+
+def detect_decimal_separator(values, currency=False):
+    """
+    Menebak pemisah desimal ('.' atau ',') dari sampel nilai satu kolom.
+    Jika tidak ada petunjuk, pakai '.' (perilaku lama: koma dianggap pemisah ribuan).
+    """
+    # Sampel kecil (<= _DETECT_SAMPLE_SIZE): regex langsung pada str lebih murah dari Series + .str per kolom
+    sample = [str(value).strip() for value in itertools.islice((v for v in values if not pd.isna(v)), _DETECT_SAMPLE_SIZE)]
+    if not sample:
+        return '.'
+    id_votes = sum(1 for value in sample if _ID_PATTERNS.search(value))
+    en_votes = sum(1 for value in sample if _EN_PATTERNS.search(value))
+    if currency:
+        id_votes += sum(1 for value in sample if _ID_CURRENCY_PATTERN.search(value))
+    return ',' if id_votes > en_votes else '.'
+
+
+def parse_shopee_numbers(values, decimal_separator='.'):
+    """
+    Mengonversi satu kolom angka format Shopee ke array float64 (nilai tidak valid jadi NaN).
+    decimal_separator biasanya hasil detect_decimal_separator untuk kolom yang sama.
+    """
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        return series.to_numpy(dtype=np.float64) # Sudah numerik, tidak perlu diparse ulang
+    if series.empty:
+        return np.empty(0, dtype=np.float64)
+
+    raw = series.to_numpy()
+    table, delete = _TRANSLATE_TABLES[decimal_separator]
+    # Satu baris per nilai; NaN/None jadi baris kosong (-> NaN)
+    try:
+        buffer = '\n'.join(raw)
+    except TypeError:
+        buffer = '\n'.join(v if isinstance(v, str) else ('' if pd.isna(v) else str(v)) for v in raw)
+    buffer = buffer.encode('utf-8').translate(table, delete)
+    try:
+        parsed = pd.read_csv(
+            io.BytesIO(buffer), header=None, names=['v'], dtype=np.float64, na_values=_EMPTY_CELLS,
+            skip_blank_lines=False, quoting=csv.QUOTE_NONE
+        )['v'].to_numpy()
+        if len(parsed) == len(raw):
+            return parsed
+    except (ValueError, pd.errors.ParserError):
+        pass # Ada sel yang bukan angka (teks rusak) -> jalur lambat di bawah
+    # Jalur cadangan: parse per nilai, sel yang tidak valid jadi NaN
+    cleaned = [v.encode('utf-8').translate(table, delete).decode('utf-8', errors='ignore') if isinstance(v, str) else v
+               for v in raw]
+    return pd.to_numeric(pd.Series(cleaned, dtype=object), errors='coerce').to_numpy(dtype=np.float64)
@@ -0,0 +1,263 @@
+# File: blueprints/apps/calculator_roas/recommendation.py
+# Mesin rekomendasi kolumnar (vectorized) untuk mode CSV.
+# Logikanya identik dengan get_recommendation() di routes.py, tapi dihitung untuk seluruh
+# DataFrame sekaligus dengan mask NumPy dan np.select, bukan satu panggilan Python per baris.
+import numpy as np
+import pandas as pd
+
+from .constants import (
+    SHOPEE_ROAS_CAP, SHOPEE_MIN_DAILY_BUDGET,
+    DEFAULT_MODAL_PRODUCT_RATIO, DEFAULT_SHOPEE_FEE_PERCENT,
+    DEFAULT_ADDITIONAL_COST_PER_UNIT, DEFAULT_TARGET_PROFIT_PERCENT
+)
+
+# Kolom hasil rekomendasi (camelCase, sama dengan yang dipakai JavaScript)
+RECOMMENDATION_COLUMNS = [
+    'analisa', 'rekomendasiAksi', 'roasTargetOptimal',
+    'tagWarna', 'detailedExplanation', 'rekomendasiModalHarian'
+]
+
+# Kolom tambahan yang disimpan agar penjelasan detail bisa dirender belakangan (lazy)
+EXPLANATION_COLUMNS = ['explanationCase', 'roasBreakEvenDisplay', 'targetProfitPct']
+
+# Teks statis per kasus: (tag, analisa, rekomendasi aksi)
+_CASE_LABELS = {
+    'default': ('default', "Belum Ada Data/Tidak Ada Aktivitas Iklan", "BELUM ADA REKOMENDASI"),
+    'harga_invalid': ('default', "Belum Ada Data/Tidak Ada Aktivitas Iklan", "BELUM ADA REKOMENDASI"),
+    'luar_biasa': ('sangat_baik', "Luar Biasa (Sangat Efisien dan Sangat Profitable!)", "MAKSIMALKAN ANGGARAN"),
+    'sangat_baik': ('sangat_baik', "Sangat Baik (Efisien dan Sesuai Target Profit)", "NAIKKAN ANGGARAN BERTAHAP"),
+    'cukup_baik': ('cukup_baik', "Cukup Baik (Untung, Namun Perlu Optimasi untuk Target Profit)", "PERTAHANKAN & OPTIMASI KONTEN/TARGETING/HARGA"),
+    'boncos': ('boncos', "Kurang Efisien (Rugi!)", "TURUNKAN ANGGARAN / FOKUS OPTIMASI EKSTREM / JEDA IKLAN"),
+    'ctr_rendah': ('boncos', "Iklan Tidak Menarik (CTR Rendah)", "JEDA & GANTI KONTEN/VISUAL/JUDUL"),
+    'tanpa_konversi': ('boncos', "Produk Tidak Meyakinkan (CTR Baik, tapi Tanpa Konversi)", "JEDA & OPTIMASI HARGA/PROMO/DESKRIPSI"),
+    'netral': ('netral', "Belum Ada Data/Tidak Ada Aktivitas Iklan", "MULAI IKLAN / PERIKSA DATA"),
+}
+
+
+def render_detailed_explanation(case, roas_aktual, biaya_iklan_aktual, omzet_penjualan_aktual, produk_terjual_aktual,
+                                ctr, display_roas_break_even_produk, target_profit_pct, roas_target_optimal_val):
+    """
+    Merender paragraf penjelasan detail untuk satu produk.
+    Dipakai oleh get_recommendation (mode manual/hitung ulang) dan oleh mode CSV saat baris benar-benar ditampilkan.
+    """
+    if case == 'harga_invalid':
+        return "Harga jual per unit tidak dapat dihitung dengan data Omzet dan Produk Terjual yang diberikan, atau harga jual yang dimasukkan tidak valid. Pastikan Harga Jual > 0 jika di Analisa Manual/Hitung Ulang, atau Omzet Penjualan dan Produk Terjual > 0 jika dari laporan CSV."
+    if case == 'netral':
+        return "Tidak ada data iklan yang cukup untuk menganalisis produk ini. Pastikan produk ini memiliki aktivitas iklan yang memadai dan statusnya 'Berjalan', serta Omzet Penjualan, Produk Terjual, dan Biaya Iklan terisi. Jika ini iklan baru, gunakan mode 'Iklan Baru'."
+    if case not in _CASE_LABELS or case == 'default':
+        return "Tidak ada data iklan yang cukup untuk menganalisis produk ini. Pastikan data Omzet Penjualan, Produk Terjual, dan Biaya Iklan terisi. Untuk analisis lebih akurat, gunakan fitur 'Hitung Ulang'."
+
+    # --- Format data untuk display di penjelasan detail ---
+    formatted_biaya_iklan_aktual = f"Rp{biaya_iklan_aktual:,.0f}" if np.isfinite(biaya_iklan_aktual) and biaya_iklan_aktual > 0 else "Rp0"
+    formatted_omzet_penjualan_aktual = f"Rp{omzet_penjualan_aktual:,.0f}" if np.isfinite(omzet_penjualan_aktual) and omzet_penjualan_aktual > 0 else "Rp0"
+    formatted_produk_terjual_plural = f"{int(produk_terjual_aktual):,} unit" if np.isfinite(produk_terjual_aktual) else "N/A unit"
+    formatted_roas_aktual = f"{roas_aktual:,.2f}" if np.isfinite(roas_aktual) else "N/A"
+    formatted_ctr = f"{ctr*100:,.2f}%" if np.isfinite(ctr) else "N/A"
+
+    if case == 'luar_biasa':
+        return (
+            f"Produk ini menunjukkan efisiensi iklan yang **sangat luar biasa** dengan ROAS aktual sebesar {formatted_roas_aktual}. "
+            f"ROAS Titik Impas produk ini adalah {display_roas_break_even_produk}, dan Anda bahkan melampaui target profit {target_profit_pct*100:.0f}%! "
+            f"Dengan biaya iklan {formatted_biaya_iklan_aktual} menghasilkan omzet {formatted_omzet_penjualan_aktual} dari {formatted_produk_terjual_plural} terjual, profit Anda sangat tinggi. "
+            f"**Sangat direkomendasikan untuk menaikkan anggaran iklan Anda secara agresif.** Anda dapat menetapkan Target ROAS di Shopee ke **{SHOPEE_ROAS_CAP:.1f}** (batas maksimal yang bisa diset) untuk memaksimalkan volume penjualan yang lebih besar."
+        )
+    if case == 'sangat_baik':
+        return (
+            f"Performa iklan produk ini **sangat baik** dengan ROAS aktual sebesar {formatted_roas_aktual}. "
+            f"Anda sudah mencapai atau melampaui target profit {target_profit_pct*100:.0f}% Anda! "
+            f"Anda mendapatkan omzet {formatted_omzet_penjualan_aktual} dengan biaya iklan {formatted_biaya_iklan_aktual} dari {formatted_produk_terjual_plural} terjual. "
+            f"Ini menunjukkan efisiensi yang tinggi dan potensi pertumbuhan yang baik. "
+            f"**Disarankan untuk menaikkan anggaran iklan Anda secara bertahap dan memantau hasilnya.** Anda dapat menargetkan ROAS sekitar **{roas_target_optimal_val}** di Shopee untuk menjaga profit dan meningkatkan penjualan."
+        )
+    if case == 'cukup_baik':
+        return (
+            f"Produk ini memiliki ROAS aktual {formatted_roas_aktual}, yang tergolong **cukup efisien** (di atas ROAS Titik Impas {display_roas_break_even_produk}), namun belum mencapai target profit {target_profit_pct*100:.0f}% Anda. "
+            f"Meskipun sudah menghasilkan omzet {formatted_omzet_penjualan_aktual} dari {formatted_produk_terjual_plural} terjual dengan biaya iklan {formatted_biaya_iklan_aktual}, ada ruang untuk peningkatan efisiensi agar sesuai target profit. "
+            f"**Pertahankan iklan ini, namun fokus pada optimasi lebih lanjut.** "
+            f"Pertimbangkan untuk memperbarui judul/gambar produk, menyesuaikan targeting audiens, menguji kata kunci baru, atau bahkan meninjau harga jual dan biaya pokok Anda untuk mencapai ROAS yang lebih tinggi (targetkan **{roas_target_optimal_val}**) dan profit yang sesuai target."
+        )
+    if case == 'boncos':
+        return (
+            f"ROAS aktual produk ini adalah {formatted_roas_aktual}, yang tergolong **sangat kurang efisien** dan kemungkinan besar merugi (di bawah atau sangat dekat dengan ROAS Titik Impas {display_roas_break_even_produk}). "
+            f"Biaya iklan {formatted_biaya_iklan_aktual} jauh terlalu tinggi dibandingkan hasil penjualan {formatted_omzet_penjualan_aktual} dari {formatted_produk_terjual_plural} terjual, mengakibatkan kerugian. "
+            f"**Disarankan untuk segera menurunkan anggaran iklan Anda secara signifikan atau bahkan jeda iklan ini.** "
+            f"Fokus pada perbaikan mendalam pada iklan (target, bid, konten) atau halaman produk. Jika tidak ada perbaikan, pertimbangkan untuk menghentikan iklan ini. Targetkan ROAS minimal **{roas_target_optimal_val}** untuk mulai balik modal."
+        )
+    if case == 'ctr_rendah':
+        return (
+            f"Iklan ini telah menghabiskan biaya {formatted_biaya_iklan_aktual} tanpa menghasilkan penjualan (ROAS {formatted_roas_aktual} / N/A). "
+            f"Persentase klik (CTR) yang sangat rendah ({formatted_ctr}) menunjukkan bahwa iklan Anda tidak menarik perhatian pembeli. "
+            f"**Segera jeda iklan ini.** Fokus pada perbaikan elemen kreatif seperti judul produk, gambar utama, dan video produk. "
+            f"Pastikan iklan Anda relevan dan menonjol di halaman pencarian atau rekomendasi agar mendapatkan lebih banyak klik."
+        )
+    # case == 'tanpa_konversi'
+    return (
+        f"Meskipun iklan ini mendapatkan klik (CTR {formatted_ctr}) dengan biaya {formatted_biaya_iklan_aktual}, tidak ada penjualan yang terjadi (ROAS {formatted_roas_aktual} / N/A). "
+        f"Ini menunjukkan bahwa pembeli mungkin tertarik pada iklan Anda, tetapi tidak yakin untuk membeli setelah melihat halaman produk. "
+        f"**Jeda iklan ini dan fokus pada optimasi halaman produk Anda.** Perbaiki harga, tambahkan promo menarik, "
+        f"perjelas deskripsi produk, perbanyak ulasan positif, atau tingkatkan kualitas gambar/video produk untuk meningkatkan konversi."
+    )
+
+
+def render_explanation_for_record(record):
+    """
+    Merender penjelasan detail dari satu record hasil recommend_frame (dict / baris DataFrame).
+    Jika record punya hasil analisa funnel (mode CSV), saran tahap terlemah ditambahkan di akhir.
+    """
+    explanation = render_detailed_explanation(
+        record.get('explanationCase'),
+        float(record.get('ROAS') or 0),
+        float(record.get('biaya') or 0),
+        float(record.get('omzetPenjualan') or 0),
+        float(record.get('produkTerjual') or 0),
+        float(record.get('persentaseKlik') or 0),
+        record.get('roasBreakEvenDisplay'),
+        float(record.get('targetProfitPct') or 0),
+        record.get('roasTargetOptimal')
+    )
+    if record.get('saranFunnel'):
+        explanation += f" **Analisa funnel:** {record['saranFunnel']}"
+    return explanation
+
+
+def _column_as_float(df, col_name):
+    # Meniru float(row.get(col) or 0): kolom hilang / None -> 0, NaN tetap NaN
+    if col_name not in df.columns:
+        return np.zeros(len(df))
+    values = df[col_name].to_numpy()
+    if values.dtype == object:
+        values = np.where(values == None, 0, values)  # noqa: E711 (perbandingan elemen per elemen)
+    return values.astype(float)
+
+
+def _override_as_float(value, length):
+    # Override bisa None (pakai default), skalar, atau array per baris (NaN = tidak diisi)
+    if value is None:
+        return np.full(length, np.nan), np.zeros(length, dtype=bool)
+    values = np.broadcast_to(np.asarray(value, dtype=float), (length,)).copy()
+    return values, ~np.isnan(values)
+
+
+def recommend_frame(df, modal_produk_input=None, fee_shopee_input=None, biaya_tambahan_input=None,
+                    target_profit_pct_input=None, harga_jual_per_unit_input=None, with_explanation=False):
+    """
+    Versi kolumnar dari get_recommendation untuk seluruh DataFrame sekaligus.
+    Override bisa berupa None, skalar, atau array sepanjang df (NaN berarti pakai asumsi default).
+    Penjelasan detail hanya dirender jika with_explanation=True; selain itu cukup simpan kolom
+    EXPLANATION_COLUMNS dan render lewat render_explanation_for_record saat produk ditampilkan.
+    """
+    n = len(df)
+    roas_aktual = _column_as_float(df, 'ROAS')
+    biaya_iklan_aktual = _column_as_float(df, 'biaya')
+    omzet_penjualan_aktual = _column_as_float(df, 'omzetPenjualan')
+    produk_terjual_aktual = _column_as_float(df, 'produkTerjual')
+    ctr = _column_as_float(df, 'persentaseKlik')
+
+    modal_in, has_modal = _override_as_float(modal_produk_input, n)
+    fee_in, has_fee = _override_as_float(fee_shopee_input, n)
+    tambahan_in, has_tambahan = _override_as_float(biaya_tambahan_input, n)
+    target_in, has_target = _override_as_float(target_profit_pct_input, n)
+    harga_in, has_harga = _override_as_float(harga_jual_per_unit_input, n)
+    has_any_override = has_modal | has_fee | has_tambahan | has_target
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terjual_positif = produk_terjual_aktual > 0
+        harga_dari_omzet = np.where(terjual_positif, omzet_penjualan_aktual / np.where(terjual_positif, produk_terjual_aktual, 1), 0.0)
+
+        modal_produk = np.where(has_modal, modal_in, DEFAULT_MODAL_PRODUCT_RATIO * harga_dari_omzet)
+        fee_shopee_pct = np.where(has_fee, fee_in, DEFAULT_SHOPEE_FEE_PERCENT)
+        biaya_tambahan = np.where(has_tambahan, tambahan_in, DEFAULT_ADDITIONAL_COST_PER_UNIT)
+        target_profit_pct = np.where(has_target, target_in, DEFAULT_TARGET_PROFIT_PERCENT)
+        harga_jual = np.where(has_harga & (harga_in > 0), harga_in, harga_dari_omzet)
+
+        # --- ROAS Break-Even & ROAS untuk Target Profit ---
+        biaya_pokok_total_per_unit = modal_produk + (harga_jual * fee_shopee_pct) + biaya_tambahan
+        profit_kotor_per_unit = harga_jual - biaya_pokok_total_per_unit
+        roas_break_even = np.where(profit_kotor_per_unit > 0, harga_jual / profit_kotor_per_unit, np.inf)
+
+        max_iklan_per_unit = harga_jual - (biaya_pokok_total_per_unit + harga_jual * target_profit_pct)
+        roas_target_profit = np.where(max_iklan_per_unit > 0, harga_jual / max_iklan_per_unit, np.inf)
+
+        profit_bersih_aktual = omzet_penjualan_aktual - (biaya_iklan_aktual + (biaya_pokok_total_per_unit * produk_terjual_aktual))
+        target_profit_omzet = omzet_penjualan_aktual * target_profit_pct
+
+    # --- Mask per kasus, urutannya sama dengan cabang if/elif di get_recommendation ---
+    harga_tidak_valid = harga_jual <= 0
+    ada_aktivitas = (omzet_penjualan_aktual > 0) | (produk_terjual_aktual > 0) | has_any_override
+    iklan_aktif = np.isfinite(roas_aktual) & np.isfinite(biaya_iklan_aktual) & (biaya_iklan_aktual > 0)
+    ctr_rendah = np.isfinite(ctr) & (ctr < 0.01)
+
+    cond_harga_invalid = harga_tidak_valid & ada_aktivitas
+    cond_kosong = harga_tidak_valid
+    cond_luar_biasa = iklan_aktif & (roas_aktual >= roas_target_profit)
+    cond_di_atas_bep = iklan_aktif & (roas_aktual > roas_break_even)
+    cond_sangat_baik = cond_di_atas_bep & (profit_bersih_aktual >= target_profit_omzet)
+    cond_boncos = iklan_aktif & (roas_aktual > 0) & (roas_aktual <= roas_break_even)
+    cond_roas_nol = iklan_aktif & (roas_aktual == 0)
+    cond_netral = ~iklan_aktif
+
+    conditions = [
+        cond_harga_invalid, cond_kosong, cond_luar_biasa, cond_sangat_baik, cond_di_atas_bep,
+        cond_boncos, cond_roas_nol & ctr_rendah, cond_roas_nol, cond_netral
+    ]
+    case_names = ['harga_invalid', 'default', 'luar_biasa', 'sangat_baik', 'cukup_baik',
+                  'boncos', 'ctr_rendah', 'tanpa_konversi', 'netral']
+    explanation_case = np.select(conditions, case_names, default='default')
+
+    tag = np.select(conditions, [_CASE_LABELS[c][0] for c in case_names], default='default')
+    analisa = np.select(conditions, [_CASE_LABELS[c][1] for c in case_names], default=_CASE_LABELS['default'][1])
+    rekomendasi_aksi = np.select(conditions, [_CASE_LABELS[c][2] for c in case_names], default=_CASE_LABELS['default'][2])
+
+    # --- Target ROAS optimal & modal harian (numerik, NaN = "N/A") ---
+    with np.errstate(invalid='ignore'):
+        roas_target_optimal = np.select(
+            [cond_luar_biasa, cond_sangat_baik, cond_di_atas_bep, cond_boncos],
+            [
+                np.full(n, SHOPEE_ROAS_CAP),
+                np.minimum(SHOPEE_ROAS_CAP, np.maximum(roas_aktual * 1.05, roas_target_profit)),
+                np.minimum(SHOPEE_ROAS_CAP, np.maximum(roas_aktual * 1.05, roas_break_even * 1.1)),
+                np.minimum(SHOPEE_ROAS_CAP, roas_break_even * 1.1),
+            ],
+            default=np.nan
+        )
+        budget_multiplier = np.select(
+            [cond_luar_biasa, cond_sangat_baik, cond_di_atas_bep, cond_boncos, cond_roas_nol],
+            [3, 1.5, 1.0, 0.3, 0],
+            default=np.nan
+        )
+        modal_harian = np.where(budget_multiplier > 0, np.maximum(SHOPEE_MIN_DAILY_BUDGET, biaya_iklan_aktual * budget_multiplier), budget_multiplier)
+
+    # Kasus harga tidak valid / kosong di-return lebih awal pada versi skalar
+    early_exit = cond_harga_invalid | cond_kosong
+    roas_target_optimal[early_exit] = np.nan
+    modal_harian[early_exit] = np.nan
+
+    # --- Format hanya kolom yang tampil di tabel ---
+    roas_target_optimal_text = np.where(np.isnan(roas_target_optimal), "N/A", np.char.mod('%.1f', roas_target_optimal))
+    rekomendasi_modal_harian_text = [
+        "N/A" if np.isnan(v) else f"Rp{v:,.0f}" for v in modal_harian
+    ]
+
+    # ROAS Titik Impas untuk display (disimpan sebagai teks agar identik dengan versi skalar)
+    roas_break_even_display = [
+        str(min(be, SHOPEE_ROAS_CAP)) if np.isfinite(be) else ("Tak Terhingga" if pk <= 0 else "N/A")
+        for be, pk in zip(roas_break_even, profit_kotor_per_unit)
+    ]
+
+    result = pd.DataFrame({
+        'analisa': analisa,
+        'rekomendasiAksi': rekomendasi_aksi,
+        'roasTargetOptimal': roas_target_optimal_text,
+        'tagWarna': tag,
+        'detailedExplanation': None,
+        'rekomendasiModalHarian': rekomendasi_modal_harian_text,
+        'explanationCase': explanation_case,
+        'roasBreakEvenDisplay': roas_break_even_display,
+        'targetProfitPct': target_profit_pct,
+    }, index=df.index)
+
+    if with_explanation:
+        source = pd.concat([df[[c for c in ['ROAS', 'biaya', 'omzetPenjualan', 'produkTerjual', 'persentaseKlik'] if c in df.columns]], result], axis=1)
+        result['detailedExplanation'] = [render_explanation_for_record(rec) for rec in source.to_dict(orient='records')]
+
+    return result
@@ -0,0 +1,266 @@
+# File: blueprints/apps/calculator_roas/report_format.py
+# Deteksi format laporan iklan Shopee + cache "parse plan" per layout.
+# Layout dikenali dari jumlah baris preamble + teks mentah baris header. Upload berikutnya dengan layout yang sama
+# langsung memakai plan yang sudah jadi: tanpa mencari awal tabel, membaca header, validasi kolom, dan penyusunan
+# usecols/dtype ulang. Isi preamble (periode, nama toko) berubah di tiap laporan, jadi tidak ikut jadi kunci.
+# Locale angka tetap ditebak per file (header yang sama bisa berisi angka format EN atau ID); sidik jari (fingerprint)
+# plan = panjang preamble, pemisah kolom, susunan kolom, dan locale angka. Parser hanya membaca kolom yang dipakai analisa.
+# Keterangan laporan di preamble (periode laporan, nama toko) dibaca terpisah lewat detect_report_meta.
+import csv
+import datetime
+import hashlib
+import re
+import threading
+from collections import OrderedDict, namedtuple
+
+from .number_format import detect_decimal_separator
+
+SHOPEE_PREAMBLE_ROWS = 11     # Jumlah baris keterangan di atas tabel pada laporan Shopee (dipakai jika tidak terdeteksi)
+SNIFF_BYTES = 64 * 1024       # Ukuran sampel untuk mendeteksi format
+MAX_PREAMBLE_SCAN = 50        # Jumlah baris awal yang diperiksa untuk mencari awal tabel
+LOCALE_SAMPLE_ROWS = 200      # Jumlah baris data di sampel yang dipakai untuk menebak locale angka
+PARSE_PLAN_CACHE_SIZE = 32    # Jumlah layout laporan yang plan-nya disimpan di memori
+
+SHOPEE_REPORT_COLUMNS = [
+    'Urutan', 'Nama Iklan', 'Status', 'Kode Produk', 'Mode Bidding', 'Penempatan Iklan', 'Tanggal Mulai',
+    'Tanggal Selesai', 'Dilihat', 'Jumlah Klik', 'Persentase Klik', 'Konversi', 'Konversi Langsung',
+    'Tingkat konversi', 'Tingkat Konversi Langsung', 'Biaya per Konversi', 'Biaya per Konversi Langsung',
+    'Produk Terjual', 'Terjual Langsung', 'Omzet Penjualan', 'Penjualan Langsung (GMV Langsung)',
+    'Biaya', 'Efektifitas Iklan', 'Efektivitas Langsung', 'Persentase Biaya Iklan terhadap Penjualan dari Iklan (ACOS)',
+    'Persentase Biaya Iklan terhadap Penjualan dari Iklan Langsung (ACOS Langsung)'
+]
+
+REQUIRED_COLUMNS = ['Nama Iklan', 'Kode Produk', 'Biaya', 'Omzet Penjualan', 'Persentase Klik', 'Status', 'Produk Terjual']
+
+# Kolom tambahan untuk tren per produk (analysis_history / trends); dibaca jika ada di laporan
+TREND_REPORT_COLUMNS = ['Dilihat', 'Jumlah Klik', 'Konversi']
+
+# Kolom tambahan untuk analisa funnel (funnel.py); dibaca jika ada di laporan
+FUNNEL_REPORT_COLUMNS = [
+    'Konversi Langsung', 'Tingkat konversi', 'Tingkat Konversi Langsung', 'Biaya per Konversi', 'Biaya per Konversi Langsung'
+]
+
+# Kolom tambahan untuk atribusi langsung / tidak langsung (attribution.py); dibaca jika ada di laporan
+ATTRIBUTION_REPORT_COLUMNS = [
+    'Terjual Langsung', 'Penjualan Langsung (GMV Langsung)', 'Efektivitas Langsung',
+    'Persentase Biaya Iklan terhadap Penjualan dari Iklan Langsung (ACOS Langsung)'
+]
+
+# Kolom yang benar-benar dibaca dari laporan (sisanya dilewati parser lewat usecols)
+ANALYSIS_COLUMNS = REQUIRED_COLUMNS + TREND_REPORT_COLUMNS + FUNNEL_REPORT_COLUMNS + ATTRIBUTION_REPORT_COLUMNS
+
+# Kolom angka (nama asli laporan) -> True jika nilainya tidak punya pecahan 3 digit (Rupiah, hitungan),
+# jadi "1.234" pasti berarti seribu dua ratus tiga puluh empat
+NUMERIC_REPORT_COLUMNS = {
+    'Biaya': True,
+    'Omzet Penjualan': True,
+    'Persentase Klik': False,
+    'Produk Terjual': False,
+    'Dilihat': True,
+    'Jumlah Klik': True,
+    'Konversi': True,
+    'Konversi Langsung': True,
+    'Tingkat konversi': False,
+    'Tingkat Konversi Langsung': False,
+    'Biaya per Konversi': True,
+    'Biaya per Konversi Langsung': True,
+    'Terjual Langsung': False,
+    'Penjualan Langsung (GMV Langsung)': True,
+    'Efektivitas Langsung': False,
+    'Persentase Biaya Iklan terhadap Penjualan dari Iklan Langsung (ACOS Langsung)': False,
+}
+
+ParsePlan = namedtuple('ParsePlan', [
+    'fingerprint',         # ID pendek format laporan (untuk log / cache)
+    'sep',                 # Pemisah kolom
+    'skiprows',            # Jumlah baris yang dilewati sebelum baris data pertama
+    'usecols',             # Posisi kolom yang dibaca
+    'names',               # Nama kolom untuk posisi di usecols (urut sesuai posisi)
+    'dtype',               # dtype untuk pd.read_csv (kolom angka dibaca sebagai teks)
+    'decimal_separators',  # Nama kolom laporan -> pemisah desimal ('.' atau ',')
+])
+
+ReportMeta = namedtuple('ReportMeta', [
+    'report_date',  # datetime.date akhir periode laporan (None jika tidak ada di preamble)
+    'shop',         # Nama / ID toko dari preamble (None jika tidak ada)
+])
+
+# Label baris preamble yang berisi nama toko, urut prioritas (huruf kecil)
+PREAMBLE_SHOP_LABELS = ['nama toko', 'shop name', 'username', 'nama pengguna', 'id toko', 'shop id']
+PREAMBLE_PERIOD_LABELS = ('periode', 'period') # Baris periode didahulukan dari tanggal lain (mis. 'Tanggal Dibuat')
+
+_DATE_PATTERN = re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})|(\d{1,2})[/.-](\d{1,2})[/.-](\d{4})')
+
+_KNOWN_COLUMNS = frozenset(SHOPEE_REPORT_COLUMNS)
+
+_plan_cache = OrderedDict() # (index baris header, teks baris header) -> (plan tanpa locale, kolom, posisi kolom)
+_plan_cache_lock = threading.Lock()
+_plan_cache_stats = {'hits': 0, 'misses': 0}
+
+
+def _find_table_start(lines, expected_columns=len(SHOPEE_REPORT_COLUMNS)):
+    """
+    Mencari baris pertama tabel (header atau data) = baris pertama yang punya >= expected_columns - 1 pemisah.
+    Mengembalikan (index_baris, pemisah) atau (None, ',') jika tidak ketemu.
+    """
+    for index, line in enumerate(lines[:MAX_PREAMBLE_SCAN]):
+        for sep in (',', ';'):
+            if line.count(sep) >= expected_columns - 1:
+                return index, sep
+    return None, ','
+
+
+def _sample_lines(sample_text):
+    lines = sample_text.split('\n')
+    if len(lines) > 1:
+        lines = lines[:-1] # Baris terakhir sampel bisa terpotong
+    return [line.rstrip('\r') for line in lines]
+
+
+def _is_header_row(fields):
+    # Baris header = sebagian besar isinya nama kolom Shopee (kolom wajib yang hilang dilaporkan di _compile_plan)
+    known = sum(1 for field in fields if field in _KNOWN_COLUMNS)
+    return known >= len(SHOPEE_REPORT_COLUMNS) // 2
+
+
+def _detect_locale(data_lines, sep, column_positions):
+    """Menebak pemisah desimal tiap kolom angka dari beberapa baris data di sampel."""
+    rows = list(csv.reader(data_lines[:LOCALE_SAMPLE_ROWS], delimiter=sep, skipinitialspace=True))
+    separators = {}
+    for column, is_currency in NUMERIC_REPORT_COLUMNS.items():
+        position = column_positions.get(column)
+        values = [row[position] for row in rows if position is not None and position < len(row)]
+        separators[column] = detect_decimal_separator(values, currency=is_currency)
+    return separators
+
+
+def _fingerprint(skiprows, sep, columns, decimal_separators):
+    key = repr((skiprows, sep, tuple(columns), tuple(sorted(decimal_separators.items()))))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+
+
+def _compile_plan(sep, skiprows, columns):
+    """Menyusun parse plan: validasi kolom wajib, usecols, dan dtype (fingerprint & locale diisi per file)."""
+    missing_cols = [col for col in REQUIRED_COLUMNS if col not in columns]
+    if missing_cols:
+        raise ValueError(f"File CSV tidak memiliki kolom yang dibutuhkan: {', '.join(missing_cols)}. Harap pastikan format Shopee yang benar.")
+
+    positions = {}
+    for position, column in enumerate(columns):
+        positions.setdefault(column, position) # Nama kolom ganda: ambil yang pertama
+    usecols = sorted(positions[column] for column in ANALYSIS_COLUMNS if column in positions)
+    names = [columns[position] for position in usecols]
+    dtype = {'Kode Produk': str, **{column: str for column in NUMERIC_REPORT_COLUMNS if column in names}}
+    return ParsePlan(None, sep, skiprows, usecols, names, dtype, None)
+
+
+def _cached_layout(lines):
+    """Layout yang sudah dikenal: cocokkan baris mentah di posisi header yang pernah dilihat (tanpa deteksi ulang)."""
+    with _plan_cache_lock:
+        for table_start in {key[0] for key in _plan_cache}:
+            key = (table_start, lines[table_start]) if table_start < len(lines) else None
+            if key in _plan_cache:
+                _plan_cache.move_to_end(key)
+                _plan_cache_stats['hits'] += 1
+                return _plan_cache[key]
+        _plan_cache_stats['misses'] += 1
+    return None
+
+
+def _detect_layout(lines):
+    """Deteksi penuh: awal tabel, pemisah, header, lalu plan (tanpa locale). Mengembalikan (key cache atau None, layout)."""
+    table_start, sep = _find_table_start(lines)
+    if table_start is None:
+        # Tidak ada baris selebar tabel Shopee di sampel: bukan laporan iklan Shopee (jangan ditebak)
+        raise ValueError("Tabel laporan iklan Shopee tidak ditemukan di file ini. Harap unggah laporan iklan Shopee (CSV) yang benar.")
+    header_fields = [field.strip() for field in next(csv.reader([lines[table_start]], delimiter=sep))]
+    if _is_header_row(header_fields):
+        skiprows, columns = table_start + 1, header_fields
+        key = (table_start, lines[table_start])
+    else:
+        # Tanpa header, baris pertama tabel adalah data (berbeda di tiap file), jadi layout-nya tidak di-cache
+        skiprows, columns = table_start, SHOPEE_REPORT_COLUMNS
+        key = None
+    column_positions = {column: position for position, column in reversed(list(enumerate(columns)))}
+    return key, (_compile_plan(sep, skiprows, columns), columns, column_positions)
+
+
+def detect_report_format(sample_text):
+    """
+    Mendeteksi format laporan dari sampel awal file dan mengembalikan ParsePlan (dari cache jika layout sudah dikenal).
+    Jika tabel memiliki baris header, nama kolom diambil dari header; jika tidak, dipakai urutan kolom bawaan Shopee.
+    ValueError jika sampel tidak berisi tabel laporan iklan Shopee sama sekali.
+    """
+    lines = _sample_lines(sample_text)
+
+    layout = _cached_layout(lines)
+    if layout is None:
+        key, layout = _detect_layout(lines)
+        if key is not None:
+            with _plan_cache_lock:
+                _plan_cache[key] = layout
+                while len(_plan_cache) > PARSE_PLAN_CACHE_SIZE:
+                    _plan_cache.popitem(last=False)
+    plan, columns, column_positions = layout
+
+    # Locale angka per file (lihat keterangan di atas)
+    data_lines = [line for line in lines[plan.skiprows:] if line.strip()]
+    decimal_separators = _detect_locale(data_lines, plan.sep, column_positions)
+    fingerprint = _fingerprint(plan.skiprows, plan.sep, columns, decimal_separators)
+    return plan._replace(fingerprint=fingerprint, decimal_separators=decimal_separators)
+
+
+def _dates_in(text):
+    """Semua tanggal valid di teks: format 2025-07-31 atau hari dulu (31/07/2025, 31-07-2025, 31.07.2025)."""
+    dates = []
+    for match in _DATE_PATTERN.finditer(text):
+        if match.group(1):
+            year, month, day = match.group(1), match.group(2), match.group(3)
+        else:
+            day, month, year = match.group(4), match.group(5), match.group(6)
+        try:
+            dates.append(datetime.date(int(year), int(month), int(day)))
+        except ValueError:
+            continue
+    return dates
+
+
+def detect_report_meta(sample_text):
+    """
+    Membaca keterangan laporan dari preamble (baris di atas tabel): tanggal akhir periode laporan dan nama toko.
+    Baris preamble berbentuk 'Label,Nilai'; yang tidak ditemukan dikembalikan sebagai None.
+    """
+    lines = _sample_lines(sample_text)
+    table_start, sep = _find_table_start(lines)
+    preamble = lines[:SHOPEE_PREAMBLE_ROWS if table_start is None else table_start]
+
+    period_dates, other_dates, shops = [], [], {}
+    for row in csv.reader(preamble, delimiter=sep):
+        fields = [field.strip() for field in row if field.strip()]
+        if not fields:
+            continue
+        label = fields[0].rstrip(':').lower()
+        value = ' '.join(fields[1:])
+        if label in PREAMBLE_SHOP_LABELS and value:
+            shops.setdefault(label, value)
+        dates = _dates_in(value or fields[0])
+        if any(label.startswith(prefix) for prefix in PREAMBLE_PERIOD_LABELS):
+            period_dates.extend(dates)
+        else:
+            other_dates.extend(dates)
+
+    dates = period_dates or other_dates
+    shop = next((shops[label] for label in PREAMBLE_SHOP_LABELS if label in shops), None)
+    return ReportMeta(max(dates) if dates else None, shop)
+
+
+def parse_plan_cache_info():
+    """Statistik cache parse plan (untuk debug/monitoring)."""
+    with _plan_cache_lock:
+        return {'size': len(_plan_cache), **_plan_cache_stats}
+
+
+def clear_parse_plan_cache():
+    with _plan_cache_lock:
+        _plan_cache.clear()
+        _plan_cache_stats.update(hits=0, misses=0)
@@ -0,0 +1,302 @@
+# File: blueprints/apps/calculator_roas/result_store.py
+# Penyimpanan hasil analisa di sisi server.
+# Session Flask (cookie) hanya menyimpan ID analisa yang pendek; data lengkapnya
+# (result_data + baris produk hasil analisa) disimpan di sini dan dimuat saat dibutuhkan.
+# Baris produk disimpan terindeks per produkId, jadi mengambil satu produk (mis. untuk Hitung Ulang)
+# tidak perlu membaca seluruh laporan.
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+DEFAULT_TTL_SECONDS = 24 * 3600 # Hasil analisa disimpan 24 jam
+EVICT_INTERVAL_SECONDS = 300    # Pembersihan data kedaluwarsa paling sering tiap 5 menit
+FILE_PRODUCT_CACHE_SIZE = 8     # Jumlah indeks produk (per analisa) yang di-cache di memori oleh FileResultStore
+SQLITE_IN_BATCH = 500           # Jumlah produkId per query IN (batas parameter SQLite)
+
+
+def _new_analysis_id():
+    return secrets.token_urlsafe(9) # 12 karakter, aman untuk URL
+
+
+class SQLiteResultStore:
+    """Menyimpan hasil analisa sebagai JSON di SQLite lokal; baris produk di tabel terpisah dengan primary key (analisa, produkId)."""
+
+    def __init__(self, path, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._last_evict = 0
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS analysis_result ("
+                " id TEXT PRIMARY KEY,"
+                " user_id TEXT NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " payload TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_analysis_result_expires_at ON analysis_result (expires_at)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS analysis_product ("
+                " analysis_id TEXT NOT NULL,"
+                " produk_id TEXT NOT NULL,"
+                " record TEXT NOT NULL,"
+                " PRIMARY KEY (analysis_id, produk_id)) WITHOUT ROWID"
+            )
+
+    def _connect(self):
+        # Satu koneksi per thread (sqlite3 tidak boleh dipakai lintas thread)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            self._local.conn = conn
+        return conn
+
+    def save(self, user_id, payload, replaces=None, products=None):
+        """Menyimpan payload (+ dict produkId -> baris produk, opsional) dan mengembalikan ID analisa baru."""
+        analysis_id = _new_analysis_id()
+        now = time.time()
+        with self._connect() as conn:
+            if replaces:
+                self._delete(conn, user_id, replaces)
+            conn.execute(
+                "INSERT INTO analysis_result (id, user_id, expires_at, payload) VALUES (?, ?, ?, ?)",
+                (analysis_id, user_id, now + self.ttl_seconds, json.dumps(payload))
+            )
+            if products:
+                conn.executemany(
+                    "INSERT INTO analysis_product (analysis_id, produk_id, record) VALUES (?, ?, ?)",
+                    ((analysis_id, str(produk_id), json.dumps(record)) for produk_id, record in products.items())
+                )
+        self._maybe_evict(now)
+        return analysis_id
+
+    def load(self, user_id, analysis_id):
+        if not analysis_id:
+            return None
+        row = self._connect().execute(
+            "SELECT payload FROM analysis_result WHERE id = ? AND user_id = ? AND expires_at > ?",
+            (analysis_id, user_id, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def load_product(self, user_id, analysis_id, produk_id):
+        """Mengambil satu baris produk lewat primary key, tanpa membaca sisa laporan."""
+        if not analysis_id or produk_id is None:
+            return None
+        row = self._connect().execute(
+            "SELECT p.record FROM analysis_product p JOIN analysis_result r ON r.id = p.analysis_id"
+            " WHERE p.analysis_id = ? AND p.produk_id = ? AND r.user_id = ? AND r.expires_at > ?",
+            (analysis_id, str(produk_id), user_id, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def load_products(self, user_id, analysis_id, produk_ids):
+        """Mengambil banyak baris produk sekaligus (produkId -> baris); produk yang tidak ada dilewati."""
+        produk_ids = list(dict.fromkeys(str(produk_id) for produk_id in produk_ids if produk_id is not None))
+        if not analysis_id or not produk_ids:
+            return {}
+        conn = self._connect()
+        owner = conn.execute(
+            "SELECT 1 FROM analysis_result WHERE id = ? AND user_id = ? AND expires_at > ?",
+            (analysis_id, user_id, time.time())
+        ).fetchone()
+        if not owner:
+            return {}
+        products = {}
+        for start in range(0, len(produk_ids), SQLITE_IN_BATCH):
+            batch = produk_ids[start:start + SQLITE_IN_BATCH]
+            rows = conn.execute(
+                f"SELECT produk_id, record FROM analysis_product WHERE analysis_id = ? AND produk_id IN ({','.join('?' * len(batch))})",
+                (analysis_id, *batch)
+            ).fetchall()
+            products.update((produk_id, json.loads(record)) for produk_id, record in rows)
+        return products
+
+    def _delete(self, conn, user_id, analysis_id):
+        deleted = conn.execute("DELETE FROM analysis_result WHERE id = ? AND user_id = ?", (analysis_id, user_id)).rowcount
+        if deleted:
+            conn.execute("DELETE FROM analysis_product WHERE analysis_id = ?", (analysis_id,))
+
+    def delete(self, user_id, analysis_id):
+        with self._connect() as conn:
+            self._delete(conn, user_id, analysis_id)
+
+    def evict_expired(self, now=None):
+        cutoff = now or time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM analysis_product WHERE analysis_id IN (SELECT id FROM analysis_result WHERE expires_at <= ?)",
+                (cutoff,)
+            )
+            conn.execute("DELETE FROM analysis_result WHERE expires_at <= ?", (cutoff,))
+
+    def _maybe_evict(self, now):
+        if now - self._last_evict >= EVICT_INTERVAL_SECONDS:
+            self._last_evict = now
+            self.evict_expired(now)
+
+
+class FileResultStore:
+    """
+    Menyimpan hasil analisa sebagai file JSON per ID di satu folder.
+    Baris produk disimpan di file terpisah (dict produkId -> baris) dan indeksnya di-cache di memori,
+    jadi hanya lookup pertama per analisa yang perlu membaca file.
+    """
+
+    def __init__(self, directory, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self._last_evict = 0
+        self._product_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _file_path(self, analysis_id, suffix='json'):
+        # ID dibuat oleh token_urlsafe, tapi tetap tolak karakter path dari input luar
+        if not analysis_id or not all(ch.isalnum() or ch in '-_' for ch in analysis_id):
+            return None
+        return os.path.join(self.directory, f"{analysis_id}.{suffix}")
+
+    def _write_json(self, file_path, data):
+        tmp_path = file_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, file_path) # Tulis atomik
+
+    def save(self, user_id, payload, replaces=None, products=None):
+        """Menyimpan payload (+ dict produkId -> baris produk, opsional) dan mengembalikan ID analisa baru."""
+        if replaces:
+            self.delete(user_id, replaces)
+        analysis_id = _new_analysis_id()
+        now = time.time()
+        if products:
+            self._write_json(self._file_path(analysis_id, 'products.json'), {str(k): v for k, v in products.items()})
+        self._write_json(
+            self._file_path(analysis_id),
+            {'user_id': user_id, 'expires_at': now + self.ttl_seconds, 'payload': payload}
+        )
+        self._maybe_evict(now)
+        return analysis_id
+
+    def _read(self, analysis_id):
+        file_path = self._file_path(analysis_id)
+        if not file_path:
+            return None
+        try:
+            with open(file_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def load(self, user_id, analysis_id):
+        entry = self._read(analysis_id)
+        if not entry or entry.get('user_id') != user_id or entry.get('expires_at', 0) <= time.time():
+            return None
+        return entry['payload']
+
+    def _product_index(self, user_id, analysis_id):
+        with self._cache_lock:
+            cached = self._product_cache.get(analysis_id)
+            if cached is not None:
+                self._product_cache.move_to_end(analysis_id)
+        if cached is None:
+            entry = self._read(analysis_id)
+            if not entry:
+                return None
+            try:
+                with open(self._file_path(analysis_id, 'products.json'), encoding='utf-8') as f:
+                    products = json.load(f)
+            except (OSError, ValueError):
+                products = {}
+            cached = (entry.get('user_id'), entry.get('expires_at', 0), products)
+            with self._cache_lock:
+                self._product_cache[analysis_id] = cached
+                while len(self._product_cache) > FILE_PRODUCT_CACHE_SIZE:
+                    self._product_cache.popitem(last=False)
+        owner, expires_at, products = cached
+        if owner != user_id or expires_at <= time.time():
+            return None
+        return products
+
+    def load_product(self, user_id, analysis_id, produk_id):
+        """Mengambil satu baris produk dari indeks produkId (di-cache setelah lookup pertama)."""
+        if produk_id is None:
+            return None
+        products = self._product_index(user_id, analysis_id)
+        return products.get(str(produk_id)) if products else None
+
+    def load_products(self, user_id, analysis_id, produk_ids):
+        """Mengambil banyak baris produk sekaligus (produkId -> baris); produk yang tidak ada dilewati."""
+        products = self._product_index(user_id, analysis_id) if analysis_id else None
+        if not products:
+            return {}
+        found = {}
+        for produk_id in produk_ids:
+            if produk_id is not None and str(produk_id) in products:
+                found[str(produk_id)] = products[str(produk_id)]
+        return found
+
+    def delete(self, user_id, analysis_id):
+        entry = self._read(analysis_id)
+        if entry and entry.get('user_id') == user_id:
+            with self._cache_lock:
+                self._product_cache.pop(analysis_id, None)
+            for suffix in ('json', 'products.json'):
+                try:
+                    os.remove(self._file_path(analysis_id, suffix))
+                except OSError:
+                    pass
+
+    def evict_expired(self, now=None):
+        # Cukup cek mtime: file ditulis sekali saat save, jadi mtime + TTL = waktu kedaluwarsa
+        cutoff = (now or time.time()) - self.ttl_seconds
+        for name in os.listdir(self.directory):
+            file_path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(file_path) <= cutoff:
+                    os.remove(file_path)
+            except OSError:
+                pass
+
+    def _maybe_evict(self, now):
+        if now - self._last_evict >= EVICT_INTERVAL_SECONDS:
+            self._last_evict = now
+            self.evict_expired(now)
+
+
+RESULT_STORE_BACKENDS = {
+    'sqlite': (SQLiteResultStore, 'roas_results.db'),
+    'file': (FileResultStore, 'roas_results'),
+}
+
+
+def result_store_spec(app):
+    """(backend, path, ttl) result store aplikasi: cukup untuk membuka store yang sama di proses lain (lihat analysis_jobs)."""
+    backend = app.config.get('ROAS_RESULT_STORE', 'sqlite')
+    if backend not in RESULT_STORE_BACKENDS:
+        raise ValueError(f"ROAS_RESULT_STORE tidak dikenal: {backend}. Pilihan: {', '.join(RESULT_STORE_BACKENDS)}")
+    path = app.config.get('ROAS_RESULT_STORE_PATH') or os.path.join(app.instance_path, RESULT_STORE_BACKENDS[backend][1])
+    return backend, path, app.config.get('ROAS_RESULT_TTL_SECONDS', DEFAULT_TTL_SECONDS)
+
+
+def open_result_store(spec):
+    backend, path, ttl_seconds = spec
+    return RESULT_STORE_BACKENDS[backend][0](path, ttl_seconds)
+
+
+def get_result_store():
+    """Mengembalikan result store milik aplikasi aktif (dibuat sekali per proses sesuai config ROAS_RESULT_STORE)."""
+    app = current_app._get_current_object()
+    store = app.extensions.get('roas_result_store')
+    if store is None:
+        spec = result_store_spec(app)
+        os.makedirs(app.instance_path, exist_ok=True)
+        store = open_result_store(spec)
+        app.extensions['roas_result_store'] = store
+    return store
@@ -1,29 +1,58 @@
-from flask import render_template, redirect, url_for, flash, request, session, jsonify, get_flashed_messages
+from flask import render_template, redirect, url_for, flash, request, session, jsonify, get_flashed_messages, current_app, g
 from flask_login import login_required, current_user
-from extensions import db, get_app_trial_status
+from extensions import db, app_access_required, get_app_by_url, get_app_trial_status, get_user_app_grant
 import datetime
+import hashlib
+import json
 from flask_wtf.csrf import generate_csrf
-import pandas as pd
 import numpy as np
-import io
 
 from . import bp
-from models import App, UserApp
 
-# --- GLOBAL CONSTANTS ---
-SHOPEE_ROAS_CAP = 50.0  # ROAS maksimal yang bisa diset di Shopee
-SHOPEE_MIN_DAILY_BUDGET = 5000  # Minimal modal harian di Shopee
-
-# --- DEFAULT ASSUMPTIONS FOR PROFIT CALCULATION (IF NOT AVAILABLE FROM CSV OR USER INPUT) ---
-# Ini adalah asumsi. Digunakan jika user tidak memberikan input di form hitung ulang.
-DEFAULT_MODAL_PRODUCT_RATIO = 0.50   # Modal produk 50% dari harga jual
-DEFAULT_SHOPEE_FEE_PERCENT = 0.05    # Fee Shopee 5% dari harga jual
-DEFAULT_ADDITIONAL_COST_PER_UNIT = 1000 # Biaya tambahan per unit Rp1000
-DEFAULT_TARGET_PROFIT_PERCENT = 0.10 # Target profit 10% dari omzet
+from .constants import (
+    SHOPEE_ROAS_CAP, SHOPEE_MIN_DAILY_BUDGET,
+    DEFAULT_MODAL_PRODUCT_RATIO, DEFAULT_SHOPEE_FEE_PERCENT,
+    DEFAULT_ADDITIONAL_COST_PER_UNIT, DEFAULT_TARGET_PROFIT_PERCENT
+)
+from .recommendation import render_detailed_explanation, render_explanation_for_record
+from .result_store import get_result_store
+from .csv_ingest import peek_report_meta, read_shopee_report
+from .csv_analysis import (
+    analyze_report_frame, build_csv_result, count_shops, empty_shop_messages, merge_shop_frames, report_shop_name,
+    shop_name_from_filename
+)
+from .analysis_jobs import JOB_DONE, JOB_FAILED, AnalysisQueueFull, get_analysis_jobs
+from .analysis_history import get_analysis_history, history_summary_lines, record_history
+from .trends import TREND_WINDOWS_DAYS, trend_json
+from .simulation import (
+    CURVE_DEFAULT_POINTS, CURVE_MAX_POINTS,
+    profit_curve, simulation_table, unique_roas_points
+)
+from .memo_cache import MONEY_DIGITS, RATIO_DIGITS, memoize, round_key
+from .batch_recalc import MAX_BATCH_PRODUCTS, overrides_from_cost_sheet, overrides_from_json, recalculate_batch_frame
+from .budget_optimizer import BUDGET_SPEND_ELASTICITY, optimize_portfolio_budget
 
 
 # --- GLOBAL HELPER FUNCTIONS ---
+def recommendation_cache_key(row_data, modal_produk_input=None, fee_shopee_input=None, biaya_tambahan_input=None, target_profit_pct_input=None, harga_jual_per_unit_input=None):
+    """Key memo cache get_recommendation: hanya input numerik yang mempengaruhi hasil (produkId/nama tidak dipakai)."""
+    return (
+        round_key(row_data.get('ROAS') or 0, RATIO_DIGITS),
+        round_key(row_data.get('biaya') or 0, MONEY_DIGITS),
+        round_key(row_data.get('omzetPenjualan') or 0, MONEY_DIGITS),
+        round_key(row_data.get('produkTerjual') or 0, MONEY_DIGITS),
+        round_key(row_data.get('persentaseKlik') or 0, RATIO_DIGITS),
+        round_key(modal_produk_input, MONEY_DIGITS),
+        round_key(fee_shopee_input, RATIO_DIGITS),
+        round_key(biaya_tambahan_input, MONEY_DIGITS),
+        round_key(target_profit_pct_input, RATIO_DIGITS),
+        round_key(harga_jual_per_unit_input, MONEY_DIGITS),
+    )
+
+
 # Menambahkan harga_jual_per_unit_input sebagai parameter opsional di fungsi get_recommendation
+# Hasilnya di-memo per tuple input (Hitung Ulang / Analisa Manual dengan angka yang sama tidak dihitung ulang)
+@memoize('recommendation', recommendation_cache_key, restore=tuple)
 def get_recommendation(row_data, modal_produk_input=None, fee_shopee_input=None, biaya_tambahan_input=None, target_profit_pct_input=None, harga_jual_per_unit_input=None):
     """
     Menerapkan logika rekomendasi pada setiap baris data produk.
@@ -58,7 +87,7 @@ def get_recommendation(row_data, modal_produk_input=None, fee_shopee_input=None,
     rekomendasi_aksi_text = "BELUM ADA REKOMENDASI"
     roas_target_optimal_val = "N/A"
     rekomendasi_modal_harian_text = "N/A"
-    detailed_explanation = "Tidak ada data iklan yang cukup untuk menganalisis produk ini. Pastikan data Omzet Penjualan, Produk Terjual, dan Biaya Iklan terisi. Untuk analisis lebih akurat, gunakan fitur 'Hitung Ulang'."
+    explanation_case = 'default' # Kunci teks penjelasan detail, dirender oleh render_detailed_explanation
 
     # --- Tentukan nilai-nilai untuk perhitungan profit (menggunakan input override atau data aktual) ---
     # Harga Jual Per Unit: Prioritaskan harga_jual_per_unit_input jika diberikan
@@ -71,10 +100,11 @@ def get_recommendation(row_data, modal_produk_input=None, fee_shopee_input=None,
     if current_harga_jual <= 0 and (omzet_penjualan_aktual > 0 or produk_terjual_aktual > 0 or (modal_produk_input is not None or fee_shopee_input is not None or biaya_tambahan_input is not None or target_profit_pct_input is not None)) :
         # Ini kasus di mana omzet ada tapi produk terjual 0, atau harga jual = 0. Tidak bisa dihitung per unit.
         # Atau jika harga_jual_input dari form recalculate adalah 0.
-        detailed_explanation = "Harga jual per unit tidak dapat dihitung dengan data Omzet dan Produk Terjual yang diberikan, atau harga jual yang dimasukkan tidak valid. Pastikan Harga Jual > 0 jika di Analisa Manual/Hitung Ulang, atau Omzet Penjualan dan Produk Terjual > 0 jika dari laporan CSV."
+        detailed_explanation = render_detailed_explanation('harga_invalid', roas_aktual, biaya_iklan_aktual, omzet_penjualan_aktual, produk_terjual_aktual, ctr, None, final_target_profit_pct, roas_target_optimal_val)
         return analisa_text, rekomendasi_aksi_text, roas_target_optimal_val, tag, detailed_explanation, rekomendasi_modal_harian_text
     elif current_harga_jual <= 0: # Ini kondisi kalau omzet juga 0, berarti belum ada penjualan sama sekali
         # Biarkan default explanation
+        detailed_explanation = render_detailed_explanation(explanation_case, roas_aktual, biaya_iklan_aktual, omzet_penjualan_aktual, produk_terjual_aktual, ctr, None, final_target_profit_pct, roas_target_optimal_val)
         return analisa_text, rekomendasi_aksi_text, roas_target_optimal_val, tag, detailed_explanation, rekomendasi_modal_harian_text
             
     # Modal Produk (gunakan input override jika ada, jika tidak, pakai asumsi atau hitung dari harga jual aktual)
@@ -119,13 +149,6 @@ def get_recommendation(row_data, modal_produk_input=None, fee_shopee_input=None,
     display_roas_target_profit_needed = min(roas_target_profit_needed, SHOPEE_ROAS_CAP) if np.isfinite(roas_target_profit_needed) else "N/A"
 
 
-    # --- Format data untuk display di penjelasan detail dan tabel ---
-    formatted_biaya_iklan_aktual = f"Rp{biaya_iklan_aktual:,.0f}" if np.isfinite(biaya_iklan_aktual) and biaya_iklan_aktual > 0 else "Rp0"
-    formatted_omzet_penjualan_aktual = f"Rp{omzet_penjualan_aktual:,.0f}" if np.isfinite(omzet_penjualan_aktual) and omzet_penjualan_aktual > 0 else "Rp0"
-    formatted_produk_terjual_plural = f"{int(produk_terjual_aktual):,} unit" if np.isfinite(produk_terjual_aktual) else "N/A unit"
-    formatted_roas_aktual = f"{roas_aktual:,.2f}" if np.isfinite(roas_aktual) else "N/A"
-    formatted_ctr = f"{ctr*100:,.2f}%" if np.isfinite(ctr) else "N/A"
-
     # --- Logika Rekomendasi Utama (lebih cerdas berdasarkan BEP dan Target Profit) ---
     if np.isfinite(roas_aktual) and np.isfinite(biaya_iklan_aktual) and biaya_iklan_aktual > 0:
         # Menghitung profit bersih aktual
@@ -142,12 +165,7 @@ def get_recommendation(row_data, modal_produk_input=None, fee_shopee_input=None,
             modal_harian_rekomendasi_val = max(SHOPEE_MIN_DAILY_BUDGET, biaya_iklan_aktual * 3)
             rekomendasi_modal_harian_text = f"Rp{modal_harian_rekomendasi_val:,.0f}"
 
-            detailed_explanation = (
-                f"Produk ini menunjukkan efisiensi iklan yang **sangat luar biasa** dengan ROAS aktual sebesar {formatted_roas_aktual}. "
-                f"ROAS Titik Impas produk ini adalah {display_roas_break_even_produk}, dan Anda bahkan melampaui target profit {current_target_profit_pct*100:.0f}%! "
-                f"Dengan biaya iklan {formatted_biaya_iklan_aktual} menghasilkan omzet {formatted_omzet_penjualan_aktual} dari {formatted_produk_terjual_plural} terjual, profit Anda sangat tinggi. "
-                f"**Sangat direkomendasikan untuk menaikkan anggaran iklan Anda secara agresif.** Anda dapat menetapkan Target ROAS di Shopee ke **{SHOPEE_ROAS_CAP:.1f}** (batas maksimal yang bisa diset) untuk memaksimalkan volume penjualan yang lebih besar."
-            )
+            explanation_case = 'luar_biasa'
         elif roas_aktual > roas_break_even_produk: # Cukup efisien, di atas BEP tapi belum tentu capai target profit
             if profit_bersih_aktual >= target_profit_omzet_aktual:
                 tag = 'sangat_baik'
@@ -160,13 +178,7 @@ def get_recommendation(row_data, modal_produk_input=None, fee_shopee_input=None,
                 modal_harian_rekomendasi_val = max(SHOPEE_MIN_DAILY_BUDGET, biaya_iklan_aktual * 1.5)
                 rekomendasi_modal_harian_text = f"Rp{modal_harian_rekomendasi_val:,.0f}"
 
-                detailed_explanation = (
-                    f"Performa iklan produk ini **sangat baik** dengan ROAS aktual sebesar {formatted_roas_aktual}. "
-                    f"Anda sudah mencapai atau melampaui target profit {current_target_profit_pct*100:.0f}% Anda! "
-                    f"Anda mendapatkan omzet {formatted_omzet_penjualan_aktual} dengan biaya iklan {formatted_biaya_iklan_aktual} dari {formatted_produk_terjual_plural} terjual. "
-                    f"Ini menunjukkan efisiensi yang tinggi dan potensi pertumbuhan yang baik. "
-                    f"**Disarankan untuk menaikkan anggaran iklan Anda secara bertahap dan memantau hasilnya.** Anda dapat menargetkan ROAS sekitar **{roas_target_optimal_val}** di Shopee untuk menjaga profit dan meningkatkan penjualan."
-                )
+                explanation_case = 'sangat_baik'
             else:
                 tag = 'cukup_baik'
                 analisa_text = "Cukup Baik (Untung, Namun Perlu Optimasi untuk Target Profit)"
@@ -178,12 +190,7 @@ def get_recommendation(row_data, modal_produk_input=None, fee_shopee_input=None,
                 modal_harian_rekomendasi_val = max(SHOPEE_MIN_DAILY_BUDGET, biaya_iklan_aktual * 1.0) # Pertahankan anggaran
                 rekomendasi_modal_harian_text = f"Rp{modal_harian_rekomendasi_val:,.0f}"
 
-                detailed_explanation = (
-                    f"Produk ini memiliki ROAS aktual {formatted_roas_aktual}, yang tergolong **cukup efisien** (di atas ROAS Titik Impas {display_roas_break_even_produk}), namun belum mencapai target profit {current_target_profit_pct*100:.0f}% Anda. "
-                    f"Meskipun sudah menghasilkan omzet {formatted_omzet_penjualan_aktual} dari {formatted_produk_terjual_plural} terjual dengan biaya iklan {formatted_biaya_iklan_aktual}, ada ruang untuk peningkatan efisiensi agar sesuai target profit. "
-                    f"**Pertahankan iklan ini, namun fokus pada optimasi lebih lanjut.** "
-                    f"Pertimbangkan untuk memperbarui judul/gambar produk, menyesuaikan targeting audiens, menguji kata kunci baru, atau bahkan meninjau harga jual dan biaya pokok Anda untuk mencapai ROAS yang lebih tinggi (targetkan **{roas_target_optimal_val}**) dan profit yang sesuai target."
-                )
+                explanation_case = 'cukup_baik'
         elif 0 < roas_aktual <= roas_break_even_produk:
             tag = 'boncos'
             analisa_text = "Kurang Efisien (Rugi!)"
@@ -195,12 +202,7 @@ def get_recommendation(row_data, modal_produk_input=None, fee_shopee_input=None,
             modal_harian_rekomendasi_val = max(SHOPEE_MIN_DAILY_BUDGET, biaya_iklan_aktual * 0.3)
             rekomendasi_modal_harian_text = f"Rp{modal_harian_rekomendasi_val:,.0f}"
 
-            detailed_explanation = (
-                f"ROAS aktual produk ini adalah {formatted_roas_aktual}, yang tergolong **sangat kurang efisien** dan kemungkinan besar merugi (di bawah atau sangat dekat dengan ROAS Titik Impas {display_roas_break_even_produk}). "
-                f"Biaya iklan {formatted_biaya_iklan_aktual} jauh terlalu tinggi dibandingkan hasil penjualan {formatted_omzet_penjualan_aktual} dari {formatted_produk_terjual_plural} terjual, mengakibatkan kerugian. "
-                f"**Disarankan untuk segera menurunkan anggaran iklan Anda secara signifikan atau bahkan jeda iklan ini.** "
-                f"Fokus pada perbaikan mendalam pada iklan (target, bid, konten) atau halaman produk. Jika tidak ada perbaikan, pertimbangkan untuk menghentikan iklan ini. Targetkan ROAS minimal **{roas_target_optimal_val}** untuk mulai balik modal."
-            )
+            explanation_case = 'boncos'
         elif biaya_iklan_aktual > 0 and (not np.isfinite(roas_aktual) or roas_aktual == 0):
             tag = 'boncos'
             if np.isfinite(ctr) and ctr < 0.01:
@@ -209,66 +211,75 @@ def get_recommendation(row_data, modal_produk_input=None, fee_shopee_input=None,
                 roas_target_optimal_val = "N/A"
                 rekomendasi_modal_harian_text = "Rp0"
 
-                detailed_explanation = (
-                    f"Iklan ini telah menghabiskan biaya {formatted_biaya_iklan_aktual} tanpa menghasilkan penjualan (ROAS {formatted_roas_aktual} / N/A). "
-                    f"Persentase klik (CTR) yang sangat rendah ({formatted_ctr}) menunjukkan bahwa iklan Anda tidak menarik perhatian pembeli. "
-                    f"**Segera jeda iklan ini.** Fokus pada perbaikan elemen kreatif seperti judul produk, gambar utama, dan video produk. "
-                    f"Pastikan iklan Anda relevan dan menonjol di halaman pencarian atau rekomendasi agar mendapatkan lebih banyak klik."
-                )
+                explanation_case = 'ctr_rendah'
             else:
                 analisa_text = "Produk Tidak Meyakinkan (CTR Baik, tapi Tanpa Konversi)"
                 rekomendasi_aksi_text = "JEDA & OPTIMASI HARGA/PROMO/DESKRIPSI"
                 roas_target_optimal_val = "N/A"
                 rekomendasi_modal_harian_text = "Rp0"
 
-                detailed_explanation = (
-                    f"Meskipun iklan ini mendapatkan klik (CTR {formatted_ctr}) dengan biaya {formatted_biaya_iklan_aktual}, tidak ada penjualan yang terjadi (ROAS {formatted_roas_aktual} / N/A). "
-                    f"Ini menunjukkan bahwa pembeli mungkin tertarik pada iklan Anda, tetapi tidak yakin untuk membeli setelah melihat halaman produk. "
-                    f"**Jeda iklan ini dan fokus pada optimasi halaman produk Anda.** Perbaiki harga, tambahkan promo menarik, "
-                    f"perjelas deskripsi produk, perbanyak ulasan positif, atau tingkatkan kualitas gambar/video produk untuk meningkatkan konversi."
-                )
+                explanation_case = 'tanpa_konversi'
     else:
         analisa_text = "Belum Ada Data/Tidak Ada Aktivitas Iklan"
         rekomendasi_aksi_text = "MULAI IKLAN / PERIKSA DATA"
         roas_target_optimal_val = "N/A"
         tag = 'netral'
         rekomendasi_modal_harian_text = "N/A"
-        detailed_explanation = "Tidak ada data iklan yang cukup untuk menganalisis produk ini. Pastikan produk ini memiliki aktivitas iklan yang memadai dan statusnya 'Berjalan', serta Omzet Penjualan, Produk Terjual, dan Biaya Iklan terisi. Jika ini iklan baru, gunakan mode 'Iklan Baru'."
+        explanation_case = 'netral'
 
 
     if roas_target_optimal_val is None or roas_target_optimal_val == "": roas_target_optimal_val = "N/A"
     if rekomendasi_modal_harian_text is None or rekomendasi_modal_harian_text == "": rekomendasi_modal_harian_text = "N/A"
 
+    detailed_explanation = render_detailed_explanation(
+        explanation_case, roas_aktual, biaya_iklan_aktual, omzet_penjualan_aktual, produk_terjual_aktual,
+        ctr, display_roas_break_even_produk, current_target_profit_pct, roas_target_optimal_val
+    )
+
     return analisa_text, rekomendasi_aksi_text, roas_target_optimal_val, tag, detailed_explanation, rekomendasi_modal_harian_text
 
 
-def get_row_color_tag(profit_val, target_profit_threshold, is_profit_positive):
-    if profit_val >= target_profit_threshold:
-        return 'sangat_baik'
-    elif is_profit_positive:
-        return 'cukup_baik'
-    else:
-        return 'boncos'
+def trial_expired_message():
+    """Pesan jika masa percobaan habis dan premium tidak aktif (status dari app_access_required); selain itu None."""
+    app_status = g.app_status
+    if app_status['trial_expired'] and not app_status['is_premium_active']:
+        return app_status['notification_message_prefix'] + " Harap perbarui langganan Anda."
+    return None
+
+
+def load_analysis_result():
+    """Memuat hasil analisa terakhir milik user dari result store (session hanya menyimpan ID-nya)."""
+    return get_result_store().load(current_user.id, session.get('calculator_roas_result_id'))
+
+
+def load_analyzed_product(produk_id):
+    """Mengambil satu baris produk hasil analisa CSV lewat indeks produkId di result store (O(1), tanpa membaca seluruh laporan)."""
+    return get_result_store().load_product(current_user.id, session.get('calculator_roas_result_id'), produk_id)
+
+
+def load_analyzed_products(produk_ids):
+    """Mengambil banyak baris produk hasil analisa terakhir sekaligus (produkId -> baris)."""
+    return get_result_store().load_products(current_user.id, session.get('calculator_roas_result_id'), produk_ids)
+
+
+@memoize('profit_curve', lambda *args: args)
+def profit_curve_json(harga_jual, sim_base_units, total_cost_per_unit_excluding_ads, target_profit_pct, n_points):
+    """Kurva profit sebagai JSON ringkas, di-memo per tuple input (yang sudah dibulatkan)."""
+    curve = profit_curve(harga_jual, sim_base_units, total_cost_per_unit_excluding_ads, target_profit_pct, n_points)
+    return json.dumps(curve, separators=(',', ':'))
+
 
 # --- ROUTES ---
 
 @bp.route('/')
 @login_required
+@app_access_required('roas_calculator')
 def index():
-    app_info = App.query.filter_by(url='roas_calculator').first()
-    if not app_info:
-        flash('Aplikasi tidak ditemukan.', 'danger')
-        return redirect(url_for('dashboard.index'))
-
-    user_app_entry = UserApp.query.filter_by(user_id=current_user.id, app_id=app_info.id).first()
-    if not user_app_entry:
-        flash('Kamu perlu menginstal aplikasi ini dari App Store untuk membukanya.', 'warning')
-        return redirect(url_for('app_store.index'))
-
-    app_status = get_app_trial_status(current_user.id, app_info.url)
+    app_status = g.app_status
 
     current_mode = session.get('calculator_roas_mode', 'baru')
-    raw_result_data = session.get('calculator_roas_result', None)
+    analysis = load_analysis_result()
+    raw_result_data = analysis.get('result') if analysis else None
     
     result_data = {
         'label_hasil': '',
@@ -293,7 +304,7 @@ def index():
 
     return render_template(
         'roas_calculator.html',
-        app_name=app_info.name,
+        app_name=g.app_grant.app_name,
         time_remaining_seconds=int(app_status['time_remaining_seconds']),
         trial_expired=app_status['trial_expired'],
         is_premium_active=app_status['is_premium_active'],
@@ -308,14 +319,13 @@ def index():
 @bp.route('/detail/<app_url>')
 @login_required
 def detail(app_url):
-    app_info = App.query.filter_by(url=app_url).first()
+    app_info = get_app_by_url(app_url)
     if not app_info:
         flash('Aplikasi tidak ditemukan.', 'danger')
         return redirect(url_for('app_store.index'))
 
-    user_app_entry = UserApp.query.filter_by(user_id=current_user.id, app_id=app_info.id).first()
-    is_installed = user_app_entry is not None
-
+    # Status instalasi & trial dari cache entitlement (tanpa query UserApp)
+    is_installed = get_user_app_grant(current_user.id, app_info.url) is not None
     app_status = get_app_trial_status(current_user.id, app_info.url)
 
     return render_template(
@@ -340,10 +350,11 @@ def analyze():
     print(f"Mode received: {mode}")
 
     result_data = {'label_hasil': '', 'label_keterangan': [], 'table_data': [], 'table_headers': [], 'products_data': []}
+    analyzed_products = None # Baris produk hasil analisa CSV per produkId, disimpan di result store
     flash_messages = []
 
-    app_info = App.query.filter_by(url='roas_calculator').first()
-    if not app_info:
+    # Data aplikasi dari katalog dan status trial/premium dari cache entitlement (tanpa query per request)
+    if get_app_by_url('roas_calculator') is None:
         flash_messages.append({'category': 'danger', 'message': 'Aplikasi tidak ditemukan di backend. Hubungi administrator.'})
         return jsonify({
             'mode': mode,
@@ -351,7 +362,7 @@ def analyze():
             'flash_messages': flash_messages
         })
 
-    app_status = get_app_trial_status(current_user.id, app_info.url)
+    app_status = get_app_trial_status(current_user.id, 'roas_calculator')
     if app_status['trial_expired'] and not app_status['is_premium_active']:
         flash_messages.append({'category': 'danger', 'message': app_status['notification_message_prefix'] + " Harap perbarui langganan Anda."})
         return jsonify({
@@ -434,7 +445,6 @@ def analyze():
 
 
             table_headers = ("ROAS", "Biaya Iklan", "Omzet Penjualan", "Profit Total", "Trafik", "Keterangan")
-            table_data = []
 
             # Generate simulation table data based on calculated ROAS
             sim_roas_values = []
@@ -464,18 +474,13 @@ def analyze():
                 if val > 0 and val <= SHOPEE_ROAS_CAP and val not in sim_roas_values:
                     sim_roas_values.append(val)
             
-            sim_roas_values = sorted(list(set([round(x, 2) for x in sim_roas_values if x > 0])), reverse=True) # Unique, sorted, positive
-
-            # Limit to a reasonable number of rows for display
-            if len(sim_roas_values) > 5:
-                sim_roas_values = sim_roas_values[:5] # Take top 5 highest ROAS values
+            # Unique, sorted (ROAS tertinggi dulu), positive; limit to a reasonable number of rows for display
+            sim_roas_values = unique_roas_points(sim_roas_values)[:5] # Take top 5 highest ROAS values
 
-            for r_val in sim_roas_values:
-                table_data.append(calculate_row_for_simulation(
-                    r_val, harga_jual, sim_base_units, total_cost_per_unit_excluding_ads, target_profit_pct, roas_break_even
-                ))
-            
-            table_data.sort(key=lambda x: float(x[0].replace(',', '')), reverse=True) # Sort by ROAS
+            # Semua baris disimulasikan sekaligus, lalu diformat jadi teks tabel (di-memo per tuple input)
+            table_data = simulation_table(
+                sim_roas_values, harga_jual, sim_base_units, total_cost_per_unit_excluding_ads, target_profit_pct, roas_break_even
+            )
             
             result_data['table_headers'] = table_headers
             result_data['table_data'] = table_data
@@ -578,7 +583,6 @@ def analyze():
 
             # Prepare table data (similar to Iklan Baru mode)
             table_headers = ("ROAS", "Biaya Iklan", "Omzet Penjualan", "Profit Total", "Trafik", "Keterangan")
-            table_data = []
 
             # Simulate for a range of ROAS values around the actual and recommended ROAS
             sim_roas_values = []
@@ -609,7 +613,7 @@ def analyze():
             # Ensure minimal SHOPEE_MIN_DAILY_BUDGET for modal harian recommendation
             # This is implicitly handled by get_recommendation's modal_harian_rekomendasi_val
             
-            sim_roas_values = sorted(list(set([round(x, 2) for x in sim_roas_values if x > 0])), reverse=True)
+            sim_roas_values = unique_roas_points(sim_roas_values)
             
             # Limit to max 5-7 rows
             if len(sim_roas_values) > 7:
@@ -626,16 +630,15 @@ def analyze():
                 for val in sim_roas_values:
                     if val not in final_sim_roas_values and len(final_sim_roas_values) < 7:
                         final_sim_roas_values.append(val)
-                sim_roas_values = sorted(list(set([round(x,2) for x in final_sim_roas_values if x > 0])), reverse=True) # Ensure unique, sorted, positive
+                sim_roas_values = unique_roas_points(final_sim_roas_values) # Ensure unique, sorted, positive
             
             # Generate table data
-            for r_val in sim_roas_values:
-                # For manual mode's simulation table, we need to recalculate based on the *current*
-                # harga_jual_per_unit, modal, fee, and tambahan that the user just provided.
-                # The sim_base_units for table will be the produk_terjual_aktual.
-                table_data.append(calculate_row_for_simulation(
-                    r_val, harga_jual_per_unit, produk_terjual_aktual, total_cost_per_unit_excluding_ads, target_profit_pct, roas_break_even_manual
-                ))
+            # For manual mode's simulation table, we need to recalculate based on the *current*
+            # harga_jual_per_unit, modal, fee, and tambahan that the user just provided.
+            # The sim_base_units for table will be the produk_terjual_aktual.
+            table_data = simulation_table(
+                sim_roas_values, harga_jual_per_unit, produk_terjual_aktual, total_cost_per_unit_excluding_ads, target_profit_pct, roas_break_even_manual
+            )
             
             result_data['table_headers'] = table_headers
             result_data['table_data'] = table_data
@@ -650,166 +653,75 @@ def analyze():
             print(f"DEBUG: General Exception in mode 'jalan': {e}")
 
     elif mode == 'csv':
+        # Satu atau beberapa laporan (multi toko); input file kosong diabaikan
+        csv_files = [csv_file for csv_file in request.files.getlist('csv_file') if csv_file and csv_file.filename]
         if 'csv_file' not in request.files:
             flash_messages.append({'category': 'danger', 'message': 'Tidak ada file CSV yang diunggah.'})
+        elif not csv_files:
+            flash_messages.append({'category': 'danger', 'message': 'Nama file kosong.'})
+        elif current_app.config.get('ROAS_ANALYSIS_JOBS', True):
+            # File disimpan dan dianalisa di process pool (satu task per file, paralel);
+            # frontend mem-poll analyze_status untuk progress & hasil
+            try:
+                job_id = get_analysis_jobs().submit(current_user.id, csv_files)
+            except AnalysisQueueFull as e:
+                flash_messages.append({'category': 'warning', 'message': str(e)})
+                return jsonify({'mode': mode, 'result': result_data, 'flash_messages': flash_messages})
+            session['calculator_roas_mode'] = mode
+            print(f"DEBUG: Job analisa CSV {job_id} ({len(csv_files)} file) diantrikan untuk user {current_user.id}")
+            return jsonify({
+                'mode': mode,
+                'job_id': job_id,
+                'status_url': url_for('calculator_roas.analyze_status', job_id=job_id),
+                'flash_messages': [{'category': 'info', 'message': f"{len(csv_files)} file CSV diterima dan sedang dianalisa..." if len(csv_files) > 1 else 'File CSV diterima dan sedang dianalisa...'}]
+            })
         else:
-            csv_file = request.files['csv_file']
-            if csv_file.filename == '':
-                flash_messages.append({'category': 'danger', 'message': 'Nama file kosong.'})
-            elif csv_file:
+            # Mode sinkron: file dianalisa berurutan di request ini; file yang gagal dilaporkan sendiri-sendiri
+            parts, history_parts, file_errors, filename_shops = [], [], [], []
+            for csv_file in csv_files:
+                # Nama dari file ditentukan untuk semua file (sama dengan job), dipakai jika preamble tanpa nama toko
+                filename_shops.append(shop_name_from_filename(csv_file.filename, filename_shops))
                 try:
-                    file_content = io.StringIO(csv_file.stream.read().decode('utf-8'))
-
-                    column_names = [
-                        'Urutan', 'Nama Iklan', 'Status', 'Kode Produk', 'Mode Bidding', 'Penempatan Iklan', 'Tanggal Mulai',
-                        'Tanggal Selesai', 'Dilihat', 'Jumlah Klik', 'Persentase Klik', 'Konversi', 'Konversi Langsung',
-                        'Tingkat konversi', 'Tingkat Konversi Langsung', 'Biaya per Konversi', 'Biaya per Konversi Langsung',
-                        'Produk Terjual', 'Terjual Langsung', 'Omzet Penjualan', 'Penjualan Langsung (GMV Langsung)',
-                        'Biaya', 'Efektifitas Iklan', 'Efektivitas Langsung', 'Persentase Biaya Iklan terhadap Penjualan dari Iklan (ACOS)',
-                        'Persentase Biaya Iklan terhadap Penjualan dari Iklan Langsung (ACOS Langsung)'
-                    ]
-                    
-                    try:
-                        df = pd.read_csv(file_content, skiprows=11, header=None, names=column_names, sep=',', skipinitialspace=True)
-                    except Exception:
-                        file_content.seek(0)
-                        try:
-                            df = pd.read_csv(file_content, skiprows=11, header=None, names=column_names, sep=';', skipinitialspace=True)
-                        except Exception as e_csv:
-                            raise ValueError(f"Gagal membaca file CSV. Pastikan file adalah CSV dengan pemisah koma atau titik koma. Detail: {e_csv}")
-
-                    required_cols = ['Nama Iklan', 'Kode Produk', 'Biaya', 'Omzet Penjualan', 'Persentase Klik', 'Status', 'Produk Terjual']
-                    missing_cols = [col for col in required_cols if col not in df.columns]
-                    if missing_cols:
-                        raise ValueError(f"File CSV tidak memiliki kolom yang dibutuhkan: {', '.join(missing_cols)}. Harap pastikan format Shopee yang benar.")
-
-                    # Mengganti nama kolom agar konsisten dengan JavaScript (camelCase)
-                    df.rename(columns={
-                        'Nama Iklan': 'namaProduk',
-                        'Kode Produk': 'produkId',
-                        'Biaya': 'biaya',
-                        'Omzet Penjualan': 'omzetPenjualan',
-                        'Produk Terjual': 'produkTerjual',
-                        'Persentase Klik': 'persentaseKlik',
-                    }, inplace=True)
-
-                    df['produkId'] = df['produkId'].astype(str)
-
-                    # --- REVISED CLEANING LOGIC FOR NUMERIC COLUMNS ---
-                    # Gunakan nama kolom yang sudah di-camelCase-kan untuk proses cleaning
-                    for col_name in ['biaya', 'omzetPenjualan', 'persentaseKlik', 'produkTerjual']:
-                        if col_name in df.columns:
-                            # Pastikan nilai adalah string sebelum .strip()
-                            cleaned_series = df[col_name].astype(str).str.strip()
-                            cleaned_series = cleaned_series.str.replace('Rp', '', regex=False)
-                            cleaned_series = cleaned_series.str.replace('%', '', regex=False)
-                            cleaned_series = cleaned_series.str.replace(',', '', regex=False) # Remove thousands separator
-                            
-                            # Coba konversi ke numerik. errors='coerce' akan mengubah yang gagal jadi NaN
-                            df[col_name] = pd.to_numeric(cleaned_series, errors='coerce')
-                            
-                            # Jika hasilnya NaN, ubah menjadi 0 agar tidak menyebabkan masalah isfinite dalam perhitungan
-                            df[col_name] = df[col_name].fillna(0)
-
-                            if col_name == 'persentaseKlik':
-                                df[col_name] = df[col_name].div(100)
-                        else:
-                            df[col_name] = 0 # Jika kolom tidak ada, set ke 0
-                    # --- END REVISED CLEANING LOGIC ---
-
-                    # Debug prints (pertahankan untuk melacak)
-                    print(f"\n--- DEBUG: After numeric conversion and before NaN to None conversion ---")
-                    print(df[['produkId', 'biaya', 'omzetPenjualan', 'produkTerjual']].to_string())
-                    print(f"Dtype 'omzetPenjualan' before NaN to None: {df['omzetPenjualan'].dtype}")
-                    
-                    # Convert NaN (dari coerse) ke None untuk JSON serialization
-                    # Penting: Lakukan fillna(0) dulu untuk perhitungan, baru ubah ke None untuk JSON display
-                    df_for_calc = df.copy() # Buat salinan untuk perhitungan
-
-                    df_for_calc['ROAS'] = np.where(
-                        (df_for_calc['biaya'] > 0), # Hanya perlu cek > 0 karena sudah difillna(0)
-                        df_for_calc['omzetPenjualan'] / df_for_calc['biaya'],
-                        0
-                    )
-                    df_for_calc['ROAS'] = df_for_calc['ROAS'].replace([np.inf, -np.inf], np.nan)
-                    df_for_calc['ROAS'] = df_for_calc['ROAS'].where(pd.notnull, None) # Kembali ubah NaN jadi None untuk JSON
-                    
-                    df_to_analyze = df_for_calc[df_for_calc['Status'] == 'Berjalan'].copy()
-
-                    if df_to_analyze.empty:
-                        flash_messages.append({'category': 'info', 'message': 'Tidak ada data iklan "Berjalan" yang valid ditemukan dalam file CSV untuk dianalisis.'})
-                        result_data['label_hasil'] = "Analisa Selesai. Tidak ada data iklan 'Berjalan' ditemukan."
-                        result_data['label_keterangan'].append("Pastikan file CSV Anda berisi iklan dengan status 'Berjalan'.")
-                    else:
-                        print(f"\n--- DEBUG: Rows for get_recommendation ---")
-                        # get_recommendation akan dipanggil tanpa override, jadi dia akan pakai default assumptions
-                        # Default assumptions for modal, fee, additional costs will be used here.
-                        rekomendasi = df_to_analyze.apply(
-                            lambda row: get_recommendation(row), # Cukup panggil dengan row, parameter override lainnya None
-                            axis=1, result_type='expand'
-                        )
-                        # Nama kolom hasil rekomendasi juga diubah ke camelCase
-                        rekomendasi.columns = [
-                            'analisa', 'rekomendasiAksi', 'roasTargetOptimal',
-                            'tagWarna', 'detailedExplanation', 'rekomendasiModalHarian'
-                        ]
-
-                        df_to_analyze = pd.concat([df_to_analyze, rekomendasi], axis=1)
-
-                        tag_order_map = {'sangat_baik': 3, 'cukup_baik': 2, 'boncos': 1, 'netral': 0, 'default': 0}
-                        df_to_analyze['Tag_Order_Score'] = df_to_analyze['tagWarna'].map(tag_order_map).fillna(0)
-
-                        # Pastikan kolom 'biaya' juga di-fillna(0) sebelum sort_score
-                        df_to_analyze['Sort_Score'] = np.where(
-                            (df_to_analyze['ROAS'].notnull()) & (df_to_analyze['ROAS'] > 0),
-                            df_to_analyze['ROAS'],
-                            -df_to_analyze['biaya'].fillna(0)
-                        )
-                        df_to_analyze['Sort_Score'] = df_to_analyze['Sort_Score'].where(pd.notnull, -999999999)
-
-                        df_to_analyze = df_to_analyze.sort_values(
-                            by=['Tag_Order_Score', 'Sort_Score'],
-                            ascending=[False, False]
-                        )
-
-                        # Mengambil data untuk JSON. Gunakan nama kolom yang sudah di-camelCase-kan
-                        products_data = df_to_analyze[[
-                            'namaProduk', 'produkId', 'biaya', 'omzetPenjualan', 'ROAS',
-                            'analisa', 'rekomendasiAksi', 'roasTargetOptimal', 'tagWarna',
-                            'persentaseKlik', 'produkTerjual', 'detailedExplanation',
-                            'rekomendasiModalHarian'
-                        ]].to_dict(orient='records')
-                        
-                        print(f"\n--- DEBUG: products_data before JSONIFY ---")
-                        # Hapus baris debug yang bermasalah (target_product_id)
-                        # for p_data in products_data:
-                        #      produk_id_dbg = p_data.get('produkId')
-                        #      if produk_id_dbg == target_product_id:
-                        #          print(f"Product ID: {produk_id_dbg}")
-
-
-                        result_data['label_hasil'] = f"Analisa Selesai. Ditemukan {len(df_to_analyze)} iklan 'Berjalan' yang telah diurutkan."
-                        # Menambahkan pesan keterangan ke label_keterangan sebagai list
-                        result_data['label_keterangan'] = [
-                            "Berikut adalah daftar produk hasil analisa (diurutkan berdasarkan performa iklan):",
-                            "Untuk perhitungan ROAS Rekomendasi & Modal Harian Rekomendasi yang lebih akurat, silakan klik tombol \"Lihat Detail\" lalu \"Hitung Ulang Produk Ini\" di popup detail produk."
-                        ]
-                        result_data['products_data'] = products_data
-
-                        # Simpan DataFrame yang sudah dianalisis dan di-camelCase-kan ke sesi
-                        # agar bisa diakses oleh fungsi recalculate_product
-                        # Penting: Pastikan ini adalah df_to_analyze yang sudah lengkap dengan hasil rekomendasi
-                        session['analyzed_df_json'] = df_to_analyze.to_json(orient='records')
-                        flash_messages.append({'category': 'success', 'message': 'File CSV berhasil diunggah dan dianalisis!'})
-
+                    # Tanggal laporan & toko dari preamble; tanpa tanggal dipakai tanggal upload
+                    stream, meta = peek_report_meta(csv_file.stream)
+                    # Laporan dibaca per chunk langsung dari stream upload (tanpa menyalin seluruh file ke memori);
+                    # hasilnya hanya baris 'Berjalan', sudah dibersihkan dan punya kolom ROAS
+                    df_to_analyze = read_shopee_report(stream)
+                    shop = report_shop_name(meta.shop, filename_shops[-1]) # Kunci yang sama untuk tabel & riwayat
+                    parts.append((shop, analyze_report_frame(df_to_analyze)))
+                    history_parts.append((shop, meta.report_date or datetime.date.today(), parts[-1][1]))
+                except Exception as e:
+                    print(f"Error processing CSV: {e}")
+                    file_errors.append({'category': 'danger', 'message': f"Gagal memproses file CSV '{csv_file.filename}'. Pastikan format file benar atau coba dengan file lain. Detail: {e}"})
+            flash_messages.extend(file_errors)
+            if parts:
+                try:
+                    result_data, csv_flash_messages, analyzed_products = build_csv_result(merge_shop_frames(parts), shop_count=count_shops(parts))
+                    flash_messages.extend(empty_shop_messages(parts) + csv_flash_messages)
                 except Exception as e:
                     print(f"Error processing CSV: {e}")
                     flash_messages.append({'category': 'danger', 'message': f"Gagal memproses file CSV. Pastikan format file benar atau coba dengan file lain. Detail: {e}"})
-    
+                if current_app.config.get('ROAS_ANALYSIS_HISTORY', True):
+                    try:
+                        history = record_history(get_analysis_history(), current_user.id, history_parts)
+                        if analyzed_products:
+                            result_data['label_keterangan'].extend(history_summary_lines(history))
+                    except Exception as e:
+                        print(f"WARNING: Riwayat analisa tidak tersimpan: {e}")
+
     # Hanya untuk mode 'analyze' awal, bukan untuk '/recalculate_product'
     if request.path == url_for('calculator_roas.analyze'):
         session['calculator_roas_mode'] = mode
-        session['calculator_roas_result'] = result_data
+        # Hasil lengkap disimpan di server; cookie session cukup berisi ID analisa
+        session['calculator_roas_result_id'] = get_result_store().save(
+            current_user.id,
+            {'mode': mode, 'result': result_data},
+            replaces=session.get('calculator_roas_result_id'),
+            products=analyzed_products
+        )
+        # Bersihkan key lama yang dulu menyimpan seluruh hasil di cookie
+        session.pop('calculator_roas_result', None)
+        session.pop('analyzed_df_json', None)
 
         print(f"\n--- Sending JSON response for mode: {mode} ---")
         print(f"Flash messages: {flash_messages}")
@@ -821,6 +733,107 @@ def analyze():
     # else, for recalculate_product, response is handled in that route directly
 
 
+# --- Endpoint Status Job Analisa CSV (di-poll frontend setelah upload) ---
+@bp.route('/analyze/status/<job_id>')
+@login_required
+def analyze_status(job_id):
+    job = get_analysis_jobs().poll(current_user.id, job_id)
+    if job is None:
+        return jsonify({'status': 'not_found', 'message': 'Job analisa tidak ditemukan atau sudah kedaluwarsa.'}), 404
+
+    response = {
+        'mode': 'csv',
+        'job_id': job_id,
+        'status': job['status'],
+        'rows_parsed': job['rows_parsed'],
+        'rows_analyzed': job['rows_analyzed'],
+        'files': [
+            {key: job_file[key] for key in ('filename', 'shop', 'status', 'rows_parsed', 'rows_analyzed', 'error')}
+            for job_file in job['files']
+        ],
+    }
+    if job['status'] == JOB_FAILED:
+        response['flash_messages'] = json.loads(job['messages'] or '[]') + [{'category': 'danger', 'message': job['error']}]
+    elif job['status'] == JOB_DONE:
+        store = get_result_store()
+        stored = store.load(current_user.id, job['result_id'])
+        if stored is None:
+            response['status'] = JOB_FAILED
+            response['flash_messages'] = [{'category': 'danger', 'message': 'Hasil analisa sudah kedaluwarsa. Silakan unggah ulang file CSV Anda.'}]
+            return jsonify(response)
+        # Hasil job jadi hasil analisa aktif user (menggantikan hasil sebelumnya), sama seperti mode sinkron
+        previous_result_id = session.get('calculator_roas_result_id')
+        if previous_result_id != job['result_id']:
+            if previous_result_id:
+                store.delete(current_user.id, previous_result_id)
+            session['calculator_roas_mode'] = 'csv'
+            session['calculator_roas_result_id'] = job['result_id']
+        response['result'] = stored['result']
+        response['flash_messages'] = json.loads(job['messages'] or '[]')
+    return jsonify(response)
+
+
+# --- Endpoint Riwayat Analisa CSV ---
+@bp.route('/history')
+@login_required
+@app_access_required('roas_calculator')
+def analysis_history():
+    """Daftar laporan yang tersimpan di riwayat user (terbaru dulu), beserta jumlah perubahannya."""
+    return jsonify({'reports': get_analysis_history().list_reports(current_user.id)})
+
+
+@bp.route('/history/changes')
+@login_required
+@app_access_required('roas_calculator')
+def analysis_history_changes():
+    """
+    Perubahan produk pada satu tanggal laporan dibanding laporan sebelumnya (default: laporan terakhir).
+    Query string: date=YYYY-MM-DD (opsional), shop=nama toko (opsional, default semua toko).
+    """
+    report_date = request.args.get('date')
+    if report_date:
+        try:
+            report_date = datetime.date.fromisoformat(report_date).isoformat()
+        except ValueError:
+            return jsonify({'message': 'Format tanggal harus YYYY-MM-DD.'}), 400
+    report_date, reports, changes = get_analysis_history().changes(current_user.id, report_date or None, request.args.get('shop'))
+    if report_date is None or not reports:
+        return jsonify({'message': 'Belum ada riwayat analisa untuk tanggal ini.', 'report_date': report_date, 'reports': [], 'changes': []}), 404
+    return jsonify({'report_date': report_date, 'reports': reports, 'changes': changes})
+
+
+# --- Endpoint Tren per Produk (dari rollup yang dihitung saat laporan disimpan ke riwayat) ---
+@bp.route('/trends/<produk_id>')
+@login_required
+@app_access_required('roas_calculator')
+def product_trends(produk_id):
+    """Deret tren satu produk: angka per tanggal laporan + ROAS/CTR/tingkat konversi bergulir. Query string: shop (opsional)."""
+    history = get_analysis_history()
+    rows = history.product_trend(current_user.id, produk_id, request.args.get('shop'))
+    if not rows:
+        return jsonify({'produkId': produk_id, 'message': 'Belum ada riwayat laporan untuk produk ini.', 'series': []}), 404
+    return jsonify({
+        'produkId': produk_id,
+        'namaProduk': history.product_name(current_user.id, produk_id),
+        'windowDays': list(TREND_WINDOWS_DAYS),
+        'series': trend_json(rows),
+    })
+
+
+# --- Endpoint untuk Penjelasan Detail Produk (dirender saat popup dibuka) ---
+@bp.route('/product_explanation/<produk_id>')
+@login_required
+def product_explanation(produk_id):
+    original_record = load_analyzed_product(produk_id)
+    if not original_record or 'explanationCase' not in original_record:
+        return jsonify({'produkId': produk_id, 'detailedExplanation': None}), 404
+
+    return jsonify({
+        'produkId': produk_id,
+        'detailedExplanation': render_explanation_for_record(original_record)
+    })
+
+
 # --- Endpoint for Recalculate Single Product (Updated for new flow) ---
 @bp.route('/recalculate_product', methods=['POST'])
 @login_required
@@ -848,19 +861,16 @@ def recalculate_product():
 
         # Prepare a temporary row dictionary for get_recommendation
         nama_produk_asli = "N/A"
-        analyzed_df_json_from_session = session.get('analyzed_df_json')
-        if analyzed_df_json_from_session:
-            try:
-                temp_df = pd.read_json(io.StringIO(analyzed_df_json_from_session), orient='records')
-                original_row = temp_df[temp_df['produkId'] == produk_id]
-                if not original_row.empty:
-                    nama_produk_asli = original_row['namaProduk'].iloc[0]
-            except Exception as e:
-                print(f"WARNING: Gagal membaca nama produk dari sesi untuk ID {produk_id}: {e}")
+        try:
+            original_record = load_analyzed_product(produk_id)
+            if original_record:
+                nama_produk_asli = original_record.get('namaProduk') or nama_produk_asli
+        except Exception as e:
+            print(f"WARNING: Gagal membaca nama produk dari result store untuk ID {produk_id}: {e}")
 
         temp_row_for_reco_data = {
             'produkId': produk_id,
-            'namaProduk': nama_produk_asli, # Gunakan nama asli dari sesi
+            'namaProduk': nama_produk_asli, # Gunakan nama asli dari result store
             'ROAS': roas_aktual,
             'persentaseKlik': persentase_klik_aktual,
             'biaya': biaya_iklan_aktual,
@@ -873,11 +883,11 @@ def recalculate_product():
         analisa_reco, rekomendasi_aksi_reco, roas_target_optimal_reco, tag_warna_reco, detailed_explanation_reco, rekomendasi_modal_harian_val = \
             get_recommendation(
                 temp_row_for_reco_data, 
-                modal_produk_input, 
+                modal_input, 
                 fee_input, 
                 tambahan_input, 
                 target_profit_pct_input, 
-                harga_jual_per_unit_input # Pass this explicitly as the 6th argument
+                harga_jual_input # Pass this explicitly as the 6th argument
             )
 
         # Siapkan data produk yang diperbarui untuk dikembalikan ke frontend popup
@@ -919,84 +929,151 @@ def recalculate_product():
         }), 500
 
 
-# Helper function to calculate a single row for the simulation table
-def calculate_row_for_simulation(
-    roas_value, harga_jual, sim_base_units, total_cost_per_unit_excluding_ads, target_profit_pct, roas_break_even,
-    biaya_iklan_fixed=None
-):
-    if not isinstance(roas_value, (int, float)):
-        roas_value = 1.0
-    roas_value = float(roas_value)
+# --- Endpoint Kurva Profit vs ROAS (untuk grafik/slider di frontend) ---
+@bp.route('/profit_curve')
+@login_required
+@app_access_required('roas_calculator')
+def profit_curve_data():
+    """
+    Kurva profit vs ROAS untuk satu produk (input sama dengan mode Iklan Baru, lewat query string).
+    Respons identik untuk input yang sama, jadi di-cache di server (memo cache) dan di browser (ETag + Cache-Control).
+    """
+    expired_message = trial_expired_message()
+    if expired_message:
+        return jsonify({'error': expired_message}), 403
+    try:
+        modal = float(request.args.get('modal') or 0)
+        harga_jual = float(request.args.get('harga_jual') or 0)
+        fee = float(request.args.get('fee') or 0) / 100
+        tambahan = float(request.args.get('tambahan') or 0)
+        target_profit_pct = float(request.args.get('profit') or 0) / 100
+        sim_base_units = float(request.args.get('estimated_produk_terjual') or 0) or 1
+        n_points = min(int(request.args.get('points') or CURVE_DEFAULT_POINTS), CURVE_MAX_POINTS)
+
+        if not (modal >= 0 and harga_jual > 0 and fee >= 0 and tambahan >= 0 and target_profit_pct >= 0 and sim_base_units > 0 and n_points >= 2):
+            raise ValueError("Pastikan semua input (Modal, Harga Jual, Fee, Biaya Tambahan, Target Profit) adalah angka positif yang valid.")
+    except ValueError as e:
+        return jsonify({'error': f"Isi semua kolom dengan angka yang valid. Detail: {e}"}), 400
+
+    # Tuple input dibulatkan agar variasi float kecil tetap kena cache yang sama
+    cache_key = (
+        round(harga_jual, 2), round(sim_base_units, 2),
+        round(modal + harga_jual * fee + tambahan, 2), round(target_profit_pct, 6), n_points
+    )
+    payload = profit_curve_json(*cache_key)
+
+    response = current_app.response_class(payload, mimetype='application/json')
+    response.set_etag(hashlib.sha1(repr(cache_key).encode('utf-8')).hexdigest())
+    response.cache_control.private = True
+    response.cache_control.max_age = 3600
+    return response.make_conditional(request)
 
-    if biaya_iklan_fixed is not None:
-        biaya_iklan_sim = float(biaya_iklan_fixed)
-        omzet_simulasi = biaya_iklan_sim * roas_value
-    else:
-        omzet_simulasi = harga_jual * sim_base_units
-        # Handle division by zero for roas_value
-        biaya_iklan_sim = omzet_simulasi / roas_value if roas_value > 0 else (0 if omzet_simulasi == 0 else np.inf)
-
-    if not np.isfinite(biaya_iklan_sim):
-        profit_total_sim = float('-inf')
-        status_text = "❌ Rugi Tak Terbatas"
-        row_color_tag = 'boncos'
-        trafik = "Sangat Kencang (Rugi Besar)"
-    else:
-        # Calculate profit total correctly: Omzet - Biaya Iklan - Total Biaya Pokok (modal + fee + tambahan)
-        profit_total_sim = omzet_simulasi - biaya_iklan_sim - (total_cost_per_unit_excluding_ads * sim_base_units)
-        
-        target_profit_omzet_for_row = omzet_simulasi * target_profit_pct
-        is_profit_positive_for_row = profit_total_sim > 0
-
-        status_text = ""
-        if profit_total_sim >= target_profit_omzet_for_row:
-            status_text = "✅ Sesuai Target"
-        elif is_profit_positive_for_row:
-            status_text = "⚠️ Untung Tipis"
+
+# --- Endpoint for Recalculate Many Products at Once ---
+@bp.route('/recalculate_batch', methods=['POST'])
+@login_required
+@app_access_required('roas_calculator')
+def recalculate_batch():
+    """
+    Hitung Ulang banyak produk dalam satu request.
+    Input: JSON array [{produkId, modal, harga_jual, fee, tambahan, target_profit}, ...] (atau {"products": [...]}),
+    atau file cost sheet CSV di field 'cost_sheet'. Field yang kosong memakai asumsi default.
+    Output kolumnar yang ringkas: {"columns": [...], "rows": [[...], ...], "missing": [produkId, ...]}.
+    """
+    print("\n--- Received recalculate_batch request ---")
+    flash_messages = []
+    expired_message = trial_expired_message()
+    if expired_message:
+        flash_messages.append({'category': 'danger', 'message': expired_message})
+        return jsonify({'columns': [], 'rows': [], 'missing': [], 'flash_messages': flash_messages}), 403
+    try:
+        cost_sheet = request.files.get('cost_sheet')
+        if cost_sheet and cost_sheet.filename:
+            overrides = overrides_from_cost_sheet(cost_sheet.stream)
         else:
-            status_text = "❌ Rugi"
-        
-        row_color_tag = get_row_color_tag(profit_total_sim, target_profit_omzet_for_row, is_profit_positive_for_row)
-        
-        trafik = ""
-        if roas_value > SHOPEE_ROAS_CAP + 0.01:
-            trafik = "Tidak Dapat Diatur"
-        elif roas_break_even > 0:
-            if roas_value >= (roas_break_even * 2.0):
-                trafik = "Sangat Rendah (Sangat Efisien)"
-            elif roas_value >= roas_break_even:
-                trafik = "Rendah (Efisien)"
-            elif roas_value >= (roas_break_even * 0.5):
-                trafik = "Sedang (Kurang Efisien)"
-            elif roas_value > 0:
-                trafik = "Kencang (Rugi)"
-            else:
-                trafik = "Sangat Kencang (Rugi Besar)"
-        else: # Case where product is profitable even without ads (ROAS break-even <= 0)
-            if roas_value >= 10.0:
-                trafik = "Sangat Rendah (Sangat Efisien)"
-            elif roas_value > 0:
-                trafik = "Rendah (Efisien)"
-            else:
-                trafik = "Sangat Kencang (Rugi Besar)"
+            payload = request.get_json(silent=True)
+            if isinstance(payload, dict):
+                payload = payload.get('products')
+            if payload is None:
+                raise ValueError("Kirim JSON array produk atau unggah file cost sheet.")
+            overrides = overrides_from_json(payload)
+
+        if len(overrides) > MAX_BATCH_PRODUCTS:
+            raise ValueError(f"Maksimal {MAX_BATCH_PRODUCTS} produk per request.")
+
+        products_by_id = load_analyzed_products(overrides['produkId'].dropna().unique().tolist())
+        hasil, missing = recalculate_batch_frame(overrides, products_by_id)
+        print(f"DEBUG: Batch recalculate {len(hasil)} produk, {len(missing)} tidak ditemukan")
+
+        flash_messages.append({'category': 'success', 'message': f"{len(hasil)} produk berhasil dihitung ulang."})
+        if missing:
+            flash_messages.append({'category': 'warning', 'message': f"{len(missing)} produk tidak ditemukan di hasil analisa terakhir."})
+        return jsonify({
+            'columns': list(hasil.columns),
+            'rows': hasil.to_numpy().tolist(),
+            'missing': missing,
+            'flash_messages': flash_messages
+        })
 
-    formatted_roas_value = f"{roas_value:,.2f}" if np.isfinite(roas_value) else "N/A"
-    formatted_biaya_iklan_sim = f"Rp{biaya_iklan_sim:,.0f}" if np.isfinite(biaya_iklan_sim) else "N/A"
-    formatted_omzet_simulasi = f"Rp{omzet_simulasi:,.0f}" if np.isfinite(omzet_simulasi) else "N/A"
-    formatted_profit_total_sim = f"Rp{profit_total_sim:,.0f}" if np.isfinite(profit_total_sim) else "N/A"
-    
-    if np.isfinite(profit_total_sim) and profit_total_sim < 0:
-        formatted_profit_total_sim = f"-Rp{abs(profit_total_sim):,.0f}"
-    elif not np.isfinite(profit_total_sim):
-        formatted_profit_total_sim = "Rugi Tak Terbatas" if profit_total_sim == float('-inf') else "N/A"
-
-
-    return [
-        formatted_roas_value,
-        formatted_biaya_iklan_sim,
-        formatted_omzet_simulasi,
-        formatted_profit_total_sim,
-        trafik,
-        status_text,
-        row_color_tag
-    ]
\ No newline at end of file
+    except ValueError as e:
+        flash_messages.append({'category': 'danger', 'message': f"Data Hitung Ulang tidak valid! Detail: {e}"})
+        print(f"DEBUG: ValueError in /recalculate_batch: {e}")
+        return jsonify({'columns': [], 'rows': [], 'missing': [], 'flash_messages': flash_messages}), 400
+    except Exception as e:
+        flash_messages.append({'category': 'danger', 'message': f"Terjadi kesalahan saat menghitung ulang produk: {e}"})
+        print(f"DEBUG: General Exception in /recalculate_batch: {e}")
+        return jsonify({'columns': [], 'rows': [], 'missing': [], 'flash_messages': flash_messages}), 500
+
+
+# --- Endpoint Optimasi Modal Harian Portofolio ---
+@bp.route('/budget_optimizer', methods=['POST'])
+@login_required
+@app_access_required('roas_calculator')
+def budget_optimizer():
+    """
+    Membagi total modal harian ke semua iklan hasil analisa CSV terakhir agar perkiraan profit total maksimal.
+    Input JSON: {"totalBudget": 1000000, "elastisitas": 0.5 (opsional)}.
+    Output kolumnar: {"columns": [...], "rows": [[...], ...], "summary": {...}}.
+    """
+    print("\n--- Received budget_optimizer request ---")
+    flash_messages = []
+    expired_message = trial_expired_message()
+    if expired_message:
+        flash_messages.append({'category': 'danger', 'message': expired_message})
+        return jsonify({'columns': [], 'rows': [], 'summary': None, 'flash_messages': flash_messages}), 403
+    try:
+        payload = request.get_json(silent=True) or {}
+        try:
+            total_budget = float(payload.get('totalBudget'))
+            elasticity = payload.get('elastisitas')
+            elasticity = BUDGET_SPEND_ELASTICITY if elasticity is None else float(elasticity)
+        except (TypeError, ValueError):
+            raise ValueError("totalBudget (dan elastisitas jika diisi) harus berupa angka.")
+
+        stored = load_analysis_result()
+        products_data = (stored or {}).get('result', {}).get('products_data') if (stored or {}).get('mode') == 'csv' else None
+        if not products_data:
+            raise ValueError("Belum ada hasil analisa CSV. Unggah laporan iklan terlebih dahulu.")
+
+        hasil, summary = optimize_portfolio_budget(products_data, total_budget, elasticity=elasticity)
+        print(f"DEBUG: Budget optimizer {summary['jumlahIklanDidanai']}/{summary['jumlahIklan']} iklan didanai, "
+              f"Rp{summary['totalDialokasikan']:,.0f} dari Rp{summary['totalBudget']:,.0f}")
+
+        flash_messages.append({'category': 'success', 'message': f"Modal harian dibagi ke {summary['jumlahIklanDidanai']} iklan."})
+        if summary['totalDialokasikan'] < summary['totalBudget'] * 0.99:
+            flash_messages.append({'category': 'info', 'message': f"Hanya Rp{summary['totalDialokasikan']:,.0f} yang dialokasikan; tambahan modal di atas itu diperkirakan tidak menambah profit."})
+        return jsonify({
+            'columns': list(hasil.columns),
+            'rows': hasil.to_numpy().tolist(),
+            'summary': summary,
+            'flash_messages': flash_messages
+        })
+
+    except ValueError as e:
+        flash_messages.append({'category': 'danger', 'message': f"Data optimasi modal tidak valid! Detail: {e}"})
+        print(f"DEBUG: ValueError in /budget_optimizer: {e}")
+        return jsonify({'columns': [], 'rows': [], 'summary': None, 'flash_messages': flash_messages}), 400
+    except Exception as e:
+        flash_messages.append({'category': 'danger', 'message': f"Terjadi kesalahan saat mengoptimasi modal harian: {e}"})
+        print(f"DEBUG: General Exception in /budget_optimizer: {e}")
+        return jsonify({'columns': [], 'rows': [], 'summary': None, 'flash_messages': flash_messages}), 500
@@ -0,0 +1,212 @@
+# File: blueprints/apps/calculator_roas/simulation.py
+# Mesin simulasi tabel ROAS (mode Iklan Baru & Analisa Manual).
+# Semua titik ROAS (dan opsional grid anggaran iklan) dihitung sekaligus sebagai array NumPy:
+# biaya iklan, omzet, profit, status, trafik, dan tag warna. Format teks (Rp, koma, dll.)
+# dikerjakan terpisah di format_simulation_rows, jadi kurva padat (100+ titik) tetap murah.
+import math
+
+import numpy as np
+
+from .constants import SHOPEE_ROAS_CAP
+from .memo_cache import MONEY_DIGITS, RATIO_DIGITS, memoize, round_key
+
+STATUS_SESUAI_TARGET = "✅ Sesuai Target"
+STATUS_UNTUNG_TIPIS = "⚠️ Untung Tipis"
+STATUS_RUGI = "❌ Rugi"
+STATUS_RUGI_TAK_TERBATAS = "❌ Rugi Tak Terbatas"
+
+TRAFIK_TIDAK_DAPAT_DIATUR = "Tidak Dapat Diatur"
+TRAFIK_SANGAT_RENDAH = "Sangat Rendah (Sangat Efisien)"
+TRAFIK_RENDAH = "Rendah (Efisien)"
+TRAFIK_SEDANG = "Sedang (Kurang Efisien)"
+TRAFIK_KENCANG = "Kencang (Rugi)"
+TRAFIK_SANGAT_KENCANG = "Sangat Kencang (Rugi Besar)"
+
+
+def unique_roas_points(values):
+    """Titik ROAS unik (dibulatkan 2 desimal), hanya yang positif, urut dari yang terbesar."""
+    values = np.asarray(values, dtype=float)
+    values = values[np.isfinite(values) & (values > 0)]
+    return np.unique(np.round(values, 2))[::-1]
+
+
+def simulate_roas(roas_values, harga_jual, sim_base_units, total_cost_per_unit_excluding_ads, target_profit_pct,
+                  roas_break_even, biaya_iklan_fixed=None):
+    """
+    Menghitung simulasi untuk array titik ROAS sekaligus.
+    Tanpa biaya_iklan_fixed: omzet = harga_jual * sim_base_units, biaya iklan = omzet / ROAS.
+    Dengan biaya_iklan_fixed (skalar/array): omzet = biaya iklan * ROAS. roas_values dan biaya_iklan_fixed di-broadcast.
+    Mengembalikan dict berisi array: roas, biaya_iklan, omzet, profit, target_profit, status, trafik, tag.
+    """
+    roas = np.asarray(roas_values, dtype=float)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if biaya_iklan_fixed is not None:
+            roas, biaya_iklan = np.broadcast_arrays(roas, np.asarray(biaya_iklan_fixed, dtype=float))
+            biaya_iklan = biaya_iklan.astype(float)
+            omzet = biaya_iklan * roas
+        else:
+            omzet = np.full(roas.shape, float(harga_jual) * sim_base_units)
+            biaya_iklan = np.where(roas > 0, omzet / np.where(roas > 0, roas, 1.0), np.where(omzet == 0, 0.0, np.inf))
+
+        finite_cost = np.isfinite(biaya_iklan)
+        profit = np.where(finite_cost, omzet - biaya_iklan - (total_cost_per_unit_excluding_ads * sim_base_units), -np.inf)
+        target_profit = omzet * target_profit_pct
+
+    sesuai_target = finite_cost & (profit >= target_profit)
+    untung = finite_cost & (profit > 0)
+
+    status = np.select(
+        [~finite_cost, sesuai_target, untung],
+        [STATUS_RUGI_TAK_TERBATAS, STATUS_SESUAI_TARGET, STATUS_UNTUNG_TIPIS],
+        default=STATUS_RUGI
+    )
+    tag = np.select([sesuai_target, untung], ['sangat_baik', 'cukup_baik'], default='boncos')
+
+    if roas_break_even > 0:
+        trafik_efisiensi = np.select(
+            [roas >= roas_break_even * 2.0, roas >= roas_break_even, roas >= roas_break_even * 0.5, roas > 0],
+            [TRAFIK_SANGAT_RENDAH, TRAFIK_RENDAH, TRAFIK_SEDANG, TRAFIK_KENCANG],
+            default=TRAFIK_SANGAT_KENCANG
+        )
+    else: # Produk sudah untung tanpa iklan (ROAS titik impas <= 0)
+        trafik_efisiensi = np.select(
+            [roas >= 10.0, roas > 0],
+            [TRAFIK_SANGAT_RENDAH, TRAFIK_RENDAH],
+            default=TRAFIK_SANGAT_KENCANG
+        )
+    trafik = np.select(
+        [~finite_cost, roas > SHOPEE_ROAS_CAP + 0.01],
+        [TRAFIK_SANGAT_KENCANG, TRAFIK_TIDAK_DAPAT_DIATUR],
+        default=trafik_efisiensi
+    )
+
+    return {
+        'roas': roas,
+        'biaya_iklan': biaya_iklan,
+        'omzet': omzet,
+        'profit': profit,
+        'target_profit': target_profit,
+        'status': status,
+        'trafik': trafik,
+        'tag': tag,
+    }
+
+
+def simulate_budget_grid(roas_values, budget_values, sim_base_units, total_cost_per_unit_excluding_ads, target_profit_pct,
+                         roas_break_even):
+    """Simulasi grid anggaran x ROAS: hasil berbentuk (len(budget_values), len(roas_values))."""
+    roas = np.asarray(roas_values, dtype=float)[np.newaxis, :]
+    budgets = np.asarray(budget_values, dtype=float)[:, np.newaxis]
+    return simulate_roas(
+        roas, None, sim_base_units, total_cost_per_unit_excluding_ads, target_profit_pct, roas_break_even,
+        biaya_iklan_fixed=budgets
+    )
+
+
+def _format_rupiah(value):
+    return f"Rp{value:,.0f}" if math.isfinite(value) else "N/A"
+
+
+def _format_profit(value):
+    if math.isfinite(value):
+        return f"-Rp{abs(value):,.0f}" if value < 0 else f"Rp{value:,.0f}"
+    return "Rugi Tak Terbatas" if value == -math.inf else "N/A"
+
+
+def format_simulation_rows(simulation):
+    """
+    Langkah format terakhir: array hasil simulate_roas -> baris tabel
+    [ROAS, Biaya Iklan, Omzet Penjualan, Profit Total, Trafik, Keterangan, tag warna].
+    """
+    return [
+        [
+            f"{roas:,.2f}" if math.isfinite(roas) else "N/A",
+            _format_rupiah(biaya_iklan),
+            _format_rupiah(omzet),
+            _format_profit(profit),
+            trafik,
+            status,
+            tag,
+        ]
+        for roas, biaya_iklan, omzet, profit, trafik, status, tag in zip(
+            simulation['roas'].ravel().tolist(), simulation['biaya_iklan'].ravel().tolist(),
+            simulation['omzet'].ravel().tolist(), simulation['profit'].ravel().tolist(),
+            simulation['trafik'].ravel().tolist(), simulation['status'].ravel().tolist(), simulation['tag'].ravel().tolist()
+        )
+    ]
+
+
+def simulation_table_key(roas_values, harga_jual, sim_base_units, total_cost_per_unit_excluding_ads, target_profit_pct, roas_break_even):
+    return (
+        tuple(round_key(value, RATIO_DIGITS) for value in np.asarray(roas_values, dtype=float).ravel().tolist()),
+        round_key(harga_jual, MONEY_DIGITS), round_key(sim_base_units, MONEY_DIGITS),
+        round_key(total_cost_per_unit_excluding_ads, MONEY_DIGITS), round_key(target_profit_pct, RATIO_DIGITS),
+        round_key(roas_break_even, RATIO_DIGITS),
+    )
+
+
+@memoize('simulation', simulation_table_key)
+def simulation_table(roas_values, harga_jual, sim_base_units, total_cost_per_unit_excluding_ads, target_profit_pct, roas_break_even):
+    """Tabel simulasi siap tampil (simulate_roas + format_simulation_rows), di-memo per tuple input."""
+    return format_simulation_rows(simulate_roas(
+        roas_values, harga_jual, sim_base_units, total_cost_per_unit_excluding_ads, target_profit_pct, roas_break_even
+    ))
+
+
+# --- KURVA PROFIT vs ROAS ---
+CURVE_DEFAULT_POINTS = 120
+CURVE_MAX_POINTS = 500
+CURVE_MIN_ROAS = 0.1          # ROAS terendah yang pernah digambar
+CURVE_DEFAULT_START_ROAS = 1.0 # Awal kurva jika titik impas tidak ada / di atas 2.0
+CURVE_TAG_CODES = {'boncos': 0, 'cukup_baik': 1, 'sangat_baik': 2}
+
+
+def roas_breakpoints(harga_jual, total_cost_per_unit_excluding_ads, target_profit_pct):
+    """
+    Titik ROAS tertutup (closed-form) untuk satu produk: (ROAS titik impas, ROAS target profit).
+    Profit per unit = harga_jual - harga_jual / ROAS - biaya pokok, jadi:
+    titik impas = harga_jual / (harga_jual - biaya pokok), target = harga_jual / (harga_jual - biaya pokok - laba target).
+    Nilai None berarti titik tersebut tidak ada (produk tidak mungkin mencapainya, atau selalu untung tanpa iklan).
+    """
+    margin = harga_jual - total_cost_per_unit_excluding_ads
+    break_even = harga_jual / margin if margin > 0 else None
+    margin_target = margin - harga_jual * target_profit_pct
+    target = harga_jual / margin_target if margin_target > 0 else None
+    return break_even, target
+
+
+def profit_curve(harga_jual, sim_base_units, total_cost_per_unit_excluding_ads, target_profit_pct, n_points=CURVE_DEFAULT_POINTS):
+    """
+    Kurva profit vs ROAS dari sedikit di bawah titik impas sampai SHOPEE_ROAS_CAP.
+    Sampel berjarak geometris (rapat di ROAS rendah, tempat kurva paling melengkung),
+    lalu titik impas, target profit, dan batas ROAS Shopee disisipkan persis.
+    Mengembalikan dict ringkas yang siap di-JSON-kan.
+    """
+    break_even, target = roas_breakpoints(harga_jual, total_cost_per_unit_excluding_ads, target_profit_pct)
+    breakpoints = [value for value in (break_even, target) if value is not None and value <= SHOPEE_ROAS_CAP]
+
+    start = max(CURVE_MIN_ROAS, min(CURVE_DEFAULT_START_ROAS, break_even / 2)) if break_even else CURVE_DEFAULT_START_ROAS
+    roas_points = np.unique(np.concatenate([np.geomspace(start, SHOPEE_ROAS_CAP, max(int(n_points), 2)), breakpoints]))
+
+    simulation = simulate_roas(
+        roas_points, harga_jual, sim_base_units, total_cost_per_unit_excluding_ads, target_profit_pct,
+        break_even if break_even is not None else -1
+    )
+    tags = [CURVE_TAG_CODES[tag] for tag in simulation['tag'].tolist()]
+    return {
+        'breakpoints': {
+            'breakEven': break_even,
+            'targetProfit': target,
+            'cap': SHOPEE_ROAS_CAP,
+        },
+        'tags': list(CURVE_TAG_CODES),
+        'columns': ['roas', 'biayaIklan', 'omzet', 'profit', 'tag'],
+        'points': [
+            [round(roas, 4), round(biaya_iklan), round(omzet), round(profit), tag]
+            for roas, biaya_iklan, omzet, profit, tag in zip(
+                roas_points.tolist(), simulation['biaya_iklan'].tolist(), simulation['omzet'].tolist(),
+                simulation['profit'].tolist(), tags
+            )
+        ],
+    }
@@ -0,0 +1,95 @@
+# File: blueprints/apps/calculator_roas/trends.py
+# Tren per produk dari laporan yang diunggah berturut-turut (riwayat selisih di analysis_history).
+# Setiap kali laporan disimpan, rollup bergulir (ROAS, CTR, tingkat konversi dalam N hari terakhir) dihitung ulang
+# untuk tanggal laporan yang terpengaruh dan disimpan di tabel product_trend, jadi /trends/<produkId> cukup
+# membaca baris rollup satu produk tanpa menyusun ulang riwayatnya.
+# Semua perhitungan kolumnar: riwayat selisih dijadikan deret per produk per tanggal laporan (forward fill per
+# produk), lalu jumlah per jendela waktu dihitung dari prefix sum. Tidak ada loop Python per produk.
+import numpy as np
+import pandas as pd
+
+TREND_WINDOWS_DAYS = (7, 28) # Panjang jendela rollup (hari kalender, dihitung mundur dari tanggal laporan)
+TREND_SUM_COLUMNS = ['biaya', 'omzet', 'terjual', 'dilihat', 'klik', 'konversi'] # Dijumlahkan dalam jendela
+
+# Rasio: nama -> (pembilang, penyebut)
+TREND_RATIOS = {
+    'roas': ('omzet', 'biaya'),
+    'ctr': ('klik', 'dilihat'),
+    'cr': ('konversi', 'klik'),
+}
+
+# Kolom tabel product_trend selain kunci (user_id, produk_id, shop, report_date)
+TREND_COLUMNS = TREND_SUM_COLUMNS + list(TREND_RATIOS) + [
+    f'{ratio}_{days}d' for days in TREND_WINDOWS_DAYS for ratio in TREND_RATIOS
+]
+
+_PRODUCT_KEY_STRIDE = 1_000_000 # Jarak kunci antar produk (dalam hari), jauh lebih besar dari rentang tanggal mana pun
+
+_RATIO_JSON_NAMES = {'roas': 'ROAS', 'ctr': 'persentaseKlik', 'cr': 'tingkatKonversi'}
+
+# Kolom product_trend -> nama kolom JSON (camelCase)
+TREND_JSON_COLUMNS = {
+    'shop': 'namaToko', 'report_date': 'tanggal',
+    'biaya': 'biaya', 'omzet': 'omzetPenjualan', 'terjual': 'produkTerjual',
+    'dilihat': 'dilihat', 'klik': 'jumlahKlik', 'konversi': 'konversi',
+    **_RATIO_JSON_NAMES,
+    **{f'{ratio}_{days}d': f'{name}{days}Hari' for days in TREND_WINDOWS_DAYS for ratio, name in _RATIO_JSON_NAMES.items()},
+}
+
+
+def _ratio(numerator, denominator):
+    numerator = np.asarray(numerator, dtype=float)
+    denominator = np.asarray(denominator, dtype=float)
+    return np.where(denominator > 0, numerator / np.where(denominator > 0, denominator, 1), np.nan)
+
+
+def dense_series(seed, facts, report_dates, removed_change):
+    """
+    Deret per produk per tanggal laporan dari riwayat selisih.
+    seed: kondisi lengkap sebelum rentang (produk_id + kolom angka), facts: baris fakta di dalam rentang
+    (produk_id, report_date, change, kolom angka), report_dates: semua tanggal laporan di rentang (urut).
+    Produk yang tidak berubah pada suatu tanggal memakai nilai terakhirnya; produk 'hilang' tidak punya baris
+    sampai muncul lagi. Mengembalikan DataFrame (produk_id, report_date, TREND_SUM_COLUMNS).
+    """
+    columns = ['produk_id', 'report_date', 'change', *TREND_SUM_COLUMNS]
+    seed = seed.assign(report_date='', change='')[columns] # '' = sebelum tanggal pertama rentang
+    history = pd.concat([part for part in (seed, facts[columns]) if not part.empty] or [seed], ignore_index=True)
+    history = history.set_index(['produk_id', 'report_date'])
+    grid = pd.MultiIndex.from_product(
+        [history.index.get_level_values('produk_id').unique(), ['', *report_dates]], names=['produk_id', 'report_date']
+    )
+    dense = history.reindex(grid).groupby(level='produk_id').ffill()
+    present = dense['change'].notna() & (dense['change'] != removed_change)
+    dense = dense[present].reset_index()
+    dense = dense[dense['report_date'] != '']
+    return dense[['produk_id', 'report_date', *TREND_SUM_COLUMNS]].astype({column: float for column in TREND_SUM_COLUMNS})
+
+
+def rolling_rollups(series):
+    """
+    Rasio per tanggal + rasio bergulir tiap jendela TREND_WINDOWS_DAYS untuk deret hasil dense_series.
+    Rasio jendela = jumlah pembilang / jumlah penyebut di jendela (bukan rata-rata rasio harian).
+    Jumlah jendela = selisih prefix sum; awal jendela tiap baris dicari dengan satu searchsorted atas kunci
+    (produk, hari), jadi biayanya tidak bergantung pada jumlah produk (groupby().rolling() lambat untuk ribuan grup).
+    """
+    series = series.sort_values(['produk_id', 'report_date'], ignore_index=True)
+    for ratio, (numerator, denominator) in TREND_RATIOS.items():
+        series[ratio] = _ratio(series[numerator], series[denominator])
+
+    product_codes = pd.factorize(series['produk_id'])[0].astype(np.int64) # Sudah urut, jadi kode ikut naik
+    days = (pd.to_datetime(series['report_date']) - pd.Timestamp('1970-01-01')).dt.days.to_numpy(np.int64)
+    keys = product_codes * _PRODUCT_KEY_STRIDE + days
+    values = np.nan_to_num(series[TREND_SUM_COLUMNS].to_numpy(float))
+    prefix = np.vstack([np.zeros((1, values.shape[1])), np.cumsum(values, axis=0)])
+    row_end = np.arange(1, len(series) + 1)
+    for window_days in TREND_WINDOWS_DAYS:
+        row_start = np.searchsorted(keys, keys - (window_days - 1), side='left')
+        sums = dict(zip(TREND_SUM_COLUMNS, (prefix[row_end] - prefix[row_start]).T))
+        for ratio, (numerator, denominator) in TREND_RATIOS.items():
+            series[f'{ratio}_{window_days}d'] = _ratio(sums[numerator], sums[denominator])
+    return series
+
+
+def trend_json(rows):
+    """Baris product_trend (sqlite3.Row / dict) -> list dict JSON (camelCase)."""
+    return [{TREND_JSON_COLUMNS[key]: row[key] for key in row.keys() if key in TREND_JSON_COLUMNS} for row in rows]
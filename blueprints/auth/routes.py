@@ -1,6 +1,6 @@
 from flask import render_template, request, redirect, url_for, flash
 from flask_login import login_user, logout_user, login_required, current_user
-from extensions import db
+from extensions import db, invalidate_user_snapshot
 from models import User
 from . import bp
 
@@ -55,8 +55,11 @@ def edit_profile():
     if request.method == 'POST':
         new_username = request.form.get('username')
         if new_username:
-            current_user.username = new_username
+            # current_user hanya snapshot (read-only): ubah lewat objek User dari database
+            user = db.session.get(User, current_user.id)
+            user.username = new_username
             db.session.commit()
+            invalidate_user_snapshot(user.id)
             flash('Profil berhasil diperbarui!')
             return redirect(url_for('auth.edit_profile'))
     return render_template('auth/edit_profile.html')
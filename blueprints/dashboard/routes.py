@@ -1,33 +1,21 @@
 # File: blueprints/dashboard/routes.py
 from flask import render_template, redirect, url_for, flash
 from flask_login import login_required, current_user
-from models import App, UserApp
-import datetime
+from extensions import get_app_by_id, get_app_statuses, get_user_app_grants
 
 from . import bp
 
 @bp.route('/dashboard')
 @login_required
 def index():
-    user_app_entries = UserApp.query.filter_by(user_id=current_user.id).all()
-    
-    installed_apps_with_details = []
-    trial_duration_hours = 24
+    # Sisa waktu premium/trial dari status entitlement (access_state), sama dengan halaman aplikasi
+    app_statuses = get_app_statuses(current_user.id)
 
-    for user_app_entry in user_app_entries:
-        app_info = App.query.get(user_app_entry.app_id)
+    installed_apps_with_details = []
+    for grant in get_user_app_grants(current_user.id):
+        app_info = get_app_by_id(grant.app_id)
         if app_info:
-            time_remaining_seconds = 0
-            
-            # Logika Prioritas Waktu Premium
-            if user_app_entry.is_premium and user_app_entry.premium_end_date and user_app_entry.premium_end_date > datetime.datetime.utcnow():
-                time_remaining_seconds = (user_app_entry.premium_end_date - datetime.datetime.utcnow()).total_seconds()
-            else:
-                trial_end_time = user_app_entry.installation_date + datetime.timedelta(hours=trial_duration_hours)
-                time_remaining_seconds = (trial_end_time - datetime.datetime.utcnow()).total_seconds()
-
-            if time_remaining_seconds < 0:
-                time_remaining_seconds = 0
+            time_remaining_seconds = app_statuses[grant.app_url]['time_remaining_seconds']
             
             installed_apps_with_details.append({
                 'app': app_info,
@@ -39,4 +27,4 @@ def index():
     return render_template(
         'dashboard/dashboard.html',
         installed_apps=installed_apps_with_details
-    )
\ No newline at end of file
+    )
@@ -0,0 +1,90 @@
+# File: database.py
+# Konfigurasi SQLite untuk produksi (gunicorn dengan beberapa worker).
+# Setiap koneksi baru mendapat PRAGMA:
+#   - journal_mode=WAL : pembaca tidak diblokir penulis (install_app/grant_access), dan sebaliknya
+#   - synchronous=NORMAL : fsync hanya saat checkpoint WAL (aman dari korupsi, jauh lebih cepat dari FULL)
+#   - busy_timeout : penulis yang bertabrakan menunggu, bukan langsung "database is locked"
+#   - cache_size / mmap_size : halaman database yang sering dibaca tetap di memori
+# Pool koneksi SQLAlchemy dipakai ulang antar request (dengan pre-ping).
+from sqlalchemy import event
+
+SQLITE_BUSY_TIMEOUT_MS = 5000             # Lama menunggu lock tulis sebelum error
+SQLITE_CACHE_SIZE_KIB = 16 * 1024          # Page cache per koneksi (16 MB)
+SQLITE_MMAP_SIZE_BYTES = 128 * 1024 * 1024 # File database di-mmap sampai 128 MB
+SQLITE_POOL_SIZE = 10                      # Koneksi yang disimpan di pool per worker
+SQLITE_MAX_OVERFLOW = 20                   # Koneksi tambahan saat ramai (ditutup setelah dipakai)
+
+
+def sqlite_pragmas(busy_timeout_ms=SQLITE_BUSY_TIMEOUT_MS, cache_size_kib=SQLITE_CACHE_SIZE_KIB,
+                   mmap_size_bytes=SQLITE_MMAP_SIZE_BYTES):
+    """Daftar PRAGMA (urut) yang dijalankan di setiap koneksi baru."""
+    return [
+        ('busy_timeout', busy_timeout_ms), # Paling awal: PRAGMA berikutnya (journal_mode) butuh lock
+        ('journal_mode', 'WAL'),
+        ('synchronous', 'NORMAL'),
+        ('cache_size', -cache_size_kib),    # Nilai negatif = ukuran dalam KiB, bukan jumlah halaman
+        ('mmap_size', mmap_size_bytes),
+        ('temp_store', 'MEMORY'),
+    ]
+
+
+def install_sqlite_pragmas(engine, pragmas=None):
+    """Memasang listener 'connect' yang menjalankan PRAGMA di setiap koneksi DBAPI baru milik engine."""
+    pragmas = pragmas if pragmas is not None else sqlite_pragmas()
+
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+    return engine
+
+
+def sqlite_engine_options(pool_size=SQLITE_POOL_SIZE, max_overflow=SQLITE_MAX_OVERFLOW,
+                          busy_timeout_ms=SQLITE_BUSY_TIMEOUT_MS):
+    """Opsi create_engine untuk SQLite file: pool koneksi + pre-ping + timeout driver."""
+    return {
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_pre_ping': True,
+        'connect_args': {
+            'timeout': busy_timeout_ms / 1000, # Timeout lock di level driver sqlite3 (detik)
+            'check_same_thread': False,        # Koneksi di pool bisa dipakai thread request mana pun
+        },
+    }
+
+
+def configure_database(app, db):
+    """
+    Menghubungkan db (Flask-SQLAlchemy) ke app dengan tuning SQLite.
+    Panggil sebagai pengganti db.init_app(app). Database selain SQLite tidak diubah.
+    """
+    uri = app.config.get('SQLALCHEMY_DATABASE_URI', '')
+    is_sqlite = uri.startswith('sqlite')
+    is_memory = uri in ('sqlite://', 'sqlite:///:memory:')
+
+    if is_sqlite and not is_memory:
+        options = sqlite_engine_options(
+            pool_size=app.config.get('SQLITE_POOL_SIZE', SQLITE_POOL_SIZE),
+            max_overflow=app.config.get('SQLITE_MAX_OVERFLOW', SQLITE_MAX_OVERFLOW),
+            busy_timeout_ms=app.config.get('SQLITE_BUSY_TIMEOUT_MS', SQLITE_BUSY_TIMEOUT_MS),
+        )
+        options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})) # Opsi eksplisit di config tetap menang
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+    db.init_app(app)
+
+    if is_sqlite:
+        pragmas = sqlite_pragmas(
+            busy_timeout_ms=app.config.get('SQLITE_BUSY_TIMEOUT_MS', SQLITE_BUSY_TIMEOUT_MS),
+            cache_size_kib=app.config.get('SQLITE_CACHE_SIZE_KIB', SQLITE_CACHE_SIZE_KIB),
+            mmap_size_bytes=app.config.get('SQLITE_MMAP_SIZE_BYTES', SQLITE_MMAP_SIZE_BYTES),
+        )
+        if is_memory:
+            pragmas = [pragma for pragma in pragmas if pragma[0] != 'journal_mode'] # WAL tidak berlaku di :memory:
+        with app.app_context():
+            install_sqlite_pragmas(db.engine, pragmas)
@@ -2,7 +2,13 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, current_user
 import datetime
-from flask import url_for # Import url_for to build dynamic endpoints
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from functools import wraps
+from flask import url_for, g, has_request_context, flash, redirect # Import url_for to build dynamic endpoints
+
+from access_state import ACCESS_EXPIRED, ACCESS_PREMIUM, ACCESS_TRIAL, resolve_access_state
 
 db = SQLAlchemy()
 login_manager = LoginManager()
@@ -18,6 +24,179 @@ def format_rupiah_no_rp(value):
         return str(value)
 # --- Akhir penambahan ---
 
+# --- REGISTRY ENDPOINT APLIKASI ---
+# App.url -> endpoint halaman utama aplikasi. Tambahkan aplikasi baru di sini (bukan if/elif di tiap view).
+APP_ENDPOINTS = {
+    'roas_calculator': 'calculator_roas.index',
+    # 'other_app_url': 'other_blueprint.index',
+}
+
+
+def get_app_endpoint(app_url):
+    """Endpoint halaman utama aplikasi, atau None jika aplikasi belum punya halaman."""
+    return APP_ENDPOINTS.get(app_url)
+
+
+# --- KATALOG APLIKASI (CACHE TABEL App) ---
+# Tabel App kecil dan hampir tidak pernah berubah: dimuat sekali per proses, diindeks per id dan url.
+# Setiap insert/update/delete App menaikkan versi katalog (event di models.py), sehingga pembacaan berikutnya
+# memuat ulang. TTL membatasi data basi di worker lain yang tidak melihat event tersebut.
+APP_CATALOGUE_TTL_SECONDS = 300
+
+# Salinan baris App (immutable, aman dipakai bersama antar request dan thread)
+AppInfo = namedtuple('AppInfo', ['id', 'name', 'description', 'url'])
+AppCatalogue = namedtuple('AppCatalogue', ['version', 'expires_at', 'apps', 'by_id', 'by_url'])
+
+_app_catalogue = None
+_app_catalogue_version = 0
+_app_catalogue_lock = threading.Lock()
+
+
+def _load_app_catalogue(version):
+    from models import App # Import di dalam fungsi untuk menghindari circular import
+    rows = db.session.query(App.id, App.name, App.description, App.url).order_by(App.id).all()
+    apps = tuple(AppInfo(*row) for row in rows)
+    return AppCatalogue(
+        version=version,
+        expires_at=time.monotonic() + APP_CATALOGUE_TTL_SECONDS,
+        apps=apps,
+        by_id={app_info.id: app_info for app_info in apps},
+        by_url={app_info.url: app_info for app_info in apps},
+    )
+
+
+def get_app_catalogue():
+    """Katalog aplikasi (AppCatalogue); satu query hanya saat pertama kali / setelah App berubah / TTL habis."""
+    global _app_catalogue
+    catalogue = _app_catalogue
+    if catalogue is not None and catalogue.version == _app_catalogue_version and catalogue.expires_at > time.monotonic():
+        return catalogue
+    with _app_catalogue_lock:
+        version = _app_catalogue_version
+        catalogue = _load_app_catalogue(version)
+        _app_catalogue = catalogue
+    return catalogue
+
+
+def get_all_apps():
+    """Semua aplikasi (AppInfo), urut id."""
+    return get_app_catalogue().apps
+
+
+def get_app_by_id(app_id):
+    """AppInfo untuk id aplikasi, atau None."""
+    return get_app_catalogue().by_id.get(app_id)
+
+
+def get_app_by_url(app_url):
+    """AppInfo untuk App.url, atau None."""
+    return get_app_catalogue().by_url.get(app_url)
+
+
+def invalidate_app_catalogue():
+    """Menaikkan versi katalog (dipanggil dari event App di models.py)."""
+    global _app_catalogue_version
+    with _app_catalogue_lock:
+        _app_catalogue_version += 1
+
+
+# --- CACHE APLIKASI TERINSTAL PER USER (SIDEBAR + ENTITLEMENT) ---
+# Semua aplikasi terinstal milik user (beserta data trial/premium) dimuat dengan satu query UserApp
+# (nama/url aplikasi dari katalog), di-memo di flask.g selama satu request, dan di-cache per user antar request.
+# Cache dibuang saat install/uninstall/grant/hapus user (invalidate_user_apps_cache);
+# TTL membatasi data basi di worker lain yang tidak menerima invalidasi.
+USER_APPS_CACHE_TTL_SECONDS = 60
+USER_APPS_CACHE_MAX_USERS = 1024
+
+# Satu baris UserApp + data App-nya (immutable, aman dipakai bersama antar request)
+UserAppGrant = namedtuple('UserAppGrant', [
+    'app_id', 'app_name', 'app_url', 'installation_date', 'is_premium', 'premium_end_date', 'access_state', 'access_expires_at'
+])
+
+_user_apps_cache = OrderedDict()
+_user_apps_cache_lock = threading.Lock()
+
+
+def _load_user_app_grants(user_id):
+    from models import UserApp # Import di dalam fungsi untuk menghindari circular import
+    rows = db.session.query(
+        UserApp.app_id, UserApp.installation_date, UserApp.is_premium, UserApp.premium_end_date,
+        UserApp.access_state, UserApp.access_expires_at
+    ).filter(UserApp.user_id == user_id).order_by(UserApp.id).all()
+
+    grants = []
+    for app_id, *user_app_fields in rows:
+        app_info = get_app_by_id(app_id) # Nama & url aplikasi dari katalog (tanpa join ke tabel App)
+        if app_info is not None:
+            grants.append(UserAppGrant(app_id, app_info.name, app_info.url, *user_app_fields))
+    return tuple(grants)
+
+
+def get_user_app_grants(user_id):
+    """Semua aplikasi terinstal milik user (urut instalasi): flask.g -> cache per user -> satu query."""
+    if 'user_app_grants' in g and g.user_app_grants[0] == user_id:
+        return g.user_app_grants[1]
+
+    now = time.monotonic()
+    with _user_apps_cache_lock:
+        cached = _user_apps_cache.get(user_id)
+        if cached and cached[0] > now:
+            _user_apps_cache.move_to_end(user_id)
+            grants = cached[1]
+        else:
+            grants = None
+
+    if grants is None:
+        grants = _load_user_app_grants(user_id)
+        with _user_apps_cache_lock:
+            _user_apps_cache[user_id] = (now + USER_APPS_CACHE_TTL_SECONDS, grants)
+            _user_apps_cache.move_to_end(user_id)
+            while len(_user_apps_cache) > USER_APPS_CACHE_MAX_USERS:
+                _user_apps_cache.popitem(last=False)
+
+    g.user_app_grants = (user_id, grants)
+    return grants
+
+
+def get_user_app_grant(user_id, app_url):
+    """UserAppGrant untuk satu aplikasi, atau None jika user belum menginstalnya."""
+    for grant in get_user_app_grants(user_id):
+        if grant.app_url == app_url:
+            return grant
+    return None
+
+
+def invalidate_user_apps_cache(user_id=None):
+    """
+    Membuang cache aplikasi terinstal satu user (atau semua user jika user_id None).
+    Panggil setelah install/uninstall/grant/hapus user.
+    """
+    with _user_apps_cache_lock:
+        if user_id is None:
+            _user_apps_cache.clear()
+        else:
+            _user_apps_cache.pop(user_id, None)
+    if has_request_context():
+        g.pop('user_app_grants', None)
+        g.pop('app_statuses', None)
+
+
+def get_sidebar_apps(user_id):
+    """Daftar aplikasi terinstal untuk sidebar (dari get_user_app_grants, tanpa query tambahan)."""
+    installed_apps_for_sidebar = []
+    for grant in get_user_app_grants(user_id):
+        # Dapatkan endpoint yang benar untuk aplikasi dari registry
+        endpoint_name = get_app_endpoint(grant.app_url)
+        if endpoint_name:
+            installed_apps_for_sidebar.append({
+                'name': grant.app_name,
+                'url': grant.app_url,
+                'icon': 'default', # Anda bisa menambahkan kolom icon di model App
+                'url_endpoint': endpoint_name # Tambahkan atribut url_endpoint
+            })
+    return installed_apps_for_sidebar
+
+
 def inject_global_template_vars():
     # Variabel notifikasi percobaan aplikasi tidak lagi diatur secara global di sini.
     # Mereka akan diatur secara spesifik oleh blueprint aplikasi masing-masing.
@@ -25,28 +204,7 @@ def inject_global_template_vars():
     whatsapp_number = "6281234567890" # Ganti dengan nomor WhatsApp Anda
 
     if current_user.is_authenticated:
-        from models import UserApp, App # Import di dalam fungsi untuk menghindari circular import
-        user_app_entries = UserApp.query.filter_by(user_id=current_user.id).all()
-
-        for user_app_entry in user_app_entries:
-            app_info = App.query.get(user_app_entry.app_id)
-            if app_info:
-                # Dapatkan endpoint yang benar untuk aplikasi
-                endpoint_name = None
-                if app_info.url == 'roas_calculator':
-                    endpoint_name = 'calculator_roas.index'
-                # Tambahkan kondisi lain di sini untuk aplikasi lain
-                # elif app_info.url == 'other_app_url':
-                #      endpoint_name = 'other_blueprint.index'
-
-                if endpoint_name:
-                    app_details = {
-                        'name': app_info.name,
-                        'url': app_info.url,
-                        'icon': 'default', # Anda bisa menambahkan kolom icon di model App
-                        'url_endpoint': endpoint_name # Tambahkan atribut url_endpoint
-                    }
-                    installed_apps_for_sidebar.append(app_details)
+        installed_apps_for_sidebar = get_sidebar_apps(current_user.id)
 
     return dict(
         installed_apps_for_sidebar=installed_apps_for_sidebar,
@@ -54,67 +212,138 @@ def inject_global_template_vars():
         # Notifikasi aplikasi tidak lagi dikirim secara global
     )
 
-def get_app_trial_status(user_id, app_url):
-    """
-    Checks the trial/premium status for a specific app for a given user.
-    Returns a dictionary with notification details or empty if no notification needed.
-    """
-    from models import UserApp, App # Import here to avoid circular dependencies
-    
-    notification_data = {
+# --- CACHE USER (load_user) ---
+# load_user dipanggil di setiap request yang login (termasuk AJAX analyze/recalculate_product).
+# User disimpan sebagai UserSnapshot immutable (id, username, is_admin) di cache per proses dengan TTL.
+# Cache dibuang saat profil diubah atau user dihapus (invalidate_user_snapshot); TTL membatasi data basi
+# di worker lain (mis. user yang baru dihapus tetap login paling lama USER_SNAPSHOT_TTL_SECONDS).
+USER_SNAPSHOT_TTL_SECONDS = 60
+USER_SNAPSHOT_CACHE_MAX_USERS = 4096
+
+_user_snapshot_cache = OrderedDict()
+_user_snapshot_cache_lock = threading.Lock()
+
+
+def get_user_snapshot(user_id):
+    """UserSnapshot untuk user_id (None jika user tidak ada): cache per user -> satu query."""
+    now = time.monotonic()
+    with _user_snapshot_cache_lock:
+        cached = _user_snapshot_cache.get(user_id)
+        if cached and cached[0] > now:
+            _user_snapshot_cache.move_to_end(user_id)
+            return cached[1]
+
+    from models import User # Import di dalam fungsi untuk menghindari circular import
+    user = db.session.get(User, user_id)
+    snapshot = user.snapshot() if user is not None else None
+    if snapshot is not None:
+        with _user_snapshot_cache_lock:
+            _user_snapshot_cache[user_id] = (now + USER_SNAPSHOT_TTL_SECONDS, snapshot)
+            _user_snapshot_cache.move_to_end(user_id)
+            while len(_user_snapshot_cache) > USER_SNAPSHOT_CACHE_MAX_USERS:
+                _user_snapshot_cache.popitem(last=False)
+    return snapshot
+
+
+def invalidate_user_snapshot(user_id=None):
+    """Membuang snapshot satu user (atau semua user jika user_id None). Panggil setelah user diubah/dihapus."""
+    with _user_snapshot_cache_lock:
+        if user_id is None:
+            _user_snapshot_cache.clear()
+        else:
+            _user_snapshot_cache.pop(user_id, None)
+
+
+# --- ENTITLEMENT (STATUS TRIAL/PREMIUM APLIKASI) ---
+TRIAL_WHATSAPP_NUMBER = "6289679538444" # Nomor WhatsApp khusus untuk notifikasi trial/expired
+
+
+def _empty_app_status():
+    return {
         'notification_type': None,
         'notification_message_prefix': "",
         'app_name': "",
         'time_remaining_seconds': 0,
         'trial_expired': False,
-        'is_premium_active': False
+        'is_premium_active': False,
+        'whatsapp_number': TRIAL_WHATSAPP_NUMBER
     }
-    whatsapp_number = "6289679538444" # Nomor WhatsApp khusus untuk notifikasi trial/expired
 
-    if not user_id:
-        return notification_data
-
-    app_info = App.query.filter_by(url=app_url).first()
-    if not app_info:
-        # Jika aplikasi tidak ditemukan, tidak ada status untuk dilaporkan
-        return notification_data
-
-    user_app_entry = UserApp.query.filter_by(user_id=user_id, app_id=app_info.id).first()
-
-    if user_app_entry:
-        current_time = datetime.datetime.utcnow()
-        
-        # 1. Cek status Premium dulu
-        if user_app_entry.is_premium and user_app_entry.premium_end_date and user_app_entry.premium_end_date > current_time:
-            notification_data['is_premium_active'] = True
-            notification_data['notification_type'] = "premium"
-            notification_data['app_name'] = app_info.name
-            notification_data['time_remaining_seconds'] = (user_app_entry.premium_end_date - current_time).total_seconds()
-            notification_data['notification_message_prefix'] = f"Langganan Premium Aplikasi {app_info.name} tersisa: "
-        else:
-            # 2. Jika bukan premium atau premium sudah berakhir, cek masa percobaan
-            trial_duration_hours = 24 # Durasi trial, sesuaikan jika perlu
-            trial_end_time = user_app_entry.installation_date + datetime.timedelta(hours=trial_duration_hours)
-            
-            if current_time < trial_end_time:
-                # Masih dalam masa percobaan
-                notification_data['trial_expired'] = False
-                notification_data['is_premium_active'] = False
-                notification_data['notification_type'] = 'trial'
-                notification_data['time_remaining_seconds'] = (trial_end_time - current_time).total_seconds()
-                notification_data['app_name'] = app_info.name
-                notification_data['notification_message_prefix'] = f"Masa percobaan Aplikasi {app_info.name} akan berakhir dalam"
-            else:
-                # Masa percobaan sudah berakhir
-                notification_data['trial_expired'] = True
-                notification_data['is_premium_active'] = False
-                notification_data['notification_type'] = 'expired'
-                notification_data['app_name'] = app_info.name
-                notification_data['notification_message_prefix'] = f"Masa percobaan Aplikasi {app_info.name} telah berakhir!"
-                notification_data['time_remaining_seconds'] = 0 # Sudah berakhir
+
+def app_status_from_grant(grant, current_time):
+    """
+    Status trial/premium satu aplikasi terinstal (tanpa query). Key dict sama dengan get_app_trial_status.
+    Cukup membaca access_state/access_expires_at; baris yang sudah lewat waktunya tapi belum disapu sweeper
+    dihitung ulang dengan aturan yang sama (access_state.resolve_access_state).
+    """
+    notification_data = _empty_app_status()
+    notification_data['app_name'] = grant.app_name
+
+    access, expires_at = grant.access_state, grant.access_expires_at
+    if access != ACCESS_EXPIRED and (expires_at is None or expires_at <= current_time):
+        access, expires_at = resolve_access_state(grant.is_premium, grant.premium_end_date, grant.installation_date, current_time)
+
+    if access == ACCESS_PREMIUM:
+        notification_data['is_premium_active'] = True
+        notification_data['notification_type'] = "premium"
+        notification_data['time_remaining_seconds'] = (expires_at - current_time).total_seconds()
+        notification_data['notification_message_prefix'] = f"Langganan Premium Aplikasi {grant.app_name} tersisa: "
+    elif access == ACCESS_TRIAL:
+        # Masih dalam masa percobaan
+        notification_data['notification_type'] = 'trial'
+        notification_data['time_remaining_seconds'] = (expires_at - current_time).total_seconds()
+        notification_data['notification_message_prefix'] = f"Masa percobaan Aplikasi {grant.app_name} akan berakhir dalam"
     else:
-        # Aplikasi belum diinstal oleh user ini, anggap tidak ada notifikasi aktif untuknya
-        pass
-    
-    notification_data['whatsapp_number'] = whatsapp_number
-    return notification_data
\ No newline at end of file
+        # Masa percobaan sudah berakhir
+        notification_data['trial_expired'] = True
+        notification_data['notification_type'] = 'expired'
+        notification_data['notification_message_prefix'] = f"Masa percobaan Aplikasi {grant.app_name} telah berakhir!"
+    return notification_data
+
+
+def get_app_statuses(user_id):
+    """
+    Status trial/premium semua aplikasi terinstal milik user: dict App.url -> status.
+    Dihitung sekali per request dari get_user_app_grants (satu query, atau nol query jika ada di cache).
+    """
+    if 'app_statuses' in g and g.app_statuses[0] == user_id:
+        return g.app_statuses[1]
+    current_time = datetime.datetime.utcnow()
+    statuses = {grant.app_url: app_status_from_grant(grant, current_time) for grant in get_user_app_grants(user_id)}
+    g.app_statuses = (user_id, statuses)
+    return statuses
+
+
+def get_app_trial_status(user_id, app_url):
+    """
+    Checks the trial/premium status for a specific app for a given user.
+    Returns a dictionary with notification details or empty if no notification needed.
+    Aplikasi yang belum diinstal (atau tidak ada) tidak punya notifikasi aktif.
+    """
+    if not user_id:
+        return _empty_app_status()
+    status = get_app_statuses(user_id).get(app_url)
+    return status if status is not None else _empty_app_status()
+
+
+def app_access_required(app_url):
+    """
+    Decorator route aplikasi: user harus sudah menginstal aplikasi app_url.
+    Data instalasi dan status trial/premium disimpan di g.app_grant dan g.app_status untuk view.
+    Pasang di bawah @login_required.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            grant = get_user_app_grant(current_user.id, app_url)
+            if grant is None:
+                if get_app_by_url(app_url) is None:
+                    flash('Aplikasi tidak ditemukan.', 'danger')
+                    return redirect(url_for('dashboard.index'))
+                flash('Kamu perlu menginstal aplikasi ini dari App Store untuk membukanya.', 'warning')
+                return redirect(url_for('app_store.index'))
+            g.app_grant = grant
+            g.app_status = get_app_trial_status(current_user.id, app_url)
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
@@ -0,0 +1,43 @@
+"""Add UserApp indexes for premium/trial expiry scans
+
+Revision ID: a7c2e91d4b10
+Revises: f3131d6c8443
+Create Date: 2026-10-16 09:12:44.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c2e91d4b10'
+down_revision = 'f3131d6c8443'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Lookup per user_id dan (user_id, app_id) sudah ditangani index unik _user_app_uc.
+    # Index di bawah untuk scan kedaluwarsa (laporan & pembersihan):
+    #   - premium yang berakhir sebelum X     -> partial index premium_end_date WHERE is_premium = 1
+    #   - trial yang diinstal sebelum X       -> partial index installation_date WHERE is_premium = 0
+    #   - premium per aplikasi yang berakhir  -> composite (app_id, is_premium, premium_end_date)
+    with op.batch_alter_table('user_app', schema=None) as batch_op:
+        batch_op.create_index(
+            'ix_user_app_premium_expiry', ['premium_end_date'], unique=False,
+            sqlite_where=sa.text('is_premium = 1'), postgresql_where=sa.text('is_premium')
+        )
+        batch_op.create_index(
+            'ix_user_app_trial_installed', ['installation_date'], unique=False,
+            sqlite_where=sa.text('is_premium = 0'), postgresql_where=sa.text('NOT is_premium')
+        )
+        batch_op.create_index(
+            'ix_user_app_app_premium_end', ['app_id', 'is_premium', 'premium_end_date'], unique=False
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('user_app', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_app_app_premium_end')
+        batch_op.drop_index('ix_user_app_trial_installed')
+        batch_op.drop_index('ix_user_app_premium_expiry')
@@ -0,0 +1,55 @@
+"""Add materialized access_state to UserApp
+
+Revision ID: c4d81f6a2e37
+Revises: a7c2e91d4b10
+Create Date: 2026-10-16 11:40:07.203118
+
+"""
+import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d81f6a2e37'
+down_revision = 'a7c2e91d4b10'
+branch_labels = None
+depends_on = None
+
+TRIAL_SECONDS = 24 * 3600 # access_state.TRIAL_DURATION saat migrasi ini dibuat
+
+
+def upgrade():
+    with op.batch_alter_table('user_app', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('access_state', sa.String(length=10), nullable=False, server_default='trial'))
+        batch_op.add_column(sa.Column('access_expires_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(
+            'ix_user_app_access_due', ['access_expires_at'], unique=False,
+            sqlite_where=sa.text("access_state != 'expired'")
+        )
+
+    # Isi status untuk baris yang sudah ada (aturan yang sama dengan access_state.resolve_access_state)
+    now = datetime.datetime.utcnow()
+    op.get_bind().execute(sa.text(
+        "UPDATE user_app SET"
+        " access_state = CASE"
+        "  WHEN is_premium = 1 AND premium_end_date > :now THEN 'premium'"
+        "  WHEN installation_date > :trial_cutoff THEN 'trial'"
+        "  ELSE 'expired' END,"
+        " access_expires_at = CASE"
+        "  WHEN is_premium = 1 AND premium_end_date > :now THEN premium_end_date"
+        "  WHEN installation_date > :trial_cutoff THEN datetime(installation_date, :trial_offset)"
+        "  ELSE NULL END"
+    ), {
+        'now': now.isoformat(sep=' '),
+        'trial_cutoff': (now - datetime.timedelta(seconds=TRIAL_SECONDS)).isoformat(sep=' '),
+        'trial_offset': f'+{TRIAL_SECONDS} seconds',
+    })
+
+
+def downgrade():
+    with op.batch_alter_table('user_app', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_app_access_due')
+        batch_op.drop_column('access_expires_at')
+        batch_op.drop_column('access_state')
@@ -1,11 +1,16 @@
 # File: models.py
-from extensions import db
+from extensions import db, invalidate_app_catalogue
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
 import datetime
+from collections import namedtuple
 import secrets
 import string
 
+from access_state import ACCESS_TRIAL, resolve_access_state
+
 def generate_random_id(length=6):
     characters = string.ascii_letters + string.digits
     return ''.join(secrets.choice(characters) for i in range(length))
@@ -27,9 +32,27 @@ class User(UserMixin, db.Model):
     def get_id(self):
          return str(self.id)
 
+    def snapshot(self):
+        """Salinan immutable (id, username, is_admin) untuk cache load_user."""
+        return UserSnapshot(self.id, self.username, bool(self.is_admin))
+
     def __repr__(self):
         return f'<User {self.username}>'
 
+
+class UserSnapshot(namedtuple('UserSnapshot', ['id', 'username', 'is_admin']), UserMixin):
+    """
+    User ringan untuk current_user (dari cache load_user, tanpa query per request).
+    Hanya untuk dibaca: route yang mengubah data user harus memuat User (ORM) sendiri.
+    """
+    __slots__ = ()
+
+    def get_id(self):
+        return str(self.id)
+
+    def __repr__(self):
+        return f'<UserSnapshot {self.username}>'
+
 class App(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(64), unique=True, nullable=False)
@@ -58,8 +81,74 @@ class UserApp(db.Model):
     installation_date = db.Column(db.DateTime, default=datetime.datetime.utcnow, nullable=False)
     is_premium = db.Column(db.Boolean, default=False, nullable=False)
     premium_end_date = db.Column(db.DateTime, nullable=True) 
+    # Status akses yang sudah dihitung (lihat access_state.py): diisi saat baris ditulis, diperbarui sweeper
+    access_state = db.Column(db.String(10), nullable=False, default=ACCESS_TRIAL, server_default=ACCESS_TRIAL)
+    access_expires_at = db.Column(db.DateTime, nullable=True) # Kapan access_state saat ini berakhir (None jika expired)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'app_id', name='_user_app_uc'),
+        # Scan kedaluwarsa premium / trial (lihat migrasi a7c2e91d4b10). Partial index hanya dipakai SQLite
+        # jika query memuat kondisi yang sama persis (UserApp.is_premium == True / == False).
+        db.Index('ix_user_app_premium_expiry', 'premium_end_date',
+                 sqlite_where=db.text('is_premium = 1'), postgresql_where=db.text('is_premium')),
+        db.Index('ix_user_app_trial_installed', 'installation_date',
+                 sqlite_where=db.text('is_premium = 0'), postgresql_where=db.text('NOT is_premium')),
+        db.Index('ix_user_app_app_premium_end', 'app_id', 'is_premium', 'premium_end_date'),
+        # Baris yang harus dihitung ulang oleh sweeper (lihat migrasi c4d81f6a2e37)
+        db.Index('ix_user_app_access_due', 'access_expires_at', sqlite_where=db.text("access_state != 'expired'")),
+    )
+
+    @classmethod
+    def premium_ending_before(cls, moment, app_id=None):
+        """Query entri premium yang berakhir sebelum moment (memakai ix_user_app_premium_expiry / ix_user_app_app_premium_end)."""
+        query = cls.query.filter(cls.is_premium == True, cls.premium_end_date < moment) # noqa: E712 (harus literal untuk partial index)
+        if app_id is not None:
+            query = query.filter(cls.app_id == app_id)
+        return query
 
-    __table_args__ = (db.UniqueConstraint('user_id', 'app_id', name='_user_app_uc'),)
+    @classmethod
+    def trials_installed_before(cls, moment):
+        """Query entri trial (bukan premium) yang diinstal sebelum moment (memakai ix_user_app_trial_installed)."""
+        return cls.query.filter(cls.is_premium == False, cls.installation_date < moment) # noqa: E712
+
+    def refresh_access_state(self, current_time=None):
+        """Menghitung ulang access_state/access_expires_at dari kolom premium & instalasi."""
+        self.access_state, self.access_expires_at = resolve_access_state(
+            self.is_premium, self.premium_end_date, self.installation_date, current_time or datetime.datetime.utcnow()
+        )
 
     def __repr__(self):
-        return f'<UserApp User:{self.user_id} App:{self.app_id}>'
\ No newline at end of file
+        return f'<UserApp User:{self.user_id} App:{self.app_id}>'
+
+# Katalog aplikasi (extensions.get_app_catalogue) dimuat ulang setiap kali baris App berubah.
+# Versi dinaikkan saat flush dan sekali lagi setelah commit, supaya worker thread lain yang sempat memuat
+# katalog di antara flush dan commit tidak menyimpan data lama.
+def _app_row_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info['app_catalogue_changed'] = True
+    invalidate_app_catalogue()
+
+
+def _app_changes_committed(session):
+    if session.info.pop('app_catalogue_changed', False):
+        invalidate_app_catalogue()
+
+
+for _event_name in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(App, _event_name, _app_row_changed)
+event.listen(Session, 'after_commit', _app_changes_committed)
+event.listen(Session, 'after_rollback', lambda session: session.info.pop('app_catalogue_changed', None))
+
+
+# access_state selalu dihitung ulang setiap kali baris UserApp ditulis lewat ORM (install, grant, reset trial)
+def _refresh_user_app_access_state(mapper, connection, target):
+    if target.installation_date is None:
+        target.installation_date = datetime.datetime.utcnow() # Default kolom belum terisi sebelum INSERT
+    if target.is_premium is None:
+        target.is_premium = False
+    target.refresh_access_state()
+
+
+event.listen(UserApp, 'before_insert', _refresh_user_app_access_state)
+event.listen(UserApp, 'before_update', _refresh_user_app_access_state)
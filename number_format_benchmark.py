@@ -0,0 +1,75 @@
+# File: number_format_benchmark.py
+# Micro-benchmark parse_shopee_numbers vs loop pembersihan angka lama di clean_report_chunk
+# (astype(str).str.strip().str.replace(...) berantai + pd.to_numeric). Keduanya dijalankan pada sel yang sama
+# (format EN/bawaan Shopee, satu-satunya format yang didukung loop lama) dan hasilnya harus identik.
+#
+#   python number_format_benchmark.py [--cells 1000000]
+#   (exit code 1 jika ada hasil yang berbeda)
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from blueprints.apps.calculator_roas.number_format import parse_shopee_numbers
+
+
+def baseline_clean(series):
+    """Loop pembersihan lama (sebelum number_format), termasuk fillna(0)."""
+    cleaned_series = series.astype(str).str.strip()
+    cleaned_series = cleaned_series.str.replace('Rp', '', regex=False)
+    cleaned_series = cleaned_series.str.replace('%', '', regex=False)
+    cleaned_series = cleaned_series.str.replace(',', '', regex=False) # Remove thousands separator
+    return pd.to_numeric(cleaned_series, errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+
+
+def new_clean(series):
+    """Jalur baru di clean_report_chunk: parse_shopee_numbers lalu NaN -> 0."""
+    return np.nan_to_num(parse_shopee_numbers(series, '.'), nan=0.0, posinf=np.inf, neginf=-np.inf)
+
+
+def sample_columns(cells, seed=0):
+    """Kolom uji: nama -> Series teks seperti di laporan Shopee."""
+    rng = np.random.default_rng(seed)
+    rupiah = rng.integers(0, 50_000_000, cells)
+    percent = rng.uniform(0, 100, cells)
+    mixed = pd.Series([f"Rp{v:,}" for v in rupiah[:cells // 10]], dtype=object)
+    # Sel kosong di ekspor Shopee ("-" atau kosong) tetap diparse di parser C
+    mixed.iloc[::97] = '-'
+    mixed.iloc[::101] = None
+    # Teks yang benar-benar rusak memaksa jalur cadangan per nilai
+    broken = mixed.copy()
+    broken.iloc[::1009] = 'tidak ada'
+    return {
+        'rupiah "Rp1,234,567"': pd.Series([f"Rp{v:,}" for v in rupiah], dtype=object),
+        'persen "x.xx%"': pd.Series([f"{v:.2f}%" for v in percent], dtype=object),
+        'hitungan "12345"': pd.Series([str(v) for v in rupiah], dtype=object),
+        'campuran ("-", kosong)': mixed,
+        'rusak (teks bukan angka)': broken,
+    }
+
+
+def _timed(func, series):
+    start = time.perf_counter()
+    result = func(series)
+    return result, time.perf_counter() - start
+
+
+def run_benchmark(cells):
+    failures = 0
+    for name, series in sample_columns(cells).items():
+        expected, baseline_s = _timed(baseline_clean, series)
+        actual, new_s = _timed(new_clean, series)
+        identical = np.array_equal(expected, actual)
+        failures += not identical
+        print(f"[{'OK' if identical else 'GAGAL'}] {name:26s} {len(series):>9,} sel: loop lama {baseline_s:6.3f}s | "
+              f"parse_shopee_numbers {new_s:6.3f}s ({baseline_s / new_s:4.1f}x)")
+    return failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Micro-benchmark parser angka Shopee vs loop pembersihan lama")
+    parser.add_argument('--cells', type=int, default=1_000_000)
+    args = parser.parse_args()
+    sys.exit(1 if run_benchmark(args.cells) else 0)
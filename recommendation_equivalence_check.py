@@ -0,0 +1,86 @@
+# File: recommendation_equivalence_check.py
+# Cek kesetaraan recommend_frame (versi kolumnar, mode CSV) dengan get_recommendation (versi skalar, per baris).
+# Baris uji = kombinasi nilai tepi (None, NaN, 0, negatif, kecil, besar) untuk ROAS, biaya, omzet, produk terjual
+# dan CTR, masing-masing tanpa override dan dengan override Hitung Ulang per baris (sebagian kolom kosong).
+# Memo cache tidak dipakai (get_recommendation.uncached), jadi setiap baris benar-benar dihitung ulang.
+#
+#   python recommendation_equivalence_check.py      (exit code 1 jika ada baris yang hasilnya berbeda)
+import itertools
+import random
+import sys
+
+import numpy as np
+import pandas as pd
+
+from blueprints.apps.calculator_roas.recommendation import recommend_frame
+from blueprints.apps.calculator_roas.routes import get_recommendation
+
+EDGE_VALUES = [None, np.nan, 0, -5, 0.005, 3, 150000]
+INPUT_COLUMNS = ['ROAS', 'biaya', 'omzetPenjualan', 'produkTerjual', 'persentaseKlik']
+# Urutan sama dengan tuple hasil get_recommendation
+RESULT_COLUMNS = ['analisa', 'rekomendasiAksi', 'roasTargetOptimal', 'tagWarna', 'detailedExplanation', 'rekomendasiModalHarian']
+
+# Nilai override Hitung Ulang (None = kosong, pakai asumsi default)
+OVERRIDE_VALUES = {
+    'modal_produk_input': [None, 0, 10000, 60000],
+    'fee_shopee_input': [None, 0, 0.05, 0.9],
+    'biaya_tambahan_input': [None, 0, 1000],
+    'target_profit_pct_input': [None, 0, 0.1, 0.5],
+    'harga_jual_per_unit_input': [None, 0, -1000, 25000, 80000],
+}
+
+
+def edge_rows():
+    """Semua kombinasi EDGE_VALUES untuk INPUT_COLUMNS (list dict, seperti baris hasil analisa)."""
+    return [dict(zip(INPUT_COLUMNS, values)) for values in itertools.product(EDGE_VALUES, repeat=len(INPUT_COLUMNS))]
+
+
+def random_overrides(count, seed=0):
+    """Override per baris (dict nama argumen -> list nilai) yang dipilih acak tapi tetap (seed)."""
+    rng = random.Random(seed)
+    return {name: [rng.choice(values) for _ in range(count)] for name, values in OVERRIDE_VALUES.items()}
+
+
+def _same(expected, actual):
+    if isinstance(expected, float) and isinstance(actual, float) and np.isnan(expected) and np.isnan(actual):
+        return True
+    return expected == actual
+
+
+def compare(rows, overrides=None):
+    """Jumlah baris yang hasil recommend_frame-nya berbeda dari get_recommendation (contoh pertama dicetak)."""
+    # dtype object: None tetap None (bukan NaN), sama seperti baris yang diterima get_recommendation
+    frame = pd.DataFrame(rows, columns=INPUT_COLUMNS, dtype=object)
+    frame_overrides = {
+        name: np.array([np.nan if value is None else value for value in values], dtype=float)
+        for name, values in (overrides or {}).items()
+    }
+    vectorized = recommend_frame(frame, with_explanation=True, **frame_overrides)
+
+    mismatches = 0
+    for index, row in enumerate(rows):
+        row_overrides = {name: values[index] for name, values in (overrides or {}).items()}
+        expected = get_recommendation.uncached(row, **row_overrides)
+        actual = tuple(vectorized.iloc[index][column] for column in RESULT_COLUMNS)
+        different = [column for column, e, a in zip(RESULT_COLUMNS, expected, actual) if not _same(e, a)]
+        if different:
+            if not mismatches:
+                print(f"  Contoh beda: baris {row}, override {row_overrides}")
+                for column in different:
+                    print(f"    {column}: skalar={expected[RESULT_COLUMNS.index(column)]!r} kolumnar={actual[RESULT_COLUMNS.index(column)]!r}")
+            mismatches += 1
+    return mismatches
+
+
+def run_checks():
+    rows = edge_rows()
+    failures = 0
+    for name, overrides in [('tanpa override', None), ('dengan override per baris', random_overrides(len(rows)))]:
+        mismatches = compare(rows, overrides)
+        failures += mismatches
+        print(f"[{'OK' if not mismatches else 'GAGAL'}] {name}: {len(rows)} baris, {mismatches} berbeda")
+    return failures
+
+
+if __name__ == '__main__':
+    sys.exit(1 if run_checks() else 0)
@@ -0,0 +1,98 @@
+# File: result_store_benchmark.py
+# Benchmark latensi Hitung Ulang satu produk terhadap ukuran laporan yang tersimpan di result store.
+# Tiap lookup meniru /recalculate_product: ambil satu baris produk lewat load_product (indeks produkId), lalu hitung
+# ulang rekomendasinya dengan override. Sebagai pembanding, cara lama: muat seluruh hasil analisa lalu cari produknya.
+# Dijalankan di folder sementara untuk kedua backend (sqlite dan file); database aplikasi tidak disentuh.
+#
+#   python result_store_benchmark.py [--sizes 100 5000 50000] [--lookups 200]
+#   (exit code 1 jika median lookup terindeks di ukuran terbesar > MAX_SLOWDOWN x median di ukuran terkecil)
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from blueprints.apps.calculator_roas.result_store import FileResultStore, SQLiteResultStore
+from blueprints.apps.calculator_roas.routes import get_recommendation
+
+MAX_SLOWDOWN = 3.0 # Batas kenaikan median latensi dari ukuran terkecil ke terbesar ("tetap datar")
+USER_ID = 'bench1'
+STORES = {'sqlite': (SQLiteResultStore, 'results.db'), 'file': (FileResultStore, 'results')}
+
+
+def make_products(count, seed=0):
+    """Baris produk hasil analisa sintetis (kolom seperti hasil build_csv_result), terindeks per produkId."""
+    rng = random.Random(seed)
+    products = {}
+    for index in range(count):
+        biaya = rng.randint(1000, 500000)
+        omzet = biaya * rng.uniform(0, 15)
+        products[str(100000 + index)] = {
+            'namaProduk': f"Produk {index}", 'produkId': str(100000 + index),
+            'biaya': float(biaya), 'omzetPenjualan': omzet, 'produkTerjual': float(rng.randint(0, 50)),
+            'persentaseKlik': rng.uniform(0, 0.05), 'ROAS': omzet / biaya,
+            'analisa': "Cukup Baik (Untung, Namun Perlu Optimasi untuk Target Profit)",
+            'rekomendasiAksi': "PERTAHANKAN & OPTIMASI KONTEN/TARGETING/HARGA", 'roasTargetOptimal': '5.5',
+            'tagWarna': 'cukup_baik', 'detailedExplanation': None, 'rekomendasiModalHarian': 'Rp100,000',
+            'explanationCase': 'cukup_baik', 'roasBreakEvenDisplay': '2.5', 'targetProfitPct': 0.1,
+        }
+    return products
+
+
+def _recalculate(record):
+    # Sama dengan /recalculate_product: data iklan dari baris tersimpan + override form Hitung Ulang
+    return get_recommendation.uncached(record, 20000, 0.05, 1000, 0.1, 60000)
+
+
+def _median_ms(timings):
+    return statistics.median(timings) * 1000
+
+
+def bench_store(backend, count, lookups, tmp):
+    store_class, name = STORES[backend]
+    store = store_class(os.path.join(tmp, f"{backend}-{count}-{name}"))
+    products = make_products(count)
+    payload = {'mode': 'csv', 'result': {'products_data': list(products.values())}}
+    analysis_id = store.save(USER_ID, payload, products=products)
+    targets = random.Random(count).choices(list(products), k=lookups)
+
+    indexed = []
+    for produk_id in targets:
+        start = time.perf_counter()
+        _recalculate(store.load_product(USER_ID, analysis_id, produk_id))
+        indexed.append(time.perf_counter() - start)
+
+    # Cara lama (sebelum indeks produkId): muat seluruh hasil lalu cari baris produknya
+    scan = []
+    for produk_id in targets[:max(lookups // 10, 5)]:
+        start = time.perf_counter()
+        rows = store.load(USER_ID, analysis_id)['result']['products_data']
+        _recalculate(next(row for row in rows if row['produkId'] == produk_id))
+        scan.append(time.perf_counter() - start)
+    return _median_ms(indexed), _median_ms(scan)
+
+
+def run_benchmark(sizes, lookups):
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in STORES:
+            medians = []
+            for count in sizes:
+                indexed_ms, scan_ms = bench_store(backend, count, lookups, tmp)
+                medians.append(indexed_ms)
+                print(f"{backend:6s} {count:>7,} produk: lookup terindeks {indexed_ms:7.3f} ms | muat semua + cari {scan_ms:9.3f} ms")
+            slowdown = medians[-1] / medians[0]
+            flat = slowdown <= MAX_SLOWDOWN
+            failures += not flat
+            print(f"[{'OK' if flat else 'GAGAL'}] {backend}: median {sizes[-1]:,} produk = {slowdown:.2f}x median {sizes[0]:,} produk")
+    return failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark latensi Hitung Ulang satu produk vs jumlah produk di result store")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 5000, 50000])
+    parser.add_argument('--lookups', type=int, default=200)
+    args = parser.parse_args()
+    sys.exit(1 if run_benchmark(sorted(args.sizes), args.lookups) else 0)
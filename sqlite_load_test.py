@@ -0,0 +1,125 @@
+# File: sqlite_load_test.py
+# Uji beban SQLite: beberapa proses pembaca (query aplikasi terinstal per user, seperti tiap request halaman)
+# berjalan bersamaan dengan proses penulis (install/uninstall aplikasi, seperti install_app/grant_access).
+# Dijalankan dua kali di database sementara: pengaturan bawaan SQLite vs tuning di database.py.
+#
+#   python sqlite_load_test.py [--seconds 5] [--readers 4] [--writers 2] [--users 2000]
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from database import install_sqlite_pragmas, sqlite_engine_options
+
+READ_SQL = text(
+    "SELECT app_id, installation_date, is_premium, premium_end_date FROM user_app WHERE user_id = :user_id ORDER BY id"
+)
+
+
+def _make_engine(path, tuned):
+    url = f"sqlite:///{path}"
+    if not tuned:
+        return create_engine(url)
+    return install_sqlite_pragmas(create_engine(url, **sqlite_engine_options()))
+
+
+def _setup(path, users):
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE app (id INTEGER PRIMARY KEY, name VARCHAR(64), description VARCHAR(256), url VARCHAR(128))"))
+        conn.execute(text(
+            "CREATE TABLE user_app (id INTEGER PRIMARY KEY, user_id VARCHAR(6) NOT NULL, app_id INTEGER NOT NULL,"
+            " installation_date DATETIME NOT NULL, is_premium BOOLEAN NOT NULL, premium_end_date DATETIME,"
+            " CONSTRAINT _user_app_uc UNIQUE (user_id, app_id))"
+        ))
+        conn.execute(text("INSERT INTO app (id, name, url) VALUES (1, 'App1', 'a1'), (2, 'App2', 'a2'), (3, 'App3', 'a3')"))
+        conn.execute(
+            text("INSERT INTO user_app (user_id, app_id, installation_date, is_premium) VALUES (:user_id, :app_id, datetime('now'), 0)"),
+            [{'user_id': f"u{user:05d}", 'app_id': app_id} for user in range(users) for app_id in range(1, 1 + user % 3 + 1)]
+        )
+    engine.dispose()
+
+
+def _reader(path, tuned, seconds, users, results):
+    engine = _make_engine(path, tuned)
+    reads = errors = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            with engine.connect() as conn:
+                conn.execute(READ_SQL, {'user_id': f"u{random.randrange(users):05d}"}).fetchall()
+            reads += 1
+        except OperationalError:
+            errors += 1
+    results.put(('read', reads, errors))
+
+
+def _writer(path, tuned, seconds, worker, results):
+    engine = _make_engine(path, tuned)
+    writes = errors = 0
+    deadline = time.monotonic() + seconds
+    user_id = f"w{worker:05d}"
+    while time.monotonic() < deadline:
+        try:
+            # Install lalu uninstall, masing-masing satu transaksi (seperti install_app / admin_uninstall_app)
+            with engine.begin() as conn:
+                conn.execute(text("SELECT id FROM user_app WHERE user_id = :user_id AND app_id = 1"), {'user_id': user_id}).fetchall()
+                conn.execute(text(
+                    "INSERT INTO user_app (user_id, app_id, installation_date, is_premium) VALUES (:user_id, 1, datetime('now'), 0)"
+                ), {'user_id': user_id})
+            with engine.begin() as conn:
+                conn.execute(text("DELETE FROM user_app WHERE user_id = :user_id"), {'user_id': user_id})
+            writes += 2
+        except OperationalError:
+            errors += 1
+    results.put(('write', writes, errors))
+
+
+def run(tuned, seconds, readers, writers, users):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'load_test.db')
+        _setup(path, users)
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=_reader, args=(path, tuned, seconds, users, results)) for _ in range(readers)]
+        processes += [multiprocessing.Process(target=_writer, args=(path, tuned, seconds, worker, results)) for worker in range(writers)]
+        for process in processes:
+            process.start()
+        totals = {'read': [0, 0], 'write': [0, 0]}
+        for _ in processes:
+            kind, count, errors = results.get()
+            totals[kind][0] += count
+            totals[kind][1] += errors
+        for process in processes:
+            process.join()
+    return {
+        'reads_per_second': totals['read'][0] / seconds,
+        'read_errors': totals['read'][1],
+        'writes_per_second': totals['write'][0] / seconds,
+        'write_errors': totals['write'][1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Uji beban baca/tulis SQLite: bawaan vs tuning database.py")
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--users', type=int, default=2000)
+    args = parser.parse_args()
+
+    for label, tuned in (('bawaan', False), ('tuning', True)):
+        print(f"Menjalankan skenario {label}: {args.readers} pembaca + {args.writers} penulis selama {args.seconds:g} detik...")
+        stats = run(tuned, args.seconds, args.readers, args.writers, args.users)
+        print(
+            f"  baca : {stats['reads_per_second']:,.0f}/detik ({stats['read_errors']} error 'database is locked')\n"
+            f"  tulis: {stats['writes_per_second']:,.0f}/detik ({stats['write_errors']} error 'database is locked')"
+        )
+
+
+if __name__ == '__main__':
+    main()
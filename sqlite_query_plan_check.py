@@ -0,0 +1,75 @@
+# File: sqlite_query_plan_check.py
+# Cek EXPLAIN QUERY PLAN untuk query akses UserApp yang sering dipakai: setiap query harus memakai index
+# yang diharapkan (bukan SCAN seluruh tabel). Dijalankan di database SQLite sementara yang dibuat dari models.py.
+#
+#   python sqlite_query_plan_check.py      (exit code 1 jika ada query yang tidak memakai index-nya)
+import datetime
+import os
+import sys
+import tempfile
+
+from flask import Flask
+
+from access_state import ACCESS_EXPIRED
+from extensions import db
+from models import App, User, UserApp
+
+
+def _query_plan(query):
+    """Baris detail EXPLAIN QUERY PLAN untuk query SQLAlchemy (parameter tetap sebagai bound parameter)."""
+    compiled = query.statement.compile(dialect=db.engine.dialect)
+    params = compiled.construct_params()
+    result = db.session.connection().exec_driver_sql(
+        f"EXPLAIN QUERY PLAN {compiled}", tuple(params[name] for name in compiled.positiontup)
+    )
+    return [row[-1] for row in result]
+
+
+def plan_checks(now):
+    """(nama, query, index yang harus dipakai). Index unik _user_app_uc bernama sqlite_autoindex_user_app_* di SQLite."""
+    return [
+        ('aplikasi terinstal per user', UserApp.query.filter(UserApp.user_id == 'abc123'), 'sqlite_autoindex_user_app'),
+        ('instalasi (user, app)', UserApp.query.filter_by(user_id='abc123', app_id=1), 'sqlite_autoindex_user_app'),
+        ('premium berakhir sebelum X', UserApp.premium_ending_before(now), 'ix_user_app_premium_expiry'),
+        ('premium app X berakhir sebelum Y', UserApp.premium_ending_before(now, app_id=1), 'ix_user_app_app_premium_end'),
+        ('trial diinstal sebelum X', UserApp.trials_installed_before(now - datetime.timedelta(hours=24)), 'ix_user_app_trial_installed'),
+        ('sweeper: status yang sudah lewat waktunya',
+         UserApp.query.filter(UserApp.access_state != ACCESS_EXPIRED, UserApp.access_expires_at <= now), 'ix_user_app_access_due'),
+    ]
+
+
+def run_checks(rows=5000):
+    app = Flask(__name__)
+    with tempfile.TemporaryDirectory() as tmp:
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(tmp, 'plan_check.db')
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            now = datetime.datetime.utcnow()
+            db.session.add_all([App(id=app_id, name=f'App{app_id}', url=f'app{app_id}') for app_id in (1, 2, 3)])
+            db.session.add_all([User(id=f'u{index:05d}', username=f'user{index:05d}') for index in range(rows)])
+            db.session.add_all([
+                UserApp(
+                    user_id=f'u{index:05d}', app_id=1 + index % 3,
+                    installation_date=now - datetime.timedelta(hours=index % 200),
+                    is_premium=index % 4 == 0,
+                    premium_end_date=now + datetime.timedelta(hours=index % 300 - 150) if index % 4 == 0 else None
+                )
+                for index in range(rows)
+            ])
+            db.session.commit()
+            db.session.execute(db.text("ANALYZE")) # Statistik index, seperti database produksi yang sudah berisi data
+
+            failures = 0
+            for name, query, index_name in plan_checks(now):
+                plan = _query_plan(query)
+                used = any(index_name in detail for detail in plan)
+                failures += not used
+                print(f"[{'OK' if used else 'GAGAL'}] {name}: {' | '.join(plan)}")
+            db.session.remove()
+            db.engine.dispose()
+    return failures
+
+
+if __name__ == '__main__':
+    sys.exit(1 if run_checks() else 0)